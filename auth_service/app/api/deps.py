@@ -9,12 +9,14 @@ import grpc
 from jwt import InvalidTokenError
 
 from app.db.session import session_DB
-from app.utils.jwt import decode_jwt
+from app.utils.jwt import decode_jwt, jwt_keyring
+from app.core.jwt_keys import JWTKeyring
 from app.schemas.auth import AuthSchema, UserAccessSchema
 from app.core.security import verify_secret
 
 from app.crud.auth import get_credential_password_by_user_id
 from app.services.auth import AuthService
+from app.services.revocation import revocation_registry
 from gRPC.src.users_service_pb2 import GetUserByEmailResponse
 from gRPC.src.users_service_client import UsersServiceClient
 
@@ -28,6 +30,10 @@ def get_user_client(request: Request) -> UsersServiceClient:
     return request.app.state.users_client
 
 
+def get_jwt_keyring() -> JWTKeyring:
+    return jwt_keyring
+
+
 def invalid_token_exc(e=None):
     return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -40,10 +46,15 @@ def get_current_access_token_payload(
 ):
     try:
         payload = decode_jwt(token)
-        return payload
     except InvalidTokenError as e:
         raise invalid_token_exc(e)
 
+    # Токен выдан до logout/смены пароля - проверка по словарю в памяти
+    if revocation_registry.is_revoked(payload.get("sub"), payload.get("iat", 0)):
+        raise invalid_token_exc("token revoked")
+
+    return payload
+
 
 def get_current_refresh_token_payload(
     token: Annotated[str, Depends(oauth2_scheme)],
@@ -0,0 +1,29 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, Request, Response, status
+
+from app.api.deps import get_jwt_keyring
+from app.core.config import settings
+from app.core.jwt_keys import JWTKeyring
+
+router = APIRouter(tags=["jwks"])
+
+
+# Публичные ключи для локальной проверки токенов в других сервисах.
+# Новый ключ нужно опубликовать (без private_key_path) минимум за max-age
+# до того, как сделать его активным, иначе кеши потребителей его не увидят
+@router.get("/.well-known/jwks.json")
+async def jwks(
+    request: Request,
+    keyring: Annotated[JWTKeyring, Depends(get_jwt_keyring)],
+) -> Response:
+    body, etag = keyring.jwks_document
+    max_age = settings.auth_jwt.jwks_max_age_seconds
+    headers = {
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={max_age}, stale-if-error=86400",
+        "ETag": etag,
+    }
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
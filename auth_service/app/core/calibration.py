@@ -0,0 +1,91 @@
+import argparse
+from statistics import median
+from time import perf_counter
+
+from app.core.security import Argon2Hasher, PasswordHashPolicy
+
+
+SAMPLE_PASSWORD = "calibration-password"
+
+
+def measure_verify_ms(policy: PasswordHashPolicy, samples: int) -> float:
+    hashed = policy.hash(SAMPLE_PASSWORD)
+    timings = []
+    for _ in range(samples):
+        start = perf_counter()
+        policy.verify(SAMPLE_PASSWORD, hashed)
+        timings.append((perf_counter() - start) * 1000)
+    return median(timings)
+
+
+# Максимальный bcrypt cost, при котором проверка укладывается в target_ms.
+# Каждый шаг cost удваивает время, поэтому останавливаемся на первом превышении
+def calibrate_bcrypt(target_ms: float, samples: int, max_rounds: int = 16) -> tuple[int, float]:
+    best_rounds, best_ms = 4, measure_verify_ms(PasswordHashPolicy(bcrypt_rounds=4), samples)
+
+    for rounds in range(5, max_rounds + 1):
+        elapsed_ms = measure_verify_ms(PasswordHashPolicy(bcrypt_rounds=rounds), samples)
+        print(f"bcrypt rounds={rounds}: {elapsed_ms:.1f} ms")
+        if elapsed_ms > target_ms:
+            break
+        best_rounds, best_ms = rounds, elapsed_ms
+
+    return best_rounds, best_ms
+
+
+# Память фиксирована (основная защита argon2), подбирается количество проходов
+def calibrate_argon2(
+    target_ms: float, samples: int, memory_cost: int, parallelism: int, max_time_cost: int = 20
+) -> tuple[int, float]:
+    def policy(time_cost: int) -> PasswordHashPolicy:
+        return PasswordHashPolicy(
+            scheme="argon2id",
+            argon2_time_cost=time_cost,
+            argon2_memory_cost=memory_cost,
+            argon2_parallelism=parallelism,
+        )
+
+    best_time_cost, best_ms = 1, measure_verify_ms(policy(1), samples)
+
+    for time_cost in range(2, max_time_cost + 1):
+        elapsed_ms = measure_verify_ms(policy(time_cost), samples)
+        print(f"argon2id time_cost={time_cost}: {elapsed_ms:.1f} ms")
+        if elapsed_ms > target_ms:
+            break
+        best_time_cost, best_ms = time_cost, elapsed_ms
+
+    return best_time_cost, best_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Подбор стоимости хеширования паролей под целевое время проверки на этом хосте"
+    )
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2id"], default="bcrypt")
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--argon2-memory-cost", type=int, default=65536)
+    parser.add_argument("--argon2-parallelism", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.scheme == "argon2id":
+        if Argon2Hasher is None:
+            parser.error("argon2id scheme requires the argon2-cffi package")
+
+        time_cost, elapsed_ms = calibrate_argon2(
+            args.target_ms, args.samples, args.argon2_memory_cost, args.argon2_parallelism
+        )
+        print(f"\nverify ~{elapsed_ms:.1f} ms (target {args.target_ms} ms), add to .env:")
+        print("PASSWORD_HASHING__SCHEME=argon2id")
+        print(f"PASSWORD_HASHING__ARGON2_TIME_COST={time_cost}")
+        print(f"PASSWORD_HASHING__ARGON2_MEMORY_COST={args.argon2_memory_cost}")
+        print(f"PASSWORD_HASHING__ARGON2_PARALLELISM={args.argon2_parallelism}")
+    else:
+        rounds, elapsed_ms = calibrate_bcrypt(args.target_ms, args.samples)
+        print(f"\nverify ~{elapsed_ms:.1f} ms (target {args.target_ms} ms), add to .env:")
+        print("PASSWORD_HASHING__SCHEME=bcrypt")
+        print(f"PASSWORD_HASHING__BCRYPT_ROUNDS={rounds}")
+
+
+if __name__ == "__main__":
+    main()
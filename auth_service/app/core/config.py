@@ -1,18 +1,98 @@
 from pathlib import Path
+from typing import Literal
 from pydantic_settings import SettingsConfigDict, BaseSettings
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from app.core.jwt_keys import JWTAlgorithm
+from common.config import DBPool, Tracing
 
 
 BASE_DIR = Path(__file__).resolve().parents[2]
 
 
+class JWTKey(BaseModel):
+    kid: str
+    # None - ключ выведен из подписи и только проверяет еще живые токены
+    private_key_path: Path | None = None
+    public_key_path: Path
+    algorithm: JWTAlgorithm = "RS256"
+
+
 class AuthJWT(BaseModel):
     private_key_path: Path = BASE_DIR / "certs" / "jwt_private.pem"
     public_key_path: Path = BASE_DIR / "certs" / "jwt_public.pem"
-    algorithm: str = "RS256"
+    # RS256 - самый дорогой при подписи, ES256/EdDSA заметно быстрее
+    # (см. python -m benchmarks.jwt_algorithms)
+    algorithm: JWTAlgorithm = "RS256"
     access_token_expire_minutes: int = 5
     refresh_token_expire_days: int = 30
 
+    # Ротация: AUTH_JWT__KEYS='[{"kid": "2026-05", "private_key_path": ..., "public_key_path": ...}]'
+    # Если список пуст - используется пара ключей выше, kid = thumbprint ключа
+    keys: list[JWTKey] = []
+    active_kid: str | None = None
+    jwks_max_age_seconds: int = 3600
+
+
+class HashingPool(BaseModel):
+    # thread - bcrypt отпускает GIL, process - для полной изоляции от event loop
+    executor: Literal["thread", "process"] = "thread"
+    max_workers: int = 4
+    # Сколько вызовов может ждать пул, прежде чем отвечать 503
+    max_pending: int = 64
+
+
+# Подбирается под CPU командой python -m app.core.calibration
+class PasswordHashing(BaseModel):
+    scheme: Literal["bcrypt", "argon2id"] = "bcrypt"
+    bcrypt_rounds: int = Field(default=12, ge=4, le=31)
+    argon2_time_cost: int = Field(default=3, ge=1)
+    argon2_memory_cost: int = Field(default=65536, ge=8)   # KiB
+    argon2_parallelism: int = Field(default=4, ge=1)
+
+
+# Отметки отзыва access токенов, рассылаются между воркерами через Kafka.
+# retention.ms топика достаточно держать равным сроку жизни access токена
+class TokenRevocation(BaseModel):
+    topic: str = "auth.token-revocations"
+    max_entries: int = 100_000
+
+
+# Кеш ответов GetUserByEmail в auth_service, сбрасывается событиями users_service
+class UsersCache(BaseModel):
+    enabled: bool = True
+    max_entries: int = 10_000
+    ttl_seconds: float = 5.0
+    negative_ttl_seconds: float = 2.0
+    events_topic: str = "users.events"
+
+
+# Подключение к users_service. Несколько реплик: USERS_GRPC__TARGETS='["users-1:50051", "users-2:50051"]'
+# или один DNS адрес (dns:///users:50051) - вызовы распределяются round_robin
+class UsersGrpc(BaseModel):
+    targets: list[str] = ["localhost:50052"]
+    channels_per_target: int = Field(default=2, ge=1)
+    # Дедлайн каждого вызова, включая повторы
+    timeout_seconds: float = 1.0
+    keepalive_time_ms: int = 30_000
+    keepalive_timeout_ms: int = 10_000
+    # Ответы маленькие, сжатие окупается только на больших пакетах
+    compression: Literal["none", "gzip", "deflate"] = "none"
+    retry_max_attempts: int = Field(default=3, ge=2, le=5)
+    retry_initial_backoff_seconds: float = 0.05
+    retry_max_backoff_seconds: float = 0.5
+    # После стольких сбоев подряд вызовы отклоняются сразу, без ожидания дедлайна
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout_seconds: float = 5.0
+
+
+# Одиночные GetUserByEmail, пришедшие в пределах окна, уходят одним GetUsersByEmails
+class UsersBatching(BaseModel):
+    enabled: bool = True
+    window_ms: float = 2.0
+    # Не больше GRPC_MAX_BATCH_SIZE в users_service
+    max_batch_size: int = 256
+
 
 class Settings(BaseSettings):
     DB_HOST: str
@@ -21,13 +101,33 @@ class Settings(BaseSettings):
     DB_USER: str
     DB_PASS: str
 
-    model_config = SettingsConfigDict(env_file=str(BASE_DIR / ".env"))
+    KAFKA_BOOTSTRAP_SERVERS: str = "localhost:9092"
+    # Модели из common называются одинаково во всех сервисах: DB_POOL__SIZE, TRACING__ENABLED
+    DB_POOL: DBPool = DBPool()
+    TRACING: Tracing = Tracing()
+
+    # Вложенные настройки задаются как PASSWORD_HASHING__BCRYPT_ROUNDS=13
+    model_config = SettingsConfigDict(
+        env_file=str(BASE_DIR / ".env"), env_nested_delimiter="__"
+    )
 
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
     auth_jwt: AuthJWT = AuthJWT()
+    hashing_pool: HashingPool = HashingPool()
+    password_hashing: PasswordHashing = PasswordHashing()
+    token_revocation: TokenRevocation = TokenRevocation()
+    users_grpc: UsersGrpc = UsersGrpc()
+    users_cache: UsersCache = UsersCache()
+    users_batching: UsersBatching = UsersBatching()
+
+
+class TestSettings(Settings):
+    model_config = SettingsConfigDict(
+        env_file=str(BASE_DIR / ".test.env"), env_nested_delimiter="__"
+    )
 
 
 settings = Settings()   # type:ignore
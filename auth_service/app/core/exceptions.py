@@ -1,2 +1,13 @@
 class UserNotFoundError(Exception):
     pass
+
+
+class HashingPoolSaturatedError(Exception):
+    def __init__(self, pending: int):
+        self.pending = pending
+        super().__init__(f"Hashing pool is saturated - {self.pending} pending calls")
+
+
+# users_service не отвечает или цепь разомкнута - вызывающий получает 503
+class UsersServiceUnavailableError(RuntimeError):
+    pass
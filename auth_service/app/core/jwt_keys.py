@@ -0,0 +1,144 @@
+import base64
+import hashlib
+import json
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Literal
+
+from cryptography.hazmat.primitives.asymmetric import ec, ed448, ed25519, rsa
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+)
+from jwt.algorithms import get_default_algorithms
+
+
+JWTAlgorithm = Literal["RS256", "ES256", "EdDSA"]
+
+PrivateKey = rsa.RSAPrivateKey | ec.EllipticCurvePrivateKey | ed25519.Ed25519PrivateKey | ed448.Ed448PrivateKey
+PublicKey = rsa.RSAPublicKey | ec.EllipticCurvePublicKey | ed25519.Ed25519PublicKey | ed448.Ed448PublicKey
+
+# Какие типы ключей подходят для алгоритма
+ALGORITHM_KEY_TYPES: dict[str, tuple[type, ...]] = {
+    "RS256": (rsa.RSAPrivateKey, rsa.RSAPublicKey),
+    "ES256": (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey),
+    "EdDSA": (
+        ed25519.Ed25519PrivateKey,
+        ed25519.Ed25519PublicKey,
+        ed448.Ed448PrivateKey,
+        ed448.Ed448PublicKey,
+    ),
+}
+
+# Обязательные поля JWK для thumbprint по RFC 7638
+THUMBPRINT_MEMBERS = {
+    "RSA": ("e", "kty", "n"),
+    "EC": ("crv", "kty", "x", "y"),
+    "OKP": ("crv", "kty", "x"),
+}
+
+
+def check_key_algorithm(key: PrivateKey | PublicKey, algorithm: str) -> None:
+    if algorithm not in ALGORITHM_KEY_TYPES:
+        raise ValueError(f"Unsupported JWT algorithm - {algorithm}")
+
+    if not isinstance(key, ALGORITHM_KEY_TYPES[algorithm]):
+        raise ValueError(f"{type(key).__name__} can not be used with {algorithm}")
+
+    # ES256 по RFC 7518 - только кривая P-256
+    if algorithm == "ES256" and not isinstance(key.curve, ec.SECP256R1):  # type: ignore[union-attr]
+        raise ValueError(f"ES256 requires a P-256 key, got {key.curve.name}")  # type: ignore[union-attr]
+
+
+def jwk_thumbprint(jwk: dict[str, Any]) -> str:
+    members = {name: jwk[name] for name in THUMBPRINT_MEMBERS[jwk["kty"]]}
+    canonical = json.dumps(members, separators=(",", ":"), sort_keys=True).encode()
+    digest = hashlib.sha256(canonical).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+# Загружает PEM один раз и отдает готовые объекты cryptography,
+# чтобы PyJWT не разбирал ключ на каждый encode/decode.
+# Без private_key_path ключ только проверяет ранее выданные токены
+class JWTKeyManager:
+    def __init__(
+        self,
+        private_key_path: Path | None,
+        public_key_path: Path,
+        algorithm: JWTAlgorithm = "RS256",
+        kid: str | None = None,
+    ):
+        self.private_key_path = private_key_path
+        self.public_key_path = public_key_path
+        self.algorithm = algorithm
+        self._kid = kid
+
+    @cached_property
+    def signing_key(self) -> PrivateKey:
+        if self.private_key_path is None:
+            raise ValueError(f"JWT key {self.kid} is verification-only")
+        key = load_pem_private_key(self.private_key_path.read_bytes(), password=None)
+        check_key_algorithm(key, self.algorithm)  # type: ignore[arg-type]
+        return key  # type: ignore[return-value]
+
+    @cached_property
+    def verifying_key(self) -> PublicKey:
+        key = load_pem_public_key(self.public_key_path.read_bytes())
+        check_key_algorithm(key, self.algorithm)  # type: ignore[arg-type]
+        return key  # type: ignore[return-value]
+
+    @cached_property
+    def public_jwk(self) -> dict[str, Any]:
+        jwk = get_default_algorithms()[self.algorithm].to_jwk(self.verifying_key, as_dict=True)
+        return dict(jwk)  # type: ignore[arg-type]
+
+    # Если kid не задан в настройках - берем thumbprint публичного ключа,
+    # он одинаков во всех воркерах и не меняется между перезапусками
+    @cached_property
+    def kid(self) -> str:
+        return self._kid or jwk_thumbprint(self.public_jwk)
+
+    def to_jwk(self) -> dict[str, Any]:
+        return {**self.public_jwk, "kid": self.kid, "alg": self.algorithm, "use": "sig"}
+
+
+# Набор активных ключей: одним подписываем, всеми проверяем.
+# Поиск ключа по kid из заголовка токена - обращение к словарю
+class JWTKeyring:
+    def __init__(self, keys: list[JWTKeyManager], active_kid: str | None = None):
+        if not keys:
+            raise ValueError("At least one JWT key is required")
+        self._keys = keys
+        self._active_kid = active_kid
+
+    @cached_property
+    def by_kid(self) -> dict[str, JWTKeyManager]:
+        by_kid = {key.kid: key for key in self._keys}
+        if len(by_kid) != len(self._keys):
+            raise ValueError("JWT key ids must be unique")
+        return by_kid
+
+    @cached_property
+    def signing(self) -> JWTKeyManager:
+        if self._active_kid is None:
+            return self._keys[0]
+        try:
+            return self.by_kid[self._active_kid]
+        except KeyError:
+            raise ValueError(f"Active JWT key {self._active_kid} is not configured")
+
+    # Токены без kid выпущены до ротации - проверяем их активным ключом
+    def get(self, kid: str | None) -> JWTKeyManager | None:
+        if kid is None:
+            return self.signing
+        return self.by_kid.get(kid)
+
+    def jwks(self) -> dict[str, list[dict[str, Any]]]:
+        return {"keys": [key.to_jwk() for key in self.by_kid.values()]}
+
+    # Набор ключей не меняется без перезапуска, поэтому тело ответа и ETag считаются один раз
+    @cached_property
+    def jwks_document(self) -> tuple[bytes, str]:
+        body = json.dumps(self.jwks(), separators=(",", ":")).encode()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        return body, etag
@@ -1,10 +1,21 @@
 import bcrypt
 import hashlib
+from typing import Literal
+
+try:
+    from argon2 import PasswordHasher as Argon2Hasher
+    from argon2.exceptions import InvalidHashError, VerifyMismatchError
+except ImportError:  # argon2-cffi - опциональная зависимость
+    Argon2Hasher = None  # type: ignore[assignment, misc]
+
+
+BCRYPT_DEFAULT_ROUNDS = 12
+ARGON2_PREFIX = "$argon2"
 
 
 # Хеширование пароля с помощью bcrypt
-def hash_secret(secret: str) -> str:
-    salt = bcrypt.gensalt()
+def hash_secret(secret: str, rounds: int = BCRYPT_DEFAULT_ROUNDS) -> str:
+    salt = bcrypt.gensalt(rounds=rounds)
     secret_bytes: bytes = secret.encode()
     hashed_secret = bcrypt.hashpw(secret_bytes, salt)
     return hashed_secret.decode()
@@ -14,6 +25,67 @@ def verify_secret(secret: str, hashed: str) -> bool:
     return bcrypt.checkpw(secret.encode(), hashed.encode())
 
 
+# Достает work factor из хеша вида $2b$12$...
+def bcrypt_rounds(hashed: str) -> int | None:
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+# Политика хеширования паролей: схема и ее стоимость.
+# Экземпляр сериализуется через pickle, поэтому его можно отдавать в ProcessPoolExecutor
+class PasswordHashPolicy:
+    def __init__(
+        self,
+        scheme: Literal["bcrypt", "argon2id"] = "bcrypt",
+        bcrypt_rounds: int = BCRYPT_DEFAULT_ROUNDS,
+        argon2_time_cost: int = 3,
+        argon2_memory_cost: int = 65536,
+        argon2_parallelism: int = 4,
+    ):
+        if scheme == "argon2id" and Argon2Hasher is None:
+            raise RuntimeError("argon2id scheme requires the argon2-cffi package")
+
+        self.scheme = scheme
+        self.bcrypt_rounds = bcrypt_rounds
+        self.argon2_time_cost = argon2_time_cost
+        self.argon2_memory_cost = argon2_memory_cost
+        self.argon2_parallelism = argon2_parallelism
+
+    def _argon2(self) -> "Argon2Hasher":
+        return Argon2Hasher(
+            time_cost=self.argon2_time_cost,
+            memory_cost=self.argon2_memory_cost,
+            parallelism=self.argon2_parallelism,
+        )
+
+    def hash(self, secret: str) -> str:
+        if self.scheme == "argon2id":
+            return self._argon2().hash(secret)
+        return hash_secret(secret, rounds=self.bcrypt_rounds)
+
+    # Проверяет пароль по любому поддерживаемому хешу, независимо от текущей схемы
+    def verify(self, secret: str, hashed: str) -> bool:
+        if hashed.startswith(ARGON2_PREFIX):
+            if Argon2Hasher is None:
+                raise RuntimeError("argon2 hash found, but argon2-cffi is not installed")
+            try:
+                return self._argon2().verify(hashed, secret)
+            except (VerifyMismatchError, InvalidHashError):
+                return False
+        return verify_secret(secret, hashed)
+
+    # Хеш создан другой схемой или с другой стоимостью - его нужно пересчитать
+    def needs_rehash(self, hashed: str) -> bool:
+        is_argon2 = hashed.startswith(ARGON2_PREFIX)
+
+        if self.scheme == "argon2id":
+            return not is_argon2 or self._argon2().check_needs_rehash(hashed)
+
+        return is_argon2 or bcrypt_rounds(hashed) != self.bcrypt_rounds
+
+
 # Хеширование с помощью sha256
 def hash_refresh_token(secret: str) -> str:
     return hashlib.sha256(secret.encode()).hexdigest()
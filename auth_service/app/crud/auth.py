@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 from typing import Any
-from uuid import UUID
-from sqlalchemy import func, select, update
+from uuid import UUID, uuid4
+from sqlalchemy import func, insert, literal, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import Credential, RefreshToken
@@ -20,20 +20,17 @@ async def get_credential_password_by_user_id(session: AsyncSession, user_id: UUI
     return user.password_hash
 
 
+# INSERT ... RETURNING отдает строку вместе с server_default полями за один запрос
 async def create_credential(session: AsyncSession, credential_data: dict) -> Credential:
-    credential = Credential(**credential_data)
-    session.add(credential)
-    await session.flush()
-    await session.refresh(credential)
-    return credential
+    stmt = insert(Credential).values(**credential_data).returning(Credential)
+    result = await session.scalars(stmt)
+    return result.one()
 
 
 async def create_refresh_token(session: AsyncSession, auth_data: dict) -> RefreshToken:
-    refresh_token = RefreshToken(**auth_data)
-    session.add(refresh_token)
-    await session.flush()
-    await session.refresh(refresh_token)
-    return refresh_token
+    stmt = insert(RefreshToken).values(**auth_data).returning(RefreshToken)
+    result = await session.scalars(stmt)
+    return result.one()
 
 
 async def enforce_refresh_token_limit(
@@ -95,6 +92,94 @@ async def revoke_token(session: AsyncSession, hashed_refresh_token: str) -> tupl
     return token_record.user_id, False
     
 
+# Ротация refresh токена одним запросом: отзыв старого, обрезка лишних живых токенов
+# пользователя и вставка нового. Возвращает (user_id, is_compromised) как revoke_token.
+# Data-modifying CTE в Postgres выполняются всегда, даже если на них не ссылается итоговый SELECT
+async def rotate_refresh_token(
+    session: AsyncSession,
+    hashed_refresh_token: str,
+    new_token_data: dict,
+    max_tokens: int = 3,
+) -> tuple[UUID | None, bool]:
+    old = (
+        select(
+            RefreshToken.id,
+            RefreshToken.user_id,
+            RefreshToken.revoked_at,
+            (RefreshToken.expires_at > func.now()).label("is_alive"),
+        )
+        .where(RefreshToken.token_hash == hashed_refresh_token)
+        .with_for_update()
+        .cte("old")
+    )
+
+    revoked = (
+        update(RefreshToken)
+        .where(RefreshToken.id == old.c.id, old.c.revoked_at.is_(None), old.c.is_alive)
+        .values(revoked_at=func.now())
+        .returning(RefreshToken.id, RefreshToken.user_id)
+        .cte("revoked")
+    )
+
+    # Все CTE видят один снимок, поэтому старый токен исключаем явно,
+    # а новый сюда еще не попадает - оставляем max_tokens - 1 самых свежих
+    excess = (
+        select(RefreshToken.id)
+        .join(revoked, RefreshToken.user_id == revoked.c.user_id)
+        .where(
+            RefreshToken.id != revoked.c.id,
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > func.now(),
+        )
+        .order_by(RefreshToken.created_at.desc())
+        .offset(max_tokens - 1)
+        .with_for_update(of=RefreshToken)
+        .cte("excess")
+    )
+
+    trimmed = (
+        update(RefreshToken)
+        .where(RefreshToken.id == excess.c.id)
+        .values(revoked_at=func.now())
+        .cte("trimmed")
+    )
+
+    inserted = (
+        insert(RefreshToken)
+        .from_select(
+            ["id", "user_id", "token_hash", "expires_at"],
+            select(
+                literal(uuid4()),
+                revoked.c.user_id,
+                literal(new_token_data["token_hash"]),
+                literal(new_token_data["expires_at"]),
+            ),
+        )
+        .cte("inserted")
+    )
+
+    stmt = select(
+        old.c.user_id,
+        old.c.revoked_at.is_not(None).label("is_compromised"),
+        old.c.is_alive,
+    ).add_cte(trimmed, inserted)
+
+    result = await session.execute(stmt)
+    row = result.one_or_none()
+
+    if row is None:
+        return None, False
+
+    if row.is_compromised:
+        # Токен используется повторно после revoke!
+        return row.user_id, True
+
+    if not row.is_alive:
+        return None, False
+
+    return row.user_id, False
+
+
 async def change_user_password(session: AsyncSession, user_id: UUID, new_password: str) -> UUID:
     stmt = (
         update(Credential)
@@ -109,3 +194,19 @@ async def change_user_password(session: AsyncSession, user_id: UUID, new_passwor
         raise UserNotFoundError("Update failed: user not found")
 
     return updated_credential_user_id
+
+
+# Пересчет хеша при смене политики: пароль тот же, поэтому password_updated_at не трогаем.
+# Обновляется, только если хеш все еще тот, что проверяли при входе: пока считался
+# новый, пароль могли сменить - тогда пересчет устарел. False - строка не обновлена
+async def update_password_hash(
+    session: AsyncSession, user_id: UUID, old_hash: str, new_hash: str
+) -> bool:
+    stmt = (
+        update(Credential)
+        .where(Credential.user_id == user_id, Credential.password_hash == old_hash)
+        .values(password_hash=new_hash)
+        .returning(Credential.user_id)
+    )
+    result = await session.execute(stmt)
+    return result.scalar_one_or_none() is not None
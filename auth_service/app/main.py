@@ -1,34 +1,109 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 
 from app.api.routers.auth import router as auth_router
+from app.api.routers.jwks import router as jwks_router
+from app.core.config import settings
+from app.core.hashing import secret_hasher
+from common.instrumentation import (
+    PrometheusMiddleware,
+    metrics_response,
+    register_stats,
+)
+from common.tracing import fastapi_telemetry, setup_tracing
+from common.db_pool import pool_stats
+from app.db.session import engine
+from app.utils.cache import AsyncTTLCache
 from app.schemas.auth import KafkaMessage
-from gRPC.src.users_service_client import create_grpc_channel, UsersServiceClient
+from app.utils.circuit_breaker import CircuitBreaker
+from gRPC.src.channels import ChannelPool
+from gRPC.src.users_service_client import UsersServiceClient
 
 from kafka_producer import producer
+from kafka_consumer import KafkaTopicListener, revocation_listener
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    tracer_provider = setup_tracing("auth_service", settings.TRACING)
     #kafka
     await producer.start()
+    await revocation_listener.start()
     #gRPC
-    channel = create_grpc_channel("localhost:50052")
-    app.state.users_client = UsersServiceClient(channel)
+    channels = ChannelPool.from_config(settings.users_grpc)
+    user_cache = None
+    if settings.users_cache.enabled:
+        user_cache = AsyncTTLCache(
+            max_entries=settings.users_cache.max_entries,
+            ttl_seconds=settings.users_cache.ttl_seconds,
+            negative_ttl_seconds=settings.users_cache.negative_ttl_seconds,
+            name="users",
+        )
+    app.state.users_client = UsersServiceClient(
+        channels,
+        user_cache=user_cache,
+        timeout_seconds=settings.users_grpc.timeout_seconds,
+        circuit_breaker=CircuitBreaker(
+            failure_threshold=settings.users_grpc.breaker_failure_threshold,
+            reset_timeout_seconds=settings.users_grpc.breaker_reset_timeout_seconds,
+        ),
+    )
+    if settings.users_batching.enabled:
+        app.state.users_client.enable_batching(
+            window_seconds=settings.users_batching.window_ms / 1000,
+            max_batch_size=settings.users_batching.max_batch_size,
+        )
+    users_events_listener = KafkaTopicListener(
+        settings.users_cache.events_topic, app.state.users_client.handle_user_event
+    )
+    await users_events_listener.start()
     yield
     #kafka
+    await users_events_listener.stop()
+    await revocation_listener.stop()
     await producer.stop()
     #gRPC
     await app.state.users_client.close()
+    #bcrypt pool
+    secret_hasher.shutdown()
+    #db
+    await engine.dispose()
+    #tracing: дописываем накопленные spans
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
 
 
-app = FastAPI(title="Auth service", lifespan=lifespan)
+app = FastAPI(
+    title="Auth service", lifespan=lifespan, telemetry=fastapi_telemetry(settings.TRACING)
+)
+app.add_middleware(PrometheusMiddleware)
+
+
+# До старта lifespan клиента users_service еще нет - источник пустой
+def users_client_stats(name: str):
+    client = getattr(app.state, "users_client", None)
+    if client is None:
+        return []
+    return [({}, getattr(client, name)())]
+
+
+register_stats("hashing", lambda: [({}, secret_hasher.stats())])
+register_stats("db_pool", lambda: [({}, pool_stats(engine))])
+register_stats("users_cache", lambda: users_client_stats("cache_stats"))
+register_stats("users_grpc_circuit", lambda: users_client_stats("circuit_stats"))
+register_stats("users_batching", lambda: users_client_stats("batching_stats"))
 
 @app.post("/publish")
 async def public_kafka_message(data: KafkaMessage):
     message = {"key": data.key, "value": data.value}
     await producer.send_one("my-topic", message)
     return {"sent": True, "payload": message}
-    
-    
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> Response:
+    return metrics_response()
+
+
 app.include_router(auth_router)
+app.include_router(jwks_router)
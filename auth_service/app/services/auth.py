@@ -2,7 +2,6 @@ from datetime import datetime, timedelta, timezone
 from typing import Annotated
 from uuid import UUID
 from fastapi import HTTPException, status
-import grpc
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.crud.auth import (
     change_user_password,
@@ -11,7 +10,8 @@ from app.crud.auth import (
     enforce_refresh_token_limit,
     get_credential_password_by_user_id,
     revoke_all_user_tokens,
-    revoke_token,
+    rotate_refresh_token,
+    update_password_hash,
 )
 from app.schemas.auth import (
     AuthSchema,
@@ -20,19 +20,56 @@ from app.schemas.auth import (
     TokenInfo,
     UserAccessSchema,
 )
-from app.core.security import hash_refresh_token, hash_secret, verify_secret
+from app.core.security import hash_refresh_token
+from app.core.hashing import secret_hasher
 from app.utils.refresh_token import generate_refresh_token
 from app.utils.jwt import encode_jwt
-from app.core.exceptions import UserNotFoundError
+from app.services.revocation import revocation_registry
+from app.core.exceptions import (
+    HashingPoolSaturatedError,
+    UserNotFoundError,
+    UsersServiceUnavailableError,
+)
 from gRPC.src import users_service_pb2 as pb
 from gRPC.src.users_service_client import UsersServiceClient
 from app.core.config import settings
 
 
+# Размер очереди пула - внутренняя деталь: клиенту общий ответ.
+# Отказы считает hashing_rejected в /metrics, печать на каждый отказ при
+# перегрузке только забивала бы вывод
+def hashing_unavailable_exc(e: HashingPoolSaturatedError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Service overloaded, try again later",
+        headers={"Retry-After": "1"},
+    )
+
+
+def users_unavailable_exc(e: UsersServiceUnavailableError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"User service unavailable - {e}",
+        headers={"Retry-After": "1"},
+    )
+
+
 class AuthService:
     def __init__(self, users_client: UsersServiceClient):
         self.users_client = users_client  # gRPC клиент для users
 
+    async def _hash_password(self, password: str) -> str:
+        try:
+            return await secret_hasher.hash(password)
+        except HashingPoolSaturatedError as e:
+            raise hashing_unavailable_exc(e)
+
+    async def _verify_password(self, password: str, hashed: str) -> bool:
+        try:
+            return await secret_hasher.verify(password, hashed)
+        except HashingPoolSaturatedError as e:
+            raise hashing_unavailable_exc(e)
+
     async def register_user(self, session: AsyncSession, email: str, password: str):
         try:
             user_data: pb.GetUserByEmailResponse | None = (
@@ -47,12 +84,14 @@ class AuthService:
 
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except UsersServiceUnavailableError as e:
+            raise users_unavailable_exc(e)
         except RuntimeError as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
             )
 
-        hashed_password = hash_secret(password)
+        hashed_password = await self._hash_password(password)
         credential_data = CredentialCreateSchema(
             user_id=user_data.id, password_hash=hashed_password
         )
@@ -72,7 +111,9 @@ class AuthService:
 
         try:
             user_data = await self.users_client.get_user_by_email(auth_data.username)
-        except grpc.aio.AioRpcError as e:
+        except UsersServiceUnavailableError as e:
+            raise users_unavailable_exc(e)
+        except RuntimeError as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"User service error - {e}",
@@ -94,26 +135,40 @@ class AuthService:
         if not user_password:
             raise unauthed_exc
 
-        if not verify_secret(auth_data.password, user_password):
+        if not await self._verify_password(auth_data.password, user_password):
             raise unauthed_exc
 
+        if secret_hasher.needs_rehash(user_password):
+            await self._rehash_password(
+                session, UUID(user_data.id), auth_data.password, user_password
+            )
+
         user_access_data = UserAccessSchema(sub=user_data.id)
 
         return user_access_data
 
-    async def generate_refresh_token(self, session: AsyncSession, user_id: UUID) -> str:
-        await enforce_refresh_token_limit(session, user_id)
+    # Хеш с устаревшей стоимостью пересчитывается, пока у нас есть открытый пароль.
+    # Если пул перегружен - пропускаем, пересчитаем при следующем входе
+    async def _rehash_password(
+        self, session: AsyncSession, user_id: UUID, password: str, old_hash: str
+    ) -> None:
+        try:
+            new_hash = await secret_hasher.hash(password)
+        except HashingPoolSaturatedError:
+            return
+        await update_password_hash(session, user_id, old_hash, new_hash)
 
-        token = generate_refresh_token()
+    def _refresh_token_data(self, token: str) -> dict:
         expires_at = datetime.now(timezone.utc) + timedelta(
             days=settings.auth_jwt.refresh_token_expire_days
         )
+        return {"token_hash": hash_refresh_token(token), "expires_at": expires_at}
 
-        auth_data = {
-            "user_id": user_id,
-            "token_hash": hash_refresh_token(token),
-            "expires_at": expires_at,
-        }
+    async def generate_refresh_token(self, session: AsyncSession, user_id: UUID) -> str:
+        await enforce_refresh_token_limit(session, user_id)
+
+        token = generate_refresh_token()
+        auth_data = {"user_id": user_id, **self._refresh_token_data(token)}
 
         await create_refresh_token(session, auth_data)
 
@@ -123,7 +178,12 @@ class AuthService:
         self, session: AsyncSession, refresh_token: str
     ) -> TokenInfo:
         hashed_refresh_token = hash_refresh_token(refresh_token)
-        user_id, is_compromised = await revoke_token(session, hashed_refresh_token)
+        new_refresh_token = generate_refresh_token()
+        new_token_data = self._refresh_token_data(new_refresh_token)
+
+        user_id, is_compromised = await rotate_refresh_token(
+            session, hashed_refresh_token, new_token_data
+        )
 
         if user_id is None:
             raise HTTPException(
@@ -132,7 +192,8 @@ class AuthService:
         
         # Кража токена, т.к. у токена уже есть revoked_at
         if is_compromised:
-            await revoke_all_user_tokens(session, user_id)
+            # Отзыв фиксируется внутри, до исключения - иначе сессия откатила бы его
+            await self._revoke_all_user_tokens(session, user_id)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail="Security error, token compromise detected"
             )
@@ -140,8 +201,6 @@ class AuthService:
         access_token_data = UserAccessSchema(sub=str(user_id))
         access_token = encode_jwt(payload=access_token_data.model_dump())
 
-        new_refresh_token = await self.generate_refresh_token(session, user_id)
-
         return TokenInfo(access_token=access_token, refresh_token=new_refresh_token)
 
     async def change_user_password(self, session: AsyncSession, data: ChangePassword, user_id: UUID) -> None:
@@ -153,17 +212,25 @@ class AuthService:
         if data.new_password == data.old_password:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="New password must be different from old password")
 
-        if not verify_secret(data.old_password, password_in_db):
+        if not await self._verify_password(data.old_password, password_in_db):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid password")
 
-        hashed_new_password = hash_secret(data.new_password)
+        hashed_new_password = await self._hash_password(data.new_password)
 
         try:
             await change_user_password(session, user_id, hashed_new_password)
         except UserNotFoundError as e:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid access token")
 
-        await revoke_all_user_tokens(session, user_id)
+        await self._revoke_all_user_tokens(session, user_id)
         
     async def logout(self, session: AsyncSession, user_id: UUID):
-        await revoke_all_user_tokens(session, user_id)
\ No newline at end of file
+        await self._revoke_all_user_tokens(session, user_id)
+
+    # Отзываем refresh токены в БД и уже выданные access токены во всех воркерах.
+    # Отметка рассылается только после commit: при откате транзакции токены
+    # остаются действительными и отклонять их нельзя
+    async def _revoke_all_user_tokens(self, session: AsyncSession, user_id: UUID) -> None:
+        await revoke_all_user_tokens(session, user_id)
+        await session.commit()
+        await revocation_registry.revoke_user(user_id)
\ No newline at end of file
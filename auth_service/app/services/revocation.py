@@ -0,0 +1,71 @@
+from time import time
+from typing import Awaitable, Callable
+from uuid import UUID
+
+from app.core.config import settings
+from app.utils.cache import TTLCache
+from kafka_producer import producer
+
+
+Publisher = Callable[[dict], Awaitable[None]]
+
+
+# Отзыв access токенов без похода в БД на каждый запрос: для пользователя хранится
+# отметка "токены, выданные раньше T, недействительны". Через access_token_expire_minutes
+# все такие токены истекают сами, поэтому запись живет ровно столько же.
+# iat в токене и отметка - дробные секунды: токен, выданный в ту же секунду до отзыва,
+# отклоняется, а новый вход сразу после смены пароля проходит
+class TokenRevocationRegistry:
+    def __init__(
+        self,
+        ttl_seconds: float,
+        max_entries: int,
+        publisher: Publisher | None = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        # max_entries должен с запасом покрывать число отзывов за ttl_seconds,
+        # иначе вытесненная отметка перестанет действовать раньше времени
+        self._watermarks: TTLCache[str, float] = TTLCache(max_entries, ttl_seconds)
+        self._publisher = publisher
+
+    # Отметка из этого или другого воркера; берем максимальную
+    def apply(self, user_id: str, revoked_before: float) -> None:
+        remaining = revoked_before + self.ttl_seconds - time()
+        if remaining <= 0:
+            return
+
+        current = self._watermarks.get(user_id)
+        if current is None or revoked_before > current:
+            self._watermarks.set(user_id, revoked_before, ttl_seconds=remaining)
+
+    async def revoke_user(self, user_id: UUID | str) -> None:
+        message = {"user_id": str(user_id), "revoked_before": time()}
+        self.apply(message["user_id"], message["revoked_before"])
+
+        if self._publisher is None:
+            return
+        try:
+            await self._publisher(message)
+        except Exception as e:
+            # Локально отзыв уже действует, остальные воркеры узнают о нем после восстановления Kafka
+            print(f"Не удалось разослать отзыв токенов - {e}")
+
+    def is_revoked(self, user_id: str, issued_at: float) -> bool:
+        revoked_before = self._watermarks.get(user_id)
+        return revoked_before is not None and issued_at < revoked_before
+
+    def stats(self) -> dict:
+        return {"entries": len(self._watermarks), "evictions": self._watermarks.evictions}
+
+
+async def publish_revocation(message: dict) -> None:
+    await producer.send_one(
+        settings.token_revocation.topic, message, key=message["user_id"]
+    )
+
+
+revocation_registry = TokenRevocationRegistry(
+    ttl_seconds=settings.auth_jwt.access_token_expire_minutes * 60,
+    max_entries=settings.token_revocation.max_entries,
+    publisher=publish_revocation,
+)
@@ -0,0 +1,100 @@
+import asyncio
+from time import perf_counter
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+from prometheus_client import Histogram
+
+from common.instrumentation import LATENCY_BUCKETS
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+BatchLoader = Callable[[list[K]], Awaitable[dict[K, V]]]
+
+MICRO_BATCH_DURATION = Histogram(
+    "micro_batch_load_duration_seconds",
+    "Batch loader call time",
+    ["batcher"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+# Собирает одиночные запросы, пришедшие в течение window_seconds, в один пакет.
+# Пакет уходит раньше, если набралось max_batch_size ключей.
+# Ключа нет в ответе загрузчика - ожидающий получает None.
+# name - метка batcher в метриках Prometheus
+class MicroBatcher(Generic[K, V]):
+    def __init__(
+        self,
+        loader: BatchLoader,
+        window_seconds: float = 0.002,
+        max_batch_size: int = 256,
+        name: str = "default",
+    ):
+        self._loader = loader
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self._pending: dict[K, asyncio.Future] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.requests = 0
+        self.batches = 0
+        self._batch_duration = MICRO_BATCH_DURATION.labels(name)
+
+    async def load(self, key: K) -> V | None:
+        self.requests += 1
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = future
+
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(
+                    self.window_seconds, self._flush
+                )
+
+        # shield: отмена одного ожидающего не должна ломать пакет для остальных
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict[K, asyncio.Future]) -> None:
+        self.batches += 1
+        start = perf_counter()
+        try:
+            values = await self._loader(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._batch_duration.observe(perf_counter() - start)
+
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(values.get(key))
+
+    async def close(self) -> None:
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,165 @@
+import asyncio
+from collections import OrderedDict
+from time import monotonic, perf_counter
+from typing import Awaitable, Callable, Generic, Hashable, Iterator, TypeVar
+
+from prometheus_client import Histogram
+
+from common.instrumentation import LATENCY_BUCKETS
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+# Ограниченный по размеру LRU кеш с TTL на запись.
+# Не потокобезопасен - рассчитан на использование из одного event loop
+class TTLCache(Generic[K, V]):
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: K) -> V | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+
+        expires_at, value = item
+        if expires_at <= self._clock():
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, ttl_seconds: float | None = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._data[key] = (self._clock() + ttl, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: K) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def items(self) -> Iterator[tuple[K, tuple[float, V]]]:
+        return iter(self._data.items())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Кешированное отсутствие значения (например, NOT_FOUND), отличается от промаха
+_NEGATIVE = object()
+
+
+CACHE_LOAD_DURATION = Histogram(
+    "cache_load_duration_seconds",
+    "Loader call time on a cache miss",
+    ["cache"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+# Асинхронный кеш с загрузкой: LRU + TTL, отдельный TTL для отрицательных ответов
+# и single-flight - параллельные запросы одного ключа ждут одну загрузку.
+# name - метка cache в метриках Prometheus
+class AsyncTTLCache(Generic[K, V]):
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        negative_ttl_seconds: float,
+        clock: Callable[[], float] = monotonic,
+        name: str = "default",
+    ):
+        self._entries: TTLCache[K, object] = TTLCache(max_entries, ttl_seconds, clock)
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._inflight: dict[K, asyncio.Task] = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._load_duration = CACHE_LOAD_DURATION.labels(name)
+
+    async def get_or_load(self, key: K, loader: Callable[[], Awaitable[V | None]]) -> V | None:
+        cached = self._entries.get(key)
+        if cached is _NEGATIVE:
+            self.negative_hits += 1
+            return None
+        if cached is not None:
+            self.hits += 1
+            return cached  # type: ignore[return-value]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._load(key, loader))
+            self._inflight[key] = task
+
+        # shield: отмена одного ожидающего не должна отменять загрузку для остальных
+        return await asyncio.shield(task)
+
+    async def _load(self, key: K, loader: Callable[[], Awaitable[V | None]]) -> V | None:
+        start = perf_counter()
+        try:
+            value = await loader()
+        finally:
+            self._load_duration.observe(perf_counter() - start)
+            # Ключ инвалидировали во время загрузки - ответ мог устареть, не кешируем его
+            is_current = self._inflight.get(key) is asyncio.current_task()
+            if is_current:
+                del self._inflight[key]
+
+        if not is_current:
+            return value
+
+        if value is None:
+            self._entries.set(key, _NEGATIVE, ttl_seconds=self.negative_ttl_seconds)
+        else:
+            self._entries.set(key, value)
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        self._entries.set(key, value)
+
+    def invalidate(self, key: K) -> None:
+        self._entries.delete(key)
+        self._inflight.pop(key, None)
+
+    # Инвалидация по значению - перебор, рассчитан на редкие события.
+    # Результаты текущих загрузок тоже не попадут в кеш
+    def invalidate_where(self, predicate: Callable[[V], bool]) -> None:
+        for key, (_, value) in list(self._entries.items()):
+            if value is not _NEGATIVE and predicate(value):  # type: ignore[arg-type]
+                self._entries.delete(key)
+        self._inflight.clear()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "evictions": self._entries.evictions,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
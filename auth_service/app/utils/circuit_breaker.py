@@ -0,0 +1,77 @@
+from time import monotonic
+from typing import Callable, Literal
+
+
+CircuitState = Literal["closed", "open", "half_open"]
+# probe - вызов пропущен пробным в half_open, только он возвращает пробу через release_probe
+CallPermit = Literal["call", "probe"]
+
+
+# closed - запросы идут как обычно, считаем подряд идущие сбои.
+# open - после failure_threshold сбоев запросы сразу отклоняются reset_timeout_seconds.
+# half_open - пропускаем один пробный запрос: успех закрывает цепь, сбой снова открывает.
+# Рассчитан на один event loop, блокировки не нужны
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout_seconds: float = 5.0,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self._clock = clock
+        self._state: CircuitState = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state == "open" and self._clock() - self._opened_at >= self.reset_timeout_seconds:
+            self._state = "half_open"
+            self._probe_in_flight = False
+        return self._state
+
+    # None - вызов отклонен
+    def acquire(self) -> CallPermit | None:
+        state = self.state
+        if state == "closed":
+            return "call"
+        if state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return "probe"
+        self.rejected += 1
+        return None
+
+    def allow(self) -> bool:
+        return self.acquire() is not None
+
+    def record_success(self) -> None:
+        self._state = "closed"
+        self._failures = 0
+        self._probe_in_flight = False
+
+    # Пробный вызов завершился без исхода (например, отменен) - следующий может пробовать.
+    # Вызывает только получивший permit "probe", иначе обычные вызовы, начатые до
+    # размыкания, освобождали бы чужую пробу и пропускали лишние запросы
+    def release_probe(self) -> None:
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state == "half_open" or self._failures >= self.failure_threshold:
+            self._state = "open"
+            self._opened_at = self._clock()
+            self._probe_in_flight = False
+            self.opened += 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
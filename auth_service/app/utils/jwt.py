@@ -1,33 +1,96 @@
 from datetime import datetime, timedelta, timezone
+from time import perf_counter
 from typing import Any
 import jwt
-from app.core.config import settings
+from prometheus_client import Histogram
+from app.core.config import AuthJWT, settings
+from common.instrumentation import LATENCY_BUCKETS
+from app.core.jwt_keys import JWTKeyManager, JWTKeyring, PrivateKey, PublicKey
+
+
+def build_keyring(config: AuthJWT) -> JWTKeyring:
+    if not config.keys:
+        key = JWTKeyManager(
+            private_key_path=config.private_key_path,
+            public_key_path=config.public_key_path,
+            algorithm=config.algorithm,
+        )
+        return JWTKeyring([key])
+
+    keys = [
+        JWTKeyManager(
+            private_key_path=key.private_key_path,
+            public_key_path=key.public_key_path,
+            algorithm=key.algorithm,
+            kid=key.kid,
+        )
+        for key in config.keys
+    ]
+    return JWTKeyring(keys, active_kid=config.active_kid)
+
+
+JWT_DURATION = Histogram(
+    "jwt_duration_seconds", "JWT signing and verification time", ["operation"], buckets=LATENCY_BUCKETS
+)
+
+
+# Ключи читаются с диска при первом использовании и дальше берутся из кеша
+jwt_keyring = build_keyring(settings.auth_jwt)
 
 
 def encode_jwt(
     payload: dict,
-    private_key: str = settings.auth_jwt.private_key_path.read_text(),
-    algorithm: str = settings.auth_jwt.algorithm,
+    private_key: PrivateKey | str | None = None,
+    algorithm: str | None = None,
     expire_minutes: int = settings.auth_jwt.access_token_expire_minutes,
-    expire_timedelta: timedelta | None = None
+    expire_timedelta: timedelta | None = None,
+    keyring: JWTKeyring = jwt_keyring,
 ) -> str:
     to_encode = payload.copy()
     now = datetime.now(timezone.utc)
-    
+
     if expire_timedelta:
         expire = now + expire_timedelta
     else:
         expire = now + timedelta(minutes=expire_minutes)
-    
-    to_encode.update(exp=expire, iat=now)
-    encoded = jwt.encode(payload=to_encode, key=private_key, algorithm=algorithm)
+
+    headers = None
+    if private_key is None:
+        signing = keyring.signing
+        private_key, algorithm = signing.signing_key, signing.algorithm
+        headers = {"kid": signing.kid}
+
+    # iat с долями секунды (RFC 7519 допускает дробный NumericDate): по нему
+    # реестр отзыва отличает токены, выданные до и после отзыва в одну секунду
+    to_encode.update(exp=expire, iat=now.timestamp())
+    start = perf_counter()
+    encoded = jwt.encode(
+        payload=to_encode,
+        key=private_key,
+        algorithm=algorithm or keyring.signing.algorithm,
+        headers=headers,
+    )
+    JWT_DURATION.labels("encode").observe(perf_counter() - start)
     return encoded
 
 
 def decode_jwt(
     token: str,
-    public_key: str = settings.auth_jwt.public_key_path.read_text(),
-    algorithm: str = settings.auth_jwt.algorithm,
+    public_key: PublicKey | str | None = None,
+    algorithm: str | None = None,
+    keyring: JWTKeyring = jwt_keyring,
 ) -> Any:
-    decoded = jwt.decode(jwt=token, key=public_key, algorithms=algorithm)
+    start = perf_counter()
+    if public_key is None:
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = keyring.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key - {kid}")
+        # Алгоритм берем из ключа, а не из заголовка токена
+        public_key, algorithm = key.verifying_key, key.algorithm
+
+    decoded = jwt.decode(
+        jwt=token, key=public_key, algorithms=[algorithm or keyring.signing.algorithm]
+    )
+    JWT_DURATION.labels("decode").observe(perf_counter() - start)
     return decoded
@@ -0,0 +1,468 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from statistics import mean, quantiles
+from time import perf_counter
+from uuid import uuid4
+
+import grpc
+import httpx
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from benchmarks.jwt_algorithms import KEY_FACTORIES, to_pem
+
+
+# Сквозной нагрузочный прогон auth_service: поднимает users_service (gRPC) и auth_service
+# (uvicorn) отдельными процессами на локальном Postgres и гоняет циклы
+# register -> token -> refresh x N -> change-password -> token -> logout
+# на каждом уровне concurrency. Для уровня: RPS, p50/p95/p99 по операциям,
+# SQL запросов на запрос (db_query_duration_seconds_count из /metrics обоих сервисов)
+# и CPU на запрос (utime + stime из /proc, только Linux).
+# Результат - JSON; с --baseline сравнивается с прошлым прогоном, код выхода 1 при регрессии.
+#
+# Базы и брокер: auth - из DB_* переменных (как у сервиса), users - та же БД-сервер,
+# имя из --users-db. Схемы должны быть накатаны (alembic upgrade head) или --migrate.
+# Оба сервиса при старте подключаются к Kafka: docker compose up -d kafka из корня.
+# Запуск из каталога auth_service:
+#   python -m benchmarks.auth_flows --concurrency 1 8 32 --output auth_flows.json
+#   python -m benchmarks.auth_flows --concurrency 1 8 32 --baseline auth_flows.json
+# bcrypt с 12 раундами съедает почти весь CPU; --bcrypt-rounds 4 показывает остальной путь
+
+EMAIL_DOMAIN = "auth-flows.example.com"
+AUTH_DIR = Path(__file__).resolve().parent.parent
+USERS_DIR = AUTH_DIR.parent / "users_service"
+OPERATIONS = ("register", "token", "refresh", "change_password", "logout")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+DB_QUERIES = re.compile(r"^db_query_duration_seconds_count\{.*\} ([0-9.e+]+)$", re.MULTILINE)
+
+
+class FlowError(Exception):
+    def __init__(self, operation: str, status_code: int):
+        super().__init__(f"{operation}: HTTP {status_code}")
+        self.operation = operation
+        self.status_code = status_code
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# CPU процесса и его прямых потомков (пул хеширования в режиме process), в секундах
+def cpu_seconds(pid: int) -> float:
+    pids = [pid]
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            pids.append(int(stat.parent.name))
+
+    ticks = 0
+    for child in pids:
+        try:
+            fields = Path(f"/proc/{child}/stat").read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # После имени процесса: utime и stime - 12-е и 13-е поля
+        ticks += int(fields[11]) + int(fields[12])
+    return ticks / CLOCK_TICKS
+
+
+def db_queries(metrics_text: str) -> float:
+    return sum(float(value) for value in DB_QUERIES.findall(metrics_text))
+
+
+class Service:
+    def __init__(self, name: str, args: list[str], cwd: Path, env: dict[str, str], log_dir: Path):
+        self.name = name
+        self.log_path = log_dir / f"{name}.log"
+        self._log = open(self.log_path, "w")
+        self.process = subprocess.Popen(
+            [sys.executable, *args], cwd=cwd, env=env, stdout=self._log, stderr=subprocess.STDOUT
+        )
+
+    def check_alive(self) -> None:
+        if self.process.poll() is not None:
+            tail = self.log_path.read_text()[-3000:]
+            raise RuntimeError(f"{self.name} exited with {self.process.returncode}:\n{tail}")
+
+    def stop(self) -> None:
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self._log.close()
+
+
+def service_env(db_name: str, extra: dict[str, str]) -> dict[str, str]:
+    url = make_url(settings.DATABASE_URL)
+    env = dict(os.environ)
+    env.update(
+        DB_HOST=url.host or "localhost",
+        DB_PORT=str(url.port or 5432),
+        DB_NAME=db_name,
+        DB_USER=url.username or "",
+        DB_PASS=url.password or "",
+        KAFKA_BOOTSTRAP_SERVERS=settings.KAFKA_BOOTSTRAP_SERVERS,
+        PYTHONUNBUFFERED="1",
+    )
+    env.update(extra)
+    return env
+
+
+# Ключей подписи нет (certs/ не в репозитории) - временная пара для прогона
+def jwt_key_env(key_dir: Path) -> dict[str, str]:
+    jwt_config = settings.auth_jwt
+    if jwt_config.keys or jwt_config.private_key_path.exists():
+        return {}
+    private_pem, public_pem = to_pem(KEY_FACTORIES[jwt_config.algorithm]())
+    private_path, public_path = key_dir / "jwt_private.pem", key_dir / "jwt_public.pem"
+    private_path.write_text(private_pem)
+    public_path.write_text(public_pem)
+    return {
+        "AUTH_JWT__PRIVATE_KEY_PATH": str(private_path),
+        "AUTH_JWT__PUBLIC_KEY_PATH": str(public_path),
+    }
+
+
+def migrate(cwd: Path, env: dict[str, str]) -> None:
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=cwd, env=env, check=True)
+
+
+async def wait_ready(services: list[Service], client: httpx.AsyncClient, grpc_target: str, users_metrics: str) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + 60
+    async with grpc.aio.insecure_channel(grpc_target) as channel:
+        while True:
+            for service in services:
+                service.check_alive()
+            try:
+                await asyncio.wait_for(channel.channel_ready(), timeout=0.5)
+                auth = await client.get("/metrics")
+                users = await client.get(users_metrics)
+                if auth.status_code == 200 and users.status_code == 200:
+                    return
+            except (asyncio.TimeoutError, httpx.TransportError):
+                pass
+            if loop.time() > deadline:
+                raise RuntimeError("services did not become ready in 60 seconds")
+            await asyncio.sleep(0.2)
+
+
+class FlowRunner:
+    def __init__(self, client: httpx.AsyncClient, run_id: str, refreshes: int):
+        self.client = client
+        self.run_id = run_id
+        self.refreshes = refreshes
+        self.latencies: dict[str, list[float]] = {operation: [] for operation in OPERATIONS}
+        self.errors: dict[str, int] = {}
+        self._emails = 0
+
+    async def call(self, operation: str, expected: int, method: str, url: str, **kwargs) -> httpx.Response:
+        start = perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.latencies[operation].append(perf_counter() - start)
+        if response.status_code != expected:
+            raise FlowError(operation, response.status_code)
+        return response
+
+    def _bearer(self, token: str) -> dict[str, str]:
+        return {"Authorization": f"Bearer {token}"}
+
+    async def cycle(self) -> None:
+        self._emails += 1
+        email = f"{self.run_id}-{self._emails}@{EMAIL_DOMAIN}"
+        password, new_password = "benchmark-password", "benchmark-password-2"
+
+        await self.call("register", 200, "POST", "/auth/register", data={"username": email, "password": password})
+        tokens = (
+            await self.call("token", 200, "POST", "/auth/token", data={"username": email, "password": password})
+        ).json()
+        for _ in range(self.refreshes):
+            tokens = (
+                await self.call("refresh", 200, "POST", "/auth/refresh", headers=self._bearer(tokens["refresh_token"]))
+            ).json()
+        await self.call(
+            "change_password", 204, "POST", "/auth/change-password",
+            json={"old_password": password, "new_password": new_password},
+            headers=self._bearer(tokens["access_token"]),
+        )
+        # Смена пароля отзывает выданные токены - для logout входим заново
+        tokens = (
+            await self.call("token", 200, "POST", "/auth/token", data={"username": email, "password": new_password})
+        ).json()
+        await self.call("logout", 204, "POST", "/auth/logout", headers=self._bearer(tokens["access_token"]))
+
+    async def worker(self, cycles: int) -> None:
+        for _ in range(cycles):
+            try:
+                await self.cycle()
+            except FlowError as e:
+                key = f"{e.operation}:{e.status_code}"
+                self.errors[key] = self.errors.get(key, 0) + 1
+            except httpx.TransportError as e:
+                key = type(e).__name__
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+
+def latency_summary(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ms = [value * 1000 for value in values]
+    cuts = quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else [ms[0]] * 99
+    return {
+        "count": len(ms),
+        "mean": round(mean(ms), 3),
+        "p50": round(cuts[49], 3),
+        "p95": round(cuts[94], 3),
+        "p99": round(cuts[98], 3),
+    }
+
+
+async def scrape(client: httpx.AsyncClient, users_metrics: str) -> dict[str, float]:
+    auth, users = await asyncio.gather(client.get("/metrics"), client.get(users_metrics))
+    return {"auth": db_queries(auth.text), "users": db_queries(users.text)}
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    services: dict[str, Service],
+    users_metrics: str,
+    concurrency: int,
+    cycles: int,
+    refreshes: int,
+) -> dict:
+    runners = [FlowRunner(client, f"c{concurrency}-w{i}-{uuid4().hex[:8]}", refreshes) for i in range(concurrency)]
+
+    queries_before = await scrape(client, users_metrics)
+    cpu_before = {name: cpu_seconds(service.process.pid) for name, service in services.items()}
+    start = perf_counter()
+    await asyncio.gather(*(runner.worker(cycles) for runner in runners))
+    wall = perf_counter() - start
+    cpu_after = {name: cpu_seconds(service.process.pid) for name, service in services.items()}
+    queries_after = await scrape(client, users_metrics)
+
+    latencies: dict[str, list[float]] = {operation: [] for operation in OPERATIONS}
+    errors: dict[str, int] = {}
+    for runner in runners:
+        for operation, values in runner.latencies.items():
+            latencies[operation].extend(values)
+        for key, value in runner.errors.items():
+            errors[key] = errors.get(key, 0) + value
+
+    requests = sum(len(values) for values in latencies.values())
+    per_request = max(requests, 1)
+    db = {name: (queries_after[name] - queries_before[name]) / per_request for name in services}
+    cpu = {name: (cpu_after[name] - cpu_before[name]) * 1000 / per_request for name in services}
+    return {
+        "concurrency": concurrency,
+        "cycles": cycles * concurrency,
+        "requests": requests,
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(requests / wall, 2),
+        "latency_ms": {
+            "all": latency_summary([value for values in latencies.values() for value in values]),
+            **{operation: latency_summary(values) for operation, values in latencies.items()},
+        },
+        "db_queries_per_request": {
+            **{name: round(value, 3) for name, value in db.items()},
+            "total": round(sum(db.values()), 3),
+        },
+        "cpu_ms_per_request": {
+            **{name: round(value, 3) for name, value in cpu.items()},
+            "total": round(sum(cpu.values()), 3),
+        },
+    }
+
+
+async def cleanup(users_db: str) -> None:
+    users_url = make_url(settings.DATABASE_URL).set(database=users_db)
+    users_engine = create_async_engine(users_url)
+    auth_engine = create_async_engine(settings.DATABASE_URL)
+    try:
+        async with users_engine.begin() as conn:
+            result = await conn.execute(
+                text("DELETE FROM users WHERE email LIKE :pattern RETURNING id"),
+                {"pattern": f"%@{EMAIL_DOMAIN}"},
+            )
+            user_ids = [row[0] for row in result]
+        if user_ids:
+            async with auth_engine.begin() as conn:
+                for table in ("refresh_tokens", "credentials"):
+                    await conn.execute(
+                        text(f"DELETE FROM {table} WHERE user_id IN :ids").bindparams(
+                            bindparam("ids", expanding=True)
+                        ),
+                        {"ids": user_ids},
+                    )
+    finally:
+        await users_engine.dispose()
+        await auth_engine.dispose()
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=AUTH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# (путь к значению, больше - лучше)
+COMPARED: tuple[tuple[tuple[str, ...], bool], ...] = (
+    (("throughput_rps",), True),
+    (("latency_ms", "all", "p50"), False),
+    (("latency_ms", "all", "p95"), False),
+    (("latency_ms", "all", "p99"), False),
+    (("db_queries_per_request", "total"), False),
+    (("cpu_ms_per_request", "total"), False),
+)
+
+
+def compare(baseline: dict, current: dict, max_regression: float) -> list[str]:
+    regressions = []
+    old_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in current["levels"]:
+        old = old_levels.get(level["concurrency"])
+        if old is None:
+            continue
+        print(f"\nconcurrency={level['concurrency']} vs baseline {baseline['meta'].get('git_commit')}")
+        for path, higher_is_better in COMPARED:
+            old_value, new_value = old, level
+            for key in path:
+                old_value, new_value = old_value.get(key), new_value.get(key)
+            if not old_value or new_value is None:
+                continue
+            change = (new_value - old_value) / old_value
+            worse = -change if higher_is_better else change
+            mark = "REGRESSION" if worse > max_regression else ""
+            name = ".".join(path)
+            print(f"  {name:<28} {old_value:>10.3f} -> {new_value:>10.3f} {change:>+8.1%} {mark}")
+            if mark:
+                regressions.append(f"concurrency={level['concurrency']} {name} {change:+.1%}")
+    return regressions
+
+
+def print_level(level: dict) -> None:
+    latency = level["latency_ms"]
+    print(
+        f"concurrency={level['concurrency']:<4} rps={level['throughput_rps']:<8} "
+        f"p50={latency['all'].get('p50')} p95={latency['all'].get('p95')} p99={latency['all'].get('p99')} ms "
+        f"db/request={level['db_queries_per_request']['total']} "
+        f"cpu/request={level['cpu_ms_per_request']['total']} ms errors={sum(level['errors'].values())}"
+    )
+    for operation in OPERATIONS:
+        stats = latency[operation]
+        if stats["count"]:
+            print(f"    {operation:<16} n={stats['count']:<6} p50={stats['p50']} p95={stats['p95']} p99={stats['p99']} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Сквозной нагрузочный прогон сценариев auth_service")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--cycles", type=int, default=5, help="циклов на виртуального пользователя")
+    parser.add_argument("--refreshes", type=int, default=3, help="refresh подряд в одном цикле")
+    parser.add_argument("--warmup-cycles", type=int, default=3)
+    parser.add_argument("--users-db", default="users")
+    parser.add_argument("--bcrypt-rounds", type=int, default=None)
+    parser.add_argument("--migrate", action="store_true", help="alembic upgrade head в обеих базах")
+    parser.add_argument("--keep-data", action="store_true", help="не удалять созданных пользователей")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--max-regression", type=float, default=0.1, help="допустимое ухудшение, доля")
+    args = parser.parse_args()
+
+    grpc_port, users_metrics_port, auth_port = free_port(), free_port(), free_port()
+    grpc_target = f"127.0.0.1:{grpc_port}"
+    users_env = service_env(
+        args.users_db, {"GRPC_BIND": grpc_target, "GRPC_METRICS_PORT": str(users_metrics_port)}
+    )
+    log_dir = Path(tempfile.mkdtemp(prefix="auth-flows-"))
+    auth_extra = {"USERS_GRPC__TARGETS": json.dumps([grpc_target]), **jwt_key_env(log_dir)}
+    if args.bcrypt_rounds is not None:
+        auth_extra["PASSWORD_HASHING__BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    auth_env = service_env(make_url(settings.DATABASE_URL).database or "", auth_extra)
+
+    if args.migrate:
+        migrate(USERS_DIR, users_env)
+        migrate(AUTH_DIR, auth_env)
+
+    services = {
+        "users": Service("users", ["-m", "gRPC.src.server"], USERS_DIR, users_env, log_dir),
+        "auth": Service(
+            "auth",
+            ["-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(auth_port), "--no-access-log"],
+            AUTH_DIR,
+            auth_env,
+            log_dir,
+        ),
+    }
+    users_metrics = f"http://127.0.0.1:{users_metrics_port}/metrics"
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 4)
+
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{auth_port}", limits=limits, timeout=30) as client:
+            await wait_ready(list(services.values()), client, grpc_target, users_metrics)
+            # Прогрев: пулы соединений, кеши выражений, каналы gRPC
+            await run_level(client, services, users_metrics, 2, args.warmup_cycles, args.refreshes)
+
+            levels = []
+            for concurrency in args.concurrency:
+                level = await run_level(client, services, users_metrics, concurrency, args.cycles, args.refreshes)
+                print_level(level)
+                levels.append(level)
+    finally:
+        for service in services.values():
+            service.stop()
+        if not args.keep_data:
+            await cleanup(args.users_db)
+    print(f"\nservice logs and keys: {log_dir}")
+
+    result = {
+        "meta": {
+            "git_commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "cycles": args.cycles,
+            "refreshes": args.refreshes,
+            "bcrypt_rounds": args.bcrypt_rounds or settings.password_hashing.bcrypt_rounds,
+            "hashing_scheme": settings.password_hashing.scheme,
+        },
+        "levels": levels,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"results: {args.output}")
+
+    if args.baseline is not None:
+        regressions = compare(json.loads(args.baseline.read_text()), result, args.max_regression)
+        if regressions:
+            print("\nregressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
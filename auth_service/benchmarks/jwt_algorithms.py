@@ -0,0 +1,76 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from typing import Callable
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from app.core.jwt_keys import PrivateKey
+
+
+# Микробенчмарк подписи/проверки access токена для каждого алгоритма.
+# Запуск из каталога auth_service: python -m benchmarks.jwt_algorithms
+KEY_FACTORIES: dict[str, Callable[[], PrivateKey]] = {
+    "RS256": lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+    "ES256": lambda: ec.generate_private_key(ec.SECP256R1()),
+    "EdDSA": lambda: ed25519.Ed25519PrivateKey.generate(),
+}
+
+
+def ops_per_sec(func: Callable[[], object], duration: float) -> float:
+    operations = 0
+    start = perf_counter()
+    deadline = start + duration
+    while perf_counter() < deadline:
+        func()
+        operations += 1
+    return operations / (perf_counter() - start)
+
+
+def to_pem(private_key: PrivateKey) -> tuple[str, str]:
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    ).decode()
+    return private_pem, public_pem
+
+
+def bench_algorithm(algorithm: str, duration: float) -> dict[str, float]:
+    private_key = KEY_FACTORIES[algorithm]()
+    public_key = private_key.public_key()
+    private_pem, public_pem = to_pem(private_key)
+
+    now = datetime.now(timezone.utc)
+    payload = {"sub": "6f1c1f9e-3f7a-4c55-9a57-1b0f3d6f0b8e", "iat": now, "exp": now + timedelta(minutes=5)}
+    token = jwt.encode(payload, private_key, algorithm=algorithm)
+
+    return {
+        "sign_pem": ops_per_sec(lambda: jwt.encode(payload, private_pem, algorithm=algorithm), duration),
+        "sign_cached": ops_per_sec(lambda: jwt.encode(payload, private_key, algorithm=algorithm), duration),
+        "verify_pem": ops_per_sec(lambda: jwt.decode(token, public_pem, algorithms=[algorithm]), duration),
+        "verify_cached": ops_per_sec(lambda: jwt.decode(token, public_key, algorithms=[algorithm]), duration),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JWT sign/verify ops/sec по алгоритмам")
+    parser.add_argument("--duration", type=float, default=1.0, help="секунд на каждый замер")
+    parser.add_argument("--algorithms", nargs="+", default=list(KEY_FACTORIES), choices=list(KEY_FACTORIES))
+    args = parser.parse_args()
+
+    columns = ("sign_pem", "sign_cached", "verify_pem", "verify_cached")
+    print(f"{'algorithm':<10}" + "".join(f"{column:>15}" for column in columns))
+    for algorithm in args.algorithms:
+        result = bench_algorithm(algorithm, args.duration)
+        print(f"{algorithm:<10}" + "".join(f"{result[column]:>15.0f}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
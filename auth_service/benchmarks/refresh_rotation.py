@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+from statistics import quantiles
+from time import perf_counter
+from uuid import uuid4
+
+from sqlalchemy import delete, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.core.security import hash_refresh_token
+from app.crud.auth import (
+    create_refresh_token,
+    enforce_refresh_token_limit,
+    revoke_token,
+    rotate_refresh_token,
+)
+from app.db.base import Base
+from app.db.models import RefreshToken
+from app.utils.refresh_token import generate_refresh_token
+
+
+# Сравнение ротации refresh токена: старый путь (revoke + limit + insert/refresh)
+# против одного запроса с CTE. Нужна отдельная БД, таблицы создаются при необходимости.
+# Запуск из каталога auth_service: python -m benchmarks.refresh_rotation --iterations 2000
+
+
+def new_token_data() -> tuple[str, dict]:
+    token = generate_refresh_token()
+    return token, {
+        "token_hash": hash_refresh_token(token),
+        "expires_at": datetime.now(timezone.utc) + timedelta(days=30),
+    }
+
+
+async def legacy_refresh(session, raw_token: str) -> str:
+    user_id, _ = await revoke_token(session, hash_refresh_token(raw_token))
+    await enforce_refresh_token_limit(session, user_id)
+    token, data = new_token_data()
+    await create_refresh_token(session, {"user_id": user_id, **data})
+    return token
+
+
+async def cte_refresh(session, raw_token: str) -> str:
+    token, data = new_token_data()
+    await rotate_refresh_token(session, hash_refresh_token(raw_token), data)
+    return token
+
+
+async def seed_users(session_maker, users: int, user_ids: list) -> list[str]:
+    current_tokens = []
+    async with session_maker() as session:
+        for _ in range(users):
+            user_id = uuid4()
+            user_ids.append(user_id)
+            # По 3 живых токена, как у пользователя с несколькими устройствами
+            for _ in range(3):
+                token, data = new_token_data()
+                session.add(RefreshToken(user_id=user_id, **data))
+            current_tokens.append(token)
+        await session.commit()
+    return current_tokens
+
+
+async def run_path(name, refresh, engine, session_maker, iterations: int, users: int, user_ids: list) -> dict:
+    tokens = await seed_users(session_maker, users, user_ids)
+
+    statements = 0
+
+    def count_statement(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+    timings = []
+    try:
+        for i in range(iterations):
+            index = i % users
+            start = perf_counter()
+            async with session_maker() as session:
+                tokens[index] = await refresh(session, tokens[index])
+                await session.commit()
+            timings.append((perf_counter() - start) * 1000)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+
+    percentiles = quantiles(timings, n=100)
+    return {
+        "path": name,
+        "statements_per_refresh": statements / iterations,
+        "p50_ms": percentiles[49],
+        "p99_ms": percentiles[98],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Ротация refresh токенов: round trips и задержка")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_async_engine(settings.DATABASE_URL)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    # Удаляем только токены тестовых пользователей
+    user_ids: list = []
+    try:
+        for name, refresh in (("legacy", legacy_refresh), ("cte", cte_refresh)):
+            result = await run_path(
+                name, refresh, engine, session_maker, args.iterations, args.users, user_ids
+            )
+            print(
+                f"{result['path']:<8} statements/refresh={result['statements_per_refresh']:.1f} "
+                f"p50={result['p50_ms']:.2f} ms p99={result['p99_ms']:.2f} ms"
+            )
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(delete(RefreshToken).where(RefreshToken.user_id.in_(user_ids)))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
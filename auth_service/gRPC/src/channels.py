@@ -0,0 +1,83 @@
+import json
+
+import grpc
+from grpc.aio import Channel
+
+from app.core.config import UsersGrpc, settings
+from common.instrumentation import GrpcClientMetricsInterceptor
+from common.tracing import GrpcClientTracingInterceptor
+
+
+COMPRESSION = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+# Повторяем только чтение: повтор CreateUserByEmail после UNAVAILABLE
+# может дойти до сервера второй раз и вернуть ALREADY_EXISTS
+RETRYABLE_METHODS = ("GetUserByEmail", "GetUsersByEmails", "GetUsersByIds")
+
+
+def build_service_config(config: UsersGrpc) -> str:
+    return json.dumps({
+        # round_robin распределяет вызовы по всем адресам, в которые резолвится target
+        "loadBalancingConfig": [{"round_robin": {}}],
+        "methodConfig": [{
+            "name": [
+                {"service": "users.v1.UserService", "method": method}
+                for method in RETRYABLE_METHODS
+            ],
+            "retryPolicy": {
+                "maxAttempts": config.retry_max_attempts,
+                "initialBackoff": f"{config.retry_initial_backoff_seconds}s",
+                "maxBackoff": f"{config.retry_max_backoff_seconds}s",
+                "backoffMultiplier": 2,
+                "retryableStatusCodes": ["UNAVAILABLE"],
+            },
+        }],
+    })
+
+
+def create_grpc_channel(target: str, config: UsersGrpc) -> Channel:
+    options = [
+        ("grpc.service_config", build_service_config(config)),
+        ("grpc.enable_retries", 1),
+        ("grpc.keepalive_time_ms", config.keepalive_time_ms),
+        ("grpc.keepalive_timeout_ms", config.keepalive_timeout_ms),
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.max_pings_without_data", 0),
+        # Иначе каналы с одинаковыми target и опциями делят одно TCP соединение
+        ("grpc.use_local_subchannel_pool", 1),
+    ]
+    interceptors: list = [GrpcClientMetricsInterceptor()]
+    if settings.TRACING.enabled:
+        # Трассировка снаружи: traceparent уходит в метаданные каждого вызова
+        interceptors.insert(0, GrpcClientTracingInterceptor())
+    return grpc.aio.insecure_channel(
+        target,
+        options=options,
+        compression=COMPRESSION[config.compression],
+        interceptors=interceptors,
+    )
+
+
+# Несколько каналов на каждую реплику users_service: одно HTTP/2 соединение
+# ограничено числом одновременных потоков, при всплеске входов вызовы встают в очередь
+class ChannelPool:
+    def __init__(self, channels: list[Channel]):
+        if not channels:
+            raise ValueError("At least one gRPC channel is required")
+        self.channels = channels
+
+    @classmethod
+    def from_config(cls, config: UsersGrpc) -> "ChannelPool":
+        return cls([
+            create_grpc_channel(target, config)
+            for target in config.targets
+            for _ in range(config.channels_per_target)
+        ])
+
+    async def close(self) -> None:
+        for channel in self.channels:
+            await channel.close()
@@ -1,21 +1,112 @@
+from itertools import cycle
+
 import gRPC.src.users_service_pb2 as pb
 import gRPC.src.users_service_pb2_grpc as grpc_pb
 import grpc
 from grpc.aio import Channel
 
+from app.core.exceptions import UsersServiceUnavailableError
+from app.utils.batching import MicroBatcher
+from app.utils.cache import AsyncTTLCache
+from app.utils.circuit_breaker import CircuitBreaker
+from gRPC.src.channels import ChannelPool
+
 
-def create_grpc_channel(target: str) -> Channel:
-    return grpc.aio.insecure_channel(target)
+# Коды, при которых users_service считается недоступным: они размыкают цепь
+UNAVAILABLE_CODES = (
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+)
 
 
 class UsersServiceClient:
-    def __init__(self, channel: Channel):
-        self._channel = channel
-        self._stub = grpc_pb.UserServiceStub(channel)
+    def __init__(
+        self,
+        channel: Channel | ChannelPool,
+        user_cache: AsyncTTLCache[str, pb.GetUserByEmailResponse] | None = None,
+        timeout_seconds: float | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+    ):
+        self._channels = channel if isinstance(channel, ChannelPool) else ChannelPool([channel])
+        # Стабы создаются один раз, вызовы раскладываются по каналам по кругу
+        self._next_stub = cycle(
+            [grpc_pb.UserServiceStub(channel) for channel in self._channels.channels]
+        ).__next__
+        self._timeout = timeout_seconds
+        self._breaker = circuit_breaker
+        # Короткоживущий кеш статуса пользователя: каждый /auth/token начинается с этого запроса
+        self._user_cache = user_cache
+        self._batcher: MicroBatcher[str, pb.GetUserByEmailResponse] | None = None
+
+    async def _call(self, method: str, request):
+        permit = self._breaker.acquire() if self._breaker is not None else "call"
+        if permit is None:
+            raise UsersServiceUnavailableError("Users service circuit is open")
+
+        try:
+            response = await getattr(self._next_stub(), method)(request, timeout=self._timeout)
+        except grpc.aio.AioRpcError as e:
+            if e.code() in UNAVAILABLE_CODES:
+                if self._breaker is not None:
+                    self._breaker.record_failure()
+                raise UsersServiceUnavailableError(f"Ошибка gRPC: {e.code()} - {e.details()}")
+            # Ответ пришел, значит сервис жив
+            if self._breaker is not None:
+                self._breaker.record_success()
+            raise
+        except Exception:
+            # Сбой без статуса gRPC (канал закрыт, ошибка сериализации) - тоже отказ
+            if self._breaker is not None:
+                self._breaker.record_failure()
+            raise
+        finally:
+            # Иначе отмененный пробный вызов навсегда оставит цепь полуоткрытой
+            if permit == "probe":
+                self._breaker.release_probe()
+
+        if self._breaker is not None:
+            self._breaker.record_success()
+        return response
+
+    # Параллельные get_user_by_email склеиваются в один GetUsersByEmails
+    def enable_batching(self, window_seconds: float, max_batch_size: int) -> None:
+        self._batcher = MicroBatcher(
+            self.get_users_by_emails,
+            window_seconds=window_seconds,
+            max_batch_size=max_batch_size,
+            name="users",
+        )
 
     async def get_user_by_email(self, email: str) -> pb.GetUserByEmailResponse | None:
+        if self._user_cache is None:
+            return await self._load_user_by_email(email)
+        return await self._user_cache.get_or_load(
+            email, lambda: self._load_user_by_email(email)
+        )
+
+    async def _load_user_by_email(self, email: str) -> pb.GetUserByEmailResponse | None:
+        if self._batcher is None:
+            return await self._fetch_user_by_email(email)
+        return await self._batcher.load(email)
+
+    # Ответ в формате одиночного GetUserByEmail, чтобы кеш и вызывающий код не различали пути
+    async def get_users_by_emails(self, emails: list[str]) -> dict[str, pb.GetUserByEmailResponse]:
         try:
-            response = await self._stub.GetUserByEmail(pb.GetUserByEmailRequest(email=email))
+            response = await self._call("GetUsersByEmails", pb.GetUsersByEmailsRequest(emails=emails))
+        except grpc.aio.AioRpcError as e:
+            raise RuntimeError(f"Ошибка gRPC: {e.code()} - {e.details()}")
+
+        return {
+            user.email: pb.GetUserByEmailResponse(
+                id=user.id, is_active=user.is_active, is_verified=user.is_verified
+            )
+            for user in response.users
+        }
+
+    async def _fetch_user_by_email(self, email: str) -> pb.GetUserByEmailResponse | None:
+        try:
+            response = await self._call("GetUserByEmail", pb.GetUserByEmailRequest(email=email))
             return response
         except grpc.aio.AioRpcError as e:
             if e.code() == grpc.StatusCode.NOT_FOUND:
@@ -25,8 +116,7 @@ class UsersServiceClient:
     
     async def create_user_by_email(self, email: str) -> pb.GetUserByEmailResponse | None:
         try:
-            response = await self._stub.CreateUserByEmail(pb.GetUserByEmailRequest(email=email))
-            return response
+            response = await self._call("CreateUserByEmail", pb.GetUserByEmailRequest(email=email))
         except grpc.aio.AioRpcError as e:
             if e.code() == grpc.StatusCode.ALREADY_EXISTS:
                 return None
@@ -34,6 +124,35 @@ class UsersServiceClient:
                 raise ValueError(f"Некоректный email: {email}")
             else:
                 raise RuntimeError(f"Ошибка gRPC: {e.code()} - {e.details()}")
+
+        # Перетираем возможный закешированный NOT_FOUND
+        if self._user_cache is not None:
+            self._user_cache.set(email, response)
+        return response
+
+    def invalidate_user(self, email: str | None = None, user_id: str | None = None) -> None:
+        if self._user_cache is None:
+            return
+        if email is not None:
+            self._user_cache.invalidate(email)
+        # При смене email старый ключ неизвестен - ищем запись по id
+        if user_id is not None:
+            self._user_cache.invalidate_where(lambda user: user.id == user_id)
+
+    # Обработчик событий users_service: {"event": "user.updated", "user_id": ..., "email": ...}
+    def handle_user_event(self, event: dict) -> None:
+        self.invalidate_user(email=event.get("email"), user_id=event.get("user_id"))
+
+    def cache_stats(self) -> dict | None:
+        return self._user_cache.stats() if self._user_cache is not None else None
+
+    def circuit_stats(self) -> dict | None:
+        return self._breaker.stats() if self._breaker is not None else None
+
+    def batching_stats(self) -> dict | None:
+        return self._batcher.stats() if self._batcher is not None else None
     
     async def close(self):
-        await self._channel.close()
\ No newline at end of file
+        if self._batcher is not None:
+            await self._batcher.close()
+        await self._channels.close()
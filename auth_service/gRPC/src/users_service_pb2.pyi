@@ -1,6 +1,9 @@
+from google.protobuf.internal import containers as _containers
+from google.protobuf.internal import enum_type_wrapper as _enum_type_wrapper
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import message as _message
-from typing import ClassVar as _ClassVar, Optional as _Optional
+from collections.abc import Iterable as _Iterable, Mapping as _Mapping
+from typing import ClassVar as _ClassVar, Optional as _Optional, Union as _Union
 
 DESCRIPTOR: _descriptor.FileDescriptor
 
@@ -19,3 +22,81 @@ class GetUserByEmailResponse(_message.Message):
     is_active: bool
     is_verified: bool
     def __init__(self, id: _Optional[str] = ..., is_active: bool = ..., is_verified: bool = ...) -> None: ...
+
+class GetUsersByEmailsRequest(_message.Message):
+    __slots__ = ("emails",)
+    EMAILS_FIELD_NUMBER: _ClassVar[int]
+    emails: _containers.RepeatedScalarFieldContainer[str]
+    def __init__(self, emails: _Optional[_Iterable[str]] = ...) -> None: ...
+
+class GetUsersByIdsRequest(_message.Message):
+    __slots__ = ("ids",)
+    IDS_FIELD_NUMBER: _ClassVar[int]
+    ids: _containers.RepeatedScalarFieldContainer[str]
+    def __init__(self, ids: _Optional[_Iterable[str]] = ...) -> None: ...
+
+class UserInfo(_message.Message):
+    __slots__ = ("id", "email", "is_active", "is_verified")
+    ID_FIELD_NUMBER: _ClassVar[int]
+    EMAIL_FIELD_NUMBER: _ClassVar[int]
+    IS_ACTIVE_FIELD_NUMBER: _ClassVar[int]
+    IS_VERIFIED_FIELD_NUMBER: _ClassVar[int]
+    id: str
+    email: str
+    is_active: bool
+    is_verified: bool
+    def __init__(self, id: _Optional[str] = ..., email: _Optional[str] = ..., is_active: bool = ..., is_verified: bool = ...) -> None: ...
+
+class GetUsersResponse(_message.Message):
+    __slots__ = ("users",)
+    USERS_FIELD_NUMBER: _ClassVar[int]
+    users: _containers.RepeatedCompositeFieldContainer[UserInfo]
+    def __init__(self, users: _Optional[_Iterable[_Union[UserInfo, _Mapping]]] = ...) -> None: ...
+
+class NewUser(_message.Message):
+    __slots__ = ("email", "is_active", "is_verified")
+    EMAIL_FIELD_NUMBER: _ClassVar[int]
+    IS_ACTIVE_FIELD_NUMBER: _ClassVar[int]
+    IS_VERIFIED_FIELD_NUMBER: _ClassVar[int]
+    email: str
+    is_active: bool
+    is_verified: bool
+    def __init__(self, email: _Optional[str] = ..., is_active: bool = ..., is_verified: bool = ...) -> None: ...
+
+class CreateUsersRequest(_message.Message):
+    __slots__ = ("users",)
+    USERS_FIELD_NUMBER: _ClassVar[int]
+    users: _containers.RepeatedCompositeFieldContainer[NewUser]
+    def __init__(self, users: _Optional[_Iterable[_Union[NewUser, _Mapping]]] = ...) -> None: ...
+
+class CreateUserResult(_message.Message):
+    __slots__ = ("index", "email", "status", "id", "error")
+    class Status(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+        __slots__ = ()
+        STATUS_UNSPECIFIED: _ClassVar[CreateUserResult.Status]
+        CREATED: _ClassVar[CreateUserResult.Status]
+        EXISTS: _ClassVar[CreateUserResult.Status]
+        DUPLICATE: _ClassVar[CreateUserResult.Status]
+        INVALID: _ClassVar[CreateUserResult.Status]
+    STATUS_UNSPECIFIED: CreateUserResult.Status
+    CREATED: CreateUserResult.Status
+    EXISTS: CreateUserResult.Status
+    DUPLICATE: CreateUserResult.Status
+    INVALID: CreateUserResult.Status
+    INDEX_FIELD_NUMBER: _ClassVar[int]
+    EMAIL_FIELD_NUMBER: _ClassVar[int]
+    STATUS_FIELD_NUMBER: _ClassVar[int]
+    ID_FIELD_NUMBER: _ClassVar[int]
+    ERROR_FIELD_NUMBER: _ClassVar[int]
+    index: int
+    email: str
+    status: CreateUserResult.Status
+    id: str
+    error: str
+    def __init__(self, index: _Optional[int] = ..., email: _Optional[str] = ..., status: _Optional[_Union[CreateUserResult.Status, str]] = ..., id: _Optional[str] = ..., error: _Optional[str] = ...) -> None: ...
+
+class CreateUsersResponse(_message.Message):
+    __slots__ = ("results",)
+    RESULTS_FIELD_NUMBER: _ClassVar[int]
+    results: _containers.RepeatedCompositeFieldContainer[CreateUserResult]
+    def __init__(self, results: _Optional[_Iterable[_Union[CreateUserResult, _Mapping]]] = ...) -> None: ...
@@ -0,0 +1,85 @@
+import asyncio
+import json
+from typing import Callable
+
+from aiokafka import AIOKafkaConsumer
+from opentelemetry.trace import SpanKind
+
+from app.core.config import settings
+from common.instrumentation import observe_consumed
+from common.tracing import kafka_context, tracer
+from app.services.revocation import revocation_registry
+
+
+# Без group_id каждый воркер auth_service читает все партиции топика:
+# сообщения нужны каждому процессу, а не одному из группы.
+# Ошибка чтения не останавливает слушателя: чтение возобновляется с растущей паузой,
+# иначе воркер молча перестал бы получать отзывы токенов
+class KafkaTopicListener:
+    def __init__(
+        self,
+        topic: str,
+        handler: Callable[[dict], None],
+        auto_offset_reset: str = "latest",
+        initial_backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 30.0,
+    ):
+        self._topic = topic
+        self._handler = handler
+        self._auto_offset_reset = auto_offset_reset
+        self._initial_backoff_seconds = initial_backoff_seconds
+        self._max_backoff_seconds = max_backoff_seconds
+        self.restarts = 0
+        self._consumer = None
+        self._consumer_task = None
+
+    async def start(self):
+        self._consumer = AIOKafkaConsumer(
+            self._topic,
+            bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
+            value_deserializer=lambda v: json.loads(v),
+            auto_offset_reset=self._auto_offset_reset,
+            enable_auto_commit=False,
+        )
+        await self._consumer.start()
+        self._consumer_task = asyncio.create_task(self.consume())
+
+    async def consume(self):
+        backoff = self._initial_backoff_seconds
+        while True:
+            try:
+                async for msg in self._consumer:
+                    backoff = self._initial_backoff_seconds
+                    observe_consumed(self._consumer, msg)
+                    with tracer.start_as_current_span(
+                        f"{msg.topic} process", context=kafka_context(msg.headers), kind=SpanKind.CONSUMER
+                    ):
+                        try:
+                            self._handler(msg.value)
+                        except (KeyError, TypeError, ValueError) as e:
+                            print(f"Некорректное сообщение {msg.topic}[{msg.offset}]: {e}")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.restarts += 1
+                print(f"Ошибка чтения {self._topic}, повтор через {backoff:.1f} с - {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self._max_backoff_seconds)
+
+    async def stop(self):
+        if self._consumer_task:
+            self._consumer_task.cancel()
+        if self._consumer:
+            await self._consumer.stop()
+
+
+def apply_revocation(message: dict) -> None:
+    revocation_registry.apply(message["user_id"], float(message["revoked_before"]))
+
+
+# Отметки отзыва читаются с начала топика: перезапущенный воркер должен узнать
+# об отзывах за последние access_token_expire_minutes, устаревшие отбросит реестр
+revocation_listener = KafkaTopicListener(
+    settings.token_revocation.topic, apply_revocation, auto_offset_reset="earliest"
+)
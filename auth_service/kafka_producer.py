@@ -1,6 +1,12 @@
 import json
+from time import perf_counter
 
 from aiokafka import AIOKafkaProducer
+from opentelemetry.trace import SpanKind
+
+from app.core.config import settings
+from common.instrumentation import observe_produce
+from common.tracing import kafka_headers, tracer
 
 
 class KafkaProducer:
@@ -9,7 +15,7 @@ class KafkaProducer:
 
     async def start(self):
         self._producer = AIOKafkaProducer(
-            bootstrap_servers="localhost:9092",
+            bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
             value_serializer=lambda v: json.dumps(v).encode("UTF-8"),
         )
         await self._producer.start()
@@ -18,9 +24,17 @@ class KafkaProducer:
         if self._producer:
             await self._producer.stop()
 
-    async def send_one(self, topic: str, message: dict):
+    async def send_one(self, topic: str, message: dict, key: str | None = None):
         if self._producer:
-            await self._producer.send_and_wait(topic=topic, value=message)
+            with tracer.start_as_current_span(f"{topic} publish", kind=SpanKind.PRODUCER):
+                start = perf_counter()
+                await self._producer.send_and_wait(
+                    topic=topic,
+                    value=message,
+                    key=key.encode() if key else None,
+                    headers=kafka_headers(),
+                )
+                observe_produce(topic, start)
 
 
 producer = KafkaProducer()
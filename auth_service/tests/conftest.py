@@ -0,0 +1,66 @@
+import os
+
+# Settings требует параметры подключения к БД при импорте app.core.config
+for name, value in {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "auth_test",
+    "DB_USER": "test",
+    "DB_PASS": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.core.config import TestSettings
+from app.db.base import Base
+from app.db.models import Credential, RefreshToken
+from common.testing import counted_queries, recorded_spans
+
+
+test_settings = TestSettings()  # type: ignore
+
+
+@pytest.fixture(scope="session")
+async def test_engine():
+    assert "test" in test_settings.DATABASE_URL
+    engine = create_async_engine(test_settings.DATABASE_URL, poolclass=NullPool)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+
+    await engine.dispose()
+
+
+@pytest.fixture(scope="session")
+async def async_session_maker(test_engine):
+    return async_sessionmaker(test_engine, expire_on_commit=False)
+
+
+@pytest.fixture
+async def db_session(async_session_maker):
+    async with async_session_maker() as session:
+        trans = await session.begin()
+        try:
+            yield session
+        finally:
+            await trans.rollback()
+
+
+@pytest.fixture
+def query_counter(test_engine):
+    with counted_queries(test_engine) as counter:
+        yield counter
+
+
+@pytest.fixture
+def spans():
+    with recorded_spans("auth_service") as recorded:
+        yield recorded
@@ -1,12 +1,59 @@
+import asyncio
+import importlib.util
+import json
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from uuid import uuid4
 import grpc
+import jwt
 import pytest
+from opentelemetry import trace
+from sqlalchemy import exc, text
+from fastapi import FastAPI, HTTPException
+from prometheus_client import REGISTRY
+from httpx import ASGITransport, AsyncClient
 
 import gRPC.src.users_service_pb2 as pb
 
 from unittest.mock import AsyncMock, patch
 from contextlib import nullcontext as does_not_raise
 
-from app.core.security import hash_secret, verify_secret
+from app.core.security import PasswordHashPolicy, hash_secret, verify_secret
+from app.core.hashing import AsyncSecretHasher
+from app.core.exceptions import HashingPoolSaturatedError
+from app.api.deps import get_jwt_keyring
+from app.api.routers.jwks import router as jwks_router
+from app.core.jwt_keys import JWTKeyManager, JWTKeyring, jwk_thumbprint
+from app.services.auth import AuthService
+from app.schemas.auth import AuthSchema
+from app.crud.auth import (
+    change_user_password,
+    create_credential,
+    get_credential_password_by_user_id,
+    update_password_hash,
+)
+from app.services.revocation import TokenRevocationRegistry
+from app.core.config import UsersGrpc
+from common.config import DBPool, Tracing
+from common.instrumentation import PrometheusMiddleware, StatsCollector, metrics_response
+from common.tracing import (
+    GrpcClientTracingInterceptor,
+    fastapi_telemetry,
+    kafka_context,
+    kafka_headers,
+    tracer,
+)
+from common.db_pool import create_pooled_engine, pool_stats
+from app.utils.batching import MicroBatcher
+from app.utils.circuit_breaker import CircuitBreaker
+from app.core.exceptions import UsersServiceUnavailableError
+from gRPC.src.channels import ChannelPool, build_service_config
+from app.utils.cache import AsyncTTLCache, TTLCache
+from app.utils.jwt import decode_jwt, encode_jwt
+from benchmarks.jwt_algorithms import KEY_FACTORIES, to_pem
+from gRPC.src.users_service_client import UsersServiceClient
+from kafka_consumer import KafkaTopicListener
 
 @pytest.mark.parametrize(
     "secret",
@@ -54,3 +101,741 @@ async def test_get_user_by_email_grpc(email, expected, response_data):
             assert resp.id == response_data.id
             assert resp.is_active is response_data.is_active
             assert resp.is_verified is response_data.is_verified
+
+
+@pytest.mark.asyncio
+async def test_async_secret_hasher():
+    hasher = AsyncSecretHasher(max_workers=2, max_pending=4)
+    calls = lambda operation: REGISTRY.get_sample_value(
+        "password_hashing_duration_seconds_count", {"operation": operation}
+    ) or 0
+    before = calls("hash"), calls("verify")
+    try:
+        hashed = await hasher.hash("example_password")
+        assert await hasher.verify("example_password", hashed) is True
+        assert await hasher.verify("wrong_password", hashed) is False
+
+        assert hasher.stats()["pending"] == 0
+        assert (calls("hash"), calls("verify")) == (before[0] + 1, before[1] + 2)
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_async_secret_hasher_saturated():
+    hasher = AsyncSecretHasher(max_workers=1, max_pending=2)
+    try:
+        results = await asyncio.gather(
+            *(hasher.hash("example_password") for _ in range(4)),
+            return_exceptions=True,
+        )
+        rejected = [r for r in results if isinstance(r, HashingPoolSaturatedError)]
+        assert len(rejected) == 2
+        assert hasher.stats()["rejected"] == 2
+    finally:
+        hasher.shutdown()
+
+
+# argon2-cffi - опциональная зависимость; политики строятся в самом тесте,
+# иначе без нее конструктор упадет еще при сборе тестов
+requires_argon2 = pytest.mark.skipif(
+    importlib.util.find_spec("argon2") is None, reason="argon2-cffi is not installed"
+)
+ARGON2_FAST = {"scheme": "argon2id", "argon2_time_cost": 1, "argon2_memory_cost": 1024}
+
+
+@pytest.mark.parametrize(
+    "policy, hashed_with, needs_rehash",
+    [
+        ({"bcrypt_rounds": 5}, {"bcrypt_rounds": 5}, False),
+        ({"bcrypt_rounds": 6}, {"bcrypt_rounds": 5}, True),
+        ({"bcrypt_rounds": 4}, {"bcrypt_rounds": 5}, True),
+        pytest.param(ARGON2_FAST, {"bcrypt_rounds": 4}, True, marks=requires_argon2),
+        pytest.param(
+            {**ARGON2_FAST, "argon2_time_cost": 2}, ARGON2_FAST, True, marks=requires_argon2
+        ),
+        pytest.param({"bcrypt_rounds": 4}, ARGON2_FAST, True, marks=requires_argon2),
+    ],
+)
+def test_password_hash_policy(policy: dict, hashed_with: dict, needs_rehash: bool):
+    policy = PasswordHashPolicy(**policy)
+    hashed = PasswordHashPolicy(**hashed_with).hash("example_password")
+
+    # Старые хеши проверяются при любой текущей схеме
+    assert policy.verify("example_password", hashed) is True
+    assert policy.verify("wrong_password", hashed) is False
+    assert policy.needs_rehash(hashed) is needs_rehash
+    assert policy.needs_rehash(policy.hash("example_password")) is False
+
+
+async def login_with_hash(session, password_hash: str, hasher: AsyncSecretHasher) -> str:
+    user_id = uuid4()
+    await create_credential(session, {"user_id": user_id, "password_hash": password_hash})
+    users_client = AsyncMock()
+    users_client.get_user_by_email.return_value = SimpleNamespace(
+        id=str(user_id), is_active=True, is_verified=True
+    )
+
+    with patch("app.services.auth.secret_hasher", hasher):
+        access = await AuthService(users_client).validate_active_auth_user(
+            session, AuthSchema(username="user@example.com", password="example_password")
+        )
+
+    assert access.sub == str(user_id)
+    return await get_credential_password_by_user_id(session, user_id)
+
+
+@pytest.mark.asyncio
+async def test_login_upgrades_outdated_hash(db_session):
+    hasher = AsyncSecretHasher(PasswordHashPolicy(bcrypt_rounds=5), max_workers=1)
+    try:
+        stored = await login_with_hash(db_session, hash_secret("example_password", rounds=4), hasher)
+    finally:
+        hasher.shutdown()
+
+    assert hasher.needs_rehash(stored) is False
+    assert verify_secret("example_password", stored)
+
+
+@pytest.mark.asyncio
+async def test_login_skips_rehash_when_pool_saturated(db_session):
+    hasher = AsyncSecretHasher(PasswordHashPolicy(bcrypt_rounds=5), max_workers=1)
+    outdated = hash_secret("example_password", rounds=4)
+    try:
+        with patch.object(hasher, "hash", AsyncMock(side_effect=HashingPoolSaturatedError(64))):
+            stored = await login_with_hash(db_session, outdated, hasher)
+    finally:
+        hasher.shutdown()
+
+    assert stored == outdated
+
+
+@pytest.mark.asyncio
+async def test_rehash_does_not_overwrite_changed_password(db_session):
+    user_id = uuid4()
+    verified = hash_secret("example_password", rounds=4)
+    await create_credential(db_session, {"user_id": user_id, "password_hash": verified})
+    # Пока вход пересчитывал хеш, пароль сменили
+    await change_user_password(db_session, user_id, hash_secret("new_password", rounds=4))
+    changed = await get_credential_password_by_user_id(db_session, user_id)
+
+    upgraded = hash_secret("example_password", rounds=5)
+    assert await update_password_hash(db_session, user_id, verified, upgraded) is False
+    assert await get_credential_password_by_user_id(db_session, user_id) == changed
+    assert await update_password_hash(db_session, user_id, changed, upgraded) is True
+
+
+def write_key_pair(directory: Path, algorithm: str, kid: str | None = None) -> JWTKeyManager:
+    name = kid or algorithm
+    private_key = KEY_FACTORIES[algorithm]()
+    private_pem, public_pem = to_pem(private_key)
+    (directory / f"{name}_private.pem").write_text(private_pem)
+    (directory / f"{name}_public.pem").write_text(public_pem)
+    return JWTKeyManager(
+        private_key_path=directory / f"{name}_private.pem",
+        public_key_path=directory / f"{name}_public.pem",
+        algorithm=algorithm,
+        kid=kid,
+    )
+
+
+@pytest.mark.parametrize("algorithm", ["RS256", "ES256", "EdDSA"])
+def test_jwt_key_manager(algorithm: str, tmp_path: Path):
+    keys = write_key_pair(tmp_path, algorithm)
+
+    # Ключи разбираются один раз и переиспользуются
+    assert keys.signing_key is keys.signing_key
+    assert keys.verifying_key is keys.verifying_key
+
+    before = time.time()
+    token = encode_jwt({"sub": "1"}, private_key=keys.signing_key, algorithm=algorithm)
+    payload = decode_jwt(token, public_key=keys.verifying_key, algorithm=algorithm)
+    assert payload["sub"] == "1"
+    # iat с долями секунды - для сравнения с отметкой отзыва
+    assert before <= payload["iat"] <= time.time()
+
+
+def test_jwt_key_manager_algorithm_mismatch(tmp_path: Path):
+    keys = write_key_pair(tmp_path, "ES256")
+    keys.algorithm = "RS256"
+
+    with pytest.raises(ValueError):
+        keys.signing_key
+
+
+def test_jwt_keyring_rotation(tmp_path: Path):
+    old_key = write_key_pair(tmp_path, "RS256", kid="old")
+    new_key = write_key_pair(tmp_path, "EdDSA", kid="new")
+
+    old_token = encode_jwt({"sub": "1"}, keyring=JWTKeyring([old_key]))
+    legacy_token = encode_jwt({"sub": "1"}, private_key=old_key.signing_key, algorithm="RS256")
+
+    # Старый ключ выведен из подписи, но токены, подписанные им, еще проверяются
+    old_key.private_key_path = None
+    keyring = JWTKeyring([old_key, new_key], active_kid="new")
+    new_token = encode_jwt({"sub": "2"}, keyring=keyring)
+
+    assert jwt.get_unverified_header(new_token)["kid"] == "new"
+    assert decode_jwt(old_token, keyring=keyring)["sub"] == "1"
+    assert decode_jwt(new_token, keyring=keyring)["sub"] == "2"
+
+    # Токен без kid проверяется активным ключом
+    with pytest.raises(jwt.InvalidTokenError):
+        decode_jwt(legacy_token, keyring=keyring)
+
+    with pytest.raises(jwt.InvalidTokenError):
+        decode_jwt(new_token, keyring=JWTKeyring([old_key]))
+
+
+@pytest.mark.asyncio
+async def test_jwks_endpoint(tmp_path: Path):
+    keyring = JWTKeyring(
+        [write_key_pair(tmp_path, "RS256", kid="rsa"), write_key_pair(tmp_path, "ES256")]
+    )
+    app = FastAPI()
+    app.include_router(jwks_router)
+    app.dependency_overrides[get_jwt_keyring] = lambda: keyring
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/.well-known/jwks.json")
+        assert response.status_code == 200
+        assert "max-age" in response.headers["cache-control"]
+
+        keys = {key["kid"]: key for key in response.json()["keys"]}
+        assert keys["rsa"]["kty"] == "RSA"
+        es_key = next(key for kid, key in keys.items() if kid != "rsa")
+        assert es_key["alg"] == "ES256"
+        assert jwk_thumbprint(es_key) == es_key["kid"]
+
+        cached = await client.get(
+            "/.well-known/jwks.json",
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+        assert cached.status_code == 304
+
+
+def test_ttl_cache():
+    now = 0.0
+    cache: TTLCache[str, int] = TTLCache(max_entries=2, ttl_seconds=10, clock=lambda: now)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    # "b" давно не читали - вытесняется первым
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.evictions == 1
+
+    now = 10.0
+    assert cache.get("a") is None
+    assert cache.get("c") is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_token_revocation_registry():
+    published = []
+
+    async def publisher(message: dict):
+        published.append(message)
+
+    registry = TokenRevocationRegistry(ttl_seconds=300, max_entries=10, publisher=publisher)
+    now = time.time()
+
+    assert registry.is_revoked("user", now - 10) is False
+
+    await registry.revoke_user("user")
+    assert published[0]["user_id"] == "user"
+    assert published[0]["revoked_before"] >= now
+    assert registry.is_revoked("user", now - 10) is True
+    # Токен, выданный в ту же секунду до отзыва, тоже недействителен
+    assert registry.is_revoked("user", now) is True
+    assert registry.is_revoked("user", published[0]["revoked_before"]) is False
+
+    # Отметка от другого воркера: более старая не перетирает новую, устаревшая игнорируется
+    registry.apply("user", now - 100)
+    assert registry.is_revoked("user", now - 10) is True
+    registry.apply("other", now - 1000)
+    assert registry.is_revoked("other", now - 2000) is False
+
+
+@pytest.mark.asyncio
+async def test_revocation_published_after_commit():
+    session = AsyncMock()
+    committed_before_publish = []
+
+    async def revoke_user(user_id):
+        committed_before_publish.append(session.commit.await_count == 1)
+
+    with (
+        patch("app.services.auth.revoke_all_user_tokens", AsyncMock()),
+        patch("app.services.auth.revocation_registry.revoke_user", revoke_user),
+    ):
+        await AuthService(AsyncMock()).logout(session, uuid4())
+
+    assert committed_before_publish == [True]
+
+
+@pytest.mark.asyncio
+async def test_kafka_listener_restarts_after_error():
+    handled = []
+
+    class Consumer:
+        def __init__(self):
+            self.reads = 0
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            self.reads += 1
+            if self.reads == 1:
+                raise RuntimeError("fetch failed")
+            if self.reads == 2:
+                return SimpleNamespace(
+                    topic="t", partition=0, offset=0, timestamp=time.time() * 1000,
+                    headers=[], value={"n": 1},
+                )
+            raise StopAsyncIteration
+
+        def highwater(self, partition):
+            return None
+
+    listener = KafkaTopicListener("t", handled.append, initial_backoff_seconds=0.01)
+    listener._consumer = Consumer()
+
+    await asyncio.wait_for(listener.consume(), 1)
+
+    assert handled == [{"n": 1}]
+    assert listener.restarts == 1
+
+
+@pytest.mark.asyncio
+async def test_async_ttl_cache_single_flight():
+    cache: AsyncTTLCache[str, str] = AsyncTTLCache(max_entries=10, ttl_seconds=10, negative_ttl_seconds=1)
+    calls = 0
+    release = asyncio.Event()
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "value"
+
+    waiters = [asyncio.create_task(cache.get_or_load("key", loader)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == ["value"] * 5
+    assert calls == 1
+    assert await cache.get_or_load("key", loader) == "value"
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 4, 1)
+
+
+@pytest.mark.asyncio
+async def test_async_ttl_cache_negative_and_invalidation():
+    now = 0.0
+    cache: AsyncTTLCache[str, str] = AsyncTTLCache(
+        max_entries=10, ttl_seconds=10, negative_ttl_seconds=1, clock=lambda: now
+    )
+    loader = AsyncMock(return_value=None)
+
+    assert await cache.get_or_load("missing", loader) is None
+    assert await cache.get_or_load("missing", loader) is None
+    assert loader.await_count == 1
+    assert cache.stats()["negative_hits"] == 1
+
+    # Отрицательный ответ живет меньше положительного
+    now = 1.0
+    loader.return_value = "created"
+    assert await cache.get_or_load("missing", loader) == "created"
+
+    now = 5.0
+    cache.invalidate_where(lambda value: value == "created")
+    assert await cache.get_or_load("missing", AsyncMock(return_value="fresh")) == "fresh"
+
+
+@pytest.mark.asyncio
+async def test_async_ttl_cache_invalidated_during_load():
+    cache: AsyncTTLCache[str, str] = AsyncTTLCache(max_entries=10, ttl_seconds=10, negative_ttl_seconds=1)
+    release = asyncio.Event()
+
+    async def stale_loader():
+        await release.wait()
+        return "stale"
+
+    task = asyncio.create_task(cache.get_or_load("key", stale_loader))
+    await asyncio.sleep(0)
+    cache.invalidate("key")
+    release.set()
+
+    assert await task == "stale"
+    assert await cache.get_or_load("key", AsyncMock(return_value="fresh")) == "fresh"
+
+
+@pytest.mark.asyncio
+async def test_users_service_client_cache():
+    user = pb.GetUserByEmailResponse(id="1", is_active=True, is_verified=False)
+    not_found = grpc.aio.AioRpcError(
+        code=grpc.StatusCode.NOT_FOUND,
+        details="User not found",
+        initial_metadata=grpc.aio.Metadata(),
+        trailing_metadata=grpc.aio.Metadata(),
+    )
+
+    with patch("gRPC.src.users_service_pb2_grpc.UserServiceStub") as MockStub:
+        stub_instance = MockStub.return_value
+        stub_instance.GetUserByEmail = AsyncMock(side_effect=[not_found, user])
+        stub_instance.CreateUserByEmail = AsyncMock(return_value=user)
+
+        cache = AsyncTTLCache(max_entries=10, ttl_seconds=10, negative_ttl_seconds=10)
+        client = UsersServiceClient(AsyncMock(), user_cache=cache)
+
+        assert await client.get_user_by_email("hello@example.com") is None
+        assert await client.get_user_by_email("hello@example.com") is None
+        assert stub_instance.GetUserByEmail.await_count == 1
+
+        # Созданный пользователь заменяет закешированный NOT_FOUND
+        await client.create_user_by_email("hello@example.com")
+        assert await client.get_user_by_email("hello@example.com") == user
+        assert stub_instance.GetUserByEmail.await_count == 1
+
+        client.handle_user_event({"event": "user.deactivated", "user_id": "1", "email": "other@example.com"})
+        assert await client.get_user_by_email("hello@example.com") == user
+        assert stub_instance.GetUserByEmail.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher():
+    batches = []
+
+    async def loader(keys: list[str]) -> dict[str, str]:
+        batches.append(sorted(keys))
+        return {key: key.upper() for key in keys if key != "missing"}
+
+    batcher: MicroBatcher[str, str] = MicroBatcher(loader, window_seconds=0.01, max_batch_size=3)
+
+    results = await asyncio.gather(
+        batcher.load("a"), batcher.load("b"), batcher.load("a"), batcher.load("missing")
+    )
+    assert results == ["A", "B", "A", None]
+    # Набралось max_batch_size уникальных ключей - пакет ушел, не дожидаясь окна
+    assert batches == [["a", "b", "missing"]]
+
+    results = await asyncio.gather(batcher.load("c"), batcher.load("d"))
+    assert results == ["C", "D"]
+    assert batches[1] == ["c", "d"]
+    assert batcher.stats()["requests"] == 6
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_error():
+    batcher: MicroBatcher[str, str] = MicroBatcher(AsyncMock(side_effect=RuntimeError("down")))
+
+    results = await asyncio.gather(batcher.load("a"), batcher.load("b"), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_users_service_client_batching():
+    users = pb.GetUsersResponse(
+        users=[pb.UserInfo(id="1", email="alice@example.com", is_active=True, is_verified=True)]
+    )
+
+    with patch("gRPC.src.users_service_pb2_grpc.UserServiceStub") as MockStub:
+        stub_instance = MockStub.return_value
+        stub_instance.GetUsersByEmails = AsyncMock(return_value=users)
+        stub_instance.GetUserByEmail = AsyncMock()
+
+        client = UsersServiceClient(AsyncMock())
+        client.enable_batching(window_seconds=0.005, max_batch_size=100)
+
+        alice, bob = await asyncio.gather(
+            client.get_user_by_email("alice@example.com"),
+            client.get_user_by_email("bob@example.com"),
+        )
+
+        assert alice == pb.GetUserByEmailResponse(id="1", is_active=True, is_verified=True)
+        assert bob is None
+        stub_instance.GetUsersByEmails.assert_awaited_once()
+        stub_instance.GetUserByEmail.assert_not_awaited()
+
+
+def test_circuit_breaker():
+    now = 0.0
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=5, clock=lambda: now)
+
+    breaker.record_failure()
+    assert breaker.allow() is True
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.allow() is False
+
+    # После таймаута пропускается ровно один пробный вызов
+    now = 5.0
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    now = 10.0
+    assert breaker.allow() is True
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.stats()["opened"] == 2
+
+
+def test_users_grpc_service_config():
+    service_config = json.loads(build_service_config(UsersGrpc()))
+
+    assert service_config["loadBalancingConfig"] == [{"round_robin": {}}]
+    method_config = service_config["methodConfig"][0]
+    assert {name["method"] for name in method_config["name"]} == {
+        "GetUserByEmail", "GetUsersByEmails", "GetUsersByIds"
+    }
+    assert method_config["retryPolicy"]["retryableStatusCodes"] == ["UNAVAILABLE"]
+
+
+@pytest.mark.asyncio
+async def test_users_service_client_circuit_breaker():
+    unavailable = grpc.aio.AioRpcError(
+        code=grpc.StatusCode.UNAVAILABLE,
+        details="Connection refused",
+        initial_metadata=grpc.aio.Metadata(),
+        trailing_metadata=grpc.aio.Metadata(),
+    )
+
+    with patch("gRPC.src.users_service_pb2_grpc.UserServiceStub") as MockStub:
+        stub_instance = MockStub.return_value
+        stub_instance.GetUserByEmail = AsyncMock(side_effect=unavailable)
+
+        client = UsersServiceClient(
+            ChannelPool([AsyncMock(), AsyncMock()]),
+            timeout_seconds=0.5,
+            circuit_breaker=CircuitBreaker(failure_threshold=2, reset_timeout_seconds=60),
+        )
+
+        for _ in range(3):
+            with pytest.raises(UsersServiceUnavailableError):
+                await client.get_user_by_email("hello@example.com")
+
+        # Третий вызов отклонен без обращения к users_service
+        assert stub_instance.GetUserByEmail.await_count == 2
+        assert stub_instance.GetUserByEmail.await_args.kwargs["timeout"] == 0.5
+        assert client.circuit_stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_probe_released():
+    now = 0.0
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_seconds=5, clock=lambda: now)
+
+    with patch("gRPC.src.users_service_pb2_grpc.UserServiceStub") as MockStub:
+        stub_instance = MockStub.return_value
+        client = UsersServiceClient(AsyncMock(), circuit_breaker=breaker)
+
+        # Ошибка вне gRPC считается сбоем и размыкает цепь
+        stub_instance.GetUserByEmail = AsyncMock(side_effect=ValueError("boom"))
+        with pytest.raises(ValueError):
+            await client.get_user_by_email("hello@example.com")
+        assert breaker.state == "open"
+
+        # Отмененный пробный вызов не блокирует следующий
+        now = 5.0
+        stub_instance.GetUserByEmail = AsyncMock(side_effect=asyncio.CancelledError)
+        with pytest.raises(asyncio.CancelledError):
+            await client.get_user_by_email("hello@example.com")
+        assert breaker.state == "half_open"
+
+        stub_instance.GetUserByEmail = AsyncMock(return_value=pb.GetUserByEmailResponse(id="1"))
+        assert (await client.get_user_by_email("hello@example.com")).id == "1"
+        assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_probe_released_only_by_probe():
+    now = 0.0
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_seconds=5, clock=lambda: now)
+    # По событию на вызов: тест сам решает, когда каждый из них завершится
+    in_flight: list[asyncio.Event] = []
+
+    async def slow_call(request, timeout):
+        finish = asyncio.Event()
+        in_flight.append(finish)
+        await finish.wait()
+        raise asyncio.CancelledError
+
+    async def wait_in_flight(count: int) -> None:
+        while len(in_flight) < count:
+            await asyncio.sleep(0)
+
+    with patch("gRPC.src.users_service_pb2_grpc.UserServiceStub") as MockStub:
+        MockStub.return_value.GetUserByEmail = slow_call
+        client = UsersServiceClient(AsyncMock(), circuit_breaker=breaker)
+
+        # Вызов начат при замкнутой цепи и завершится, когда проба уже занята
+        early = asyncio.create_task(client.get_user_by_email("early@example.com"))
+        await wait_in_flight(1)
+        breaker.record_failure()
+        now = 5.0
+        probe = asyncio.create_task(client.get_user_by_email("probe@example.com"))
+        await wait_in_flight(2)
+
+        in_flight[0].set()
+        with pytest.raises(asyncio.CancelledError):
+            await early
+        assert breaker.state == "half_open"
+        assert breaker.allow() is False
+
+        in_flight[1].set()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert breaker.allow() is True
+
+
+@pytest.mark.asyncio
+async def test_instrumented_pool(test_engine):
+    url = test_engine.url.render_as_string(hide_password=False)
+    engine = create_pooled_engine(
+        url, DBPool(size=1, max_overflow=0, timeout_seconds=0.1), name="test-pool"
+    )
+    wait_count = lambda: REGISTRY.get_sample_value("db_pool_wait_seconds_count", {"engine": "test-pool"}) or 0
+    waits_before = wait_count()
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert pool_stats(engine)["checked_out"] == 1
+
+            # Единственное соединение занято - второй вызов ждет timeout_seconds и падает
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+
+        stats = pool_stats(engine)
+        assert (stats["checked_out"], stats["waiters"]) == (0, 0)
+        assert (stats["checkouts"], stats["timeouts"]) == (1, 1)
+        assert wait_count() == waits_before + 2
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_instrumented_pool_pgbouncer_mode(test_engine):
+    url = test_engine.url.render_as_string(hide_password=False)
+    engine = create_pooled_engine(url, DBPool(pgbouncer=True))
+    try:
+        for _ in range(2):
+            async with engine.connect() as conn:
+                assert await conn.scalar(text("SELECT 1")) == 1
+
+        stats = pool_stats(engine)
+        assert stats["pool"] == "InstrumentedNullPool"
+        assert (stats["checkouts"], stats["checked_out"]) == (2, 0)
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_prometheus_middleware_route_labels():
+    app = FastAPI()
+    app.add_middleware(PrometheusMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int) -> dict:
+        return {"id": item_id}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/items/1")
+        await client.get("/items/2")
+        await client.get("/missing")
+
+    body = metrics_response().body.decode()
+    # Конкретные id не попадают в метки
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2.0' in body
+    assert 'route="/missing"' not in body
+    assert 'route="unmatched",status="404"' in body
+
+
+def test_stats_collector():
+    stats = {"hits": 3, "scheme": "bcrypt", "enabled": True, "rate_limit": {"tokens": 1.5}}
+
+    families = {
+        family.name: family
+        for family in StatsCollector("cache", lambda: [({"pool": "a"}, stats)]).collect()
+    }
+
+    # Строки и флаги пропускаются, вложенные словари разворачиваются в имя
+    assert set(families) == {"cache_hits", "cache_rate_limit_tokens"}
+    assert families["cache_hits"].samples[0].value == 3
+    assert families["cache_hits"].samples[0].labels == {"pool": "a"}
+    assert families["cache_rate_limit_tokens"].samples[0].value == 1.5
+
+
+@pytest.mark.asyncio
+async def test_hashing_saturated_response_is_generic():
+    with patch("app.services.auth.secret_hasher.hash", AsyncMock(side_effect=HashingPoolSaturatedError(64))):
+        with pytest.raises(HTTPException) as exc_info:
+            await AuthService(AsyncMock())._hash_password("secret")
+
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.detail == "Service overloaded, try again later"
+    assert exc_info.value.headers == {"Retry-After": "1"}
+
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+
+@pytest.mark.asyncio
+async def test_fastapi_telemetry_continues_trace(spans):
+    app = FastAPI(telemetry=fastapi_telemetry(Tracing(enabled=True)))
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int) -> dict:
+        return {"id": item_id}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/items/1", headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01"})
+
+    span = spans.by_name()["GET /items/{item_id}"]
+    assert format(span.context.trace_id, "032x") == TRACE_ID
+    assert span.attributes["http.response.status_code"] == 200
+
+
+@pytest.mark.asyncio
+async def test_grpc_client_tracing_interceptor(spans):
+    sent = {}
+
+    class Call:
+        async def code(self):
+            return grpc.StatusCode.NOT_FOUND
+
+    async def continuation(details, request):
+        sent["metadata"] = dict(details.metadata)
+        return Call()
+
+    details = grpc.aio.ClientCallDetails(
+        "/users.v1.UserService/GetUserByEmail", 1.0, None, None, None
+    )
+    with tracer.start_as_current_span("login"):
+        await GrpcClientTracingInterceptor().intercept_unary_unary(continuation, details, None)
+
+    finished = spans.by_name()
+    rpc = finished["users.v1.UserService/GetUserByEmail"]
+    assert rpc.parent.span_id == finished["login"].context.span_id
+    assert rpc.status.status_code == trace.StatusCode.ERROR
+    # Сервер продолжит трассу от span вызова
+    assert sent["metadata"]["traceparent"].split("-")[2] == format(rpc.context.span_id, "016x")
+
+
+def test_kafka_trace_headers_roundtrip(spans):
+    assert kafka_headers() is None
+
+    with tracer.start_as_current_span("publish") as span:
+        headers = kafka_headers()
+
+    restored = trace.get_current_span(kafka_context(headers)).get_span_context()
+    assert restored.trace_id == span.get_span_context().trace_id
+    assert restored.span_id == span.get_span_context().span_id
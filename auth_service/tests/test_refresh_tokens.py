@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select
+
+from app.core.security import hash_refresh_token
+from app.crud.auth import create_credential, create_refresh_token, rotate_refresh_token
+from app.db.models import RefreshToken
+
+
+async def add_token(db_session, user_id, raw_token: str, age_minutes: int = 0, expires_in_days: int = 30, revoked: bool = False):
+    now = datetime.now(timezone.utc)
+    token = RefreshToken(
+        user_id=user_id,
+        token_hash=hash_refresh_token(raw_token),
+        created_at=now - timedelta(minutes=age_minutes),
+        expires_at=now + timedelta(days=expires_in_days),
+        revoked_at=now if revoked else None,
+    )
+    db_session.add(token)
+    await db_session.flush()
+    return token
+
+
+def new_token_data(raw_token: str) -> dict:
+    return {
+        "token_hash": hash_refresh_token(raw_token),
+        "expires_at": datetime.now(timezone.utc) + timedelta(days=30),
+    }
+
+
+async def live_token_hashes(db_session, user_id) -> set[str]:
+    result = await db_session.execute(
+        select(RefreshToken.token_hash).where(
+            RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None)
+        )
+    )
+    return set(result.scalars().all())
+
+
+async def test_rotate_refresh_token(db_session):
+    user_id = uuid4()
+    await add_token(db_session, user_id, "old")
+
+    result = await rotate_refresh_token(db_session, hash_refresh_token("old"), new_token_data("new"))
+
+    assert result == (user_id, False)
+    assert await live_token_hashes(db_session, user_id) == {hash_refresh_token("new")}
+
+
+async def test_rotate_refresh_token_reuse_detected(db_session):
+    user_id = uuid4()
+    await add_token(db_session, user_id, "old")
+    await rotate_refresh_token(db_session, hash_refresh_token("old"), new_token_data("new"))
+
+    result = await rotate_refresh_token(db_session, hash_refresh_token("old"), new_token_data("stolen"))
+
+    assert result == (user_id, True)
+    assert hash_refresh_token("stolen") not in await live_token_hashes(db_session, user_id)
+
+
+@pytest.mark.parametrize(
+    "raw_token, token_kwargs",
+    [
+        ("unknown", None),
+        ("expired", {"expires_in_days": -1}),
+    ],
+)
+async def test_rotate_refresh_token_invalid(db_session, raw_token: str, token_kwargs: dict | None):
+    user_id = uuid4()
+    if token_kwargs is not None:
+        await add_token(db_session, user_id, raw_token, **token_kwargs)
+
+    result = await rotate_refresh_token(db_session, hash_refresh_token(raw_token), new_token_data("new"))
+
+    assert result == (None, False)
+    assert hash_refresh_token("new") not in await live_token_hashes(db_session, user_id)
+
+
+async def test_rotate_refresh_token_enforces_limit(db_session):
+    user_id = uuid4()
+    await add_token(db_session, user_id, "oldest", age_minutes=30)
+    await add_token(db_session, user_id, "older", age_minutes=20)
+    await add_token(db_session, user_id, "current", age_minutes=10)
+    await add_token(db_session, user_id, "revoked", age_minutes=5, revoked=True)
+
+    result = await rotate_refresh_token(
+        db_session, hash_refresh_token("current"), new_token_data("new"), max_tokens=2
+    )
+
+    assert result == (user_id, False)
+    assert await live_token_hashes(db_session, user_id) == {
+        hash_refresh_token("older"),
+        hash_refresh_token("new"),
+    }
+
+
+async def test_write_queries_single_round_trip(db_session, query_counter):
+    user_id = uuid4()
+
+    with query_counter.assert_count(1):
+        credential = await create_credential(
+            db_session, {"user_id": user_id, "password_hash": "hashed"}
+        )
+    assert credential.created_at is not None
+
+    with query_counter.assert_count(1):
+        token = await create_refresh_token(db_session, {"user_id": user_id, **new_token_data("raw")})
+    assert token.created_at is not None
+
+    with query_counter.assert_count(1):
+        await rotate_refresh_token(db_session, hash_refresh_token("raw"), new_token_data("next"))
@@ -0,0 +1,37 @@
+from pathlib import Path
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+# Вложенные модели настроек, общие для всех сервисов
+
+
+# Настройки пула соединений с БД, задаются как DB_POOL__SIZE=20
+class DBPool(BaseModel):
+    size: int = Field(default=5, ge=1)
+    max_overflow: int = Field(default=10, ge=0)
+    # Сколько ждать свободного соединения, потом sqlalchemy.exc.TimeoutError
+    timeout_seconds: float = 30.0
+    # -1 - не пересоздавать соединения по возрасту
+    recycle_seconds: int = -1
+    pre_ping: bool = False
+    # Кеш подготовленных выражений на соединение (asyncpg и адаптер SQLAlchemy)
+    statement_cache_size: int = Field(default=100, ge=0)
+    # За PgBouncer в transaction mode: свой пул не держим (NullPool),
+    # подготовленные выражения отключены - соседний запрос может попасть на другой backend
+    pgbouncer: bool = False
+
+
+# Трассировка OpenTelemetry, задается как TRACING__ENABLED=true
+class Tracing(BaseModel):
+    enabled: bool = False
+    # file - JSON строка на span, console - stdout, otlp - collector по HTTP
+    exporter: Literal["file", "console", "otlp"] = "file"
+    # Относительно каталога, из которого запущен сервис
+    file_path: Path = Path("traces.jsonl")
+    otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    # Доля трасс, которые записываются; решение наследуют все сервисы на пути запроса
+    sample_ratio: float = Field(default=0.1, ge=0.0, le=1.0)
+    # Отдельные spans на зависимости, обработчик и сериализацию в FastAPI
+    operation_spans: bool = False
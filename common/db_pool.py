@@ -0,0 +1,132 @@
+from time import perf_counter
+from typing import Any
+from uuid import uuid4
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from prometheus_client import Histogram
+
+from common.config import DBPool
+
+
+# Ожидание соединения из пула обычно доли миллисекунды, бакеты мельче стандартных
+POOL_WAIT_BUCKETS: tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time to get a connection from the pool",
+    ["engine"],
+    buckets=POOL_WAIT_BUCKETS,
+)
+
+
+class PoolStats:
+    def __init__(self, engine_name: str = "primary"):
+        self.checked_out = 0
+        self.waiters = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time = DB_POOL_WAIT.labels(engine_name)
+
+
+# Считает выданные соединения, ожидающих и время ожидания соединения.
+# _do_get вызывается на каждую выдачу, в том числе когда приходится ждать или открывать новое
+class InstrumentedPoolMixin:
+    stats: PoolStats
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        stats = self.stats
+        stats.waiters += 1
+        start = perf_counter()
+        try:
+            record = super()._do_get()  # type: ignore[misc]
+        except exc.TimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.waiters -= 1
+            stats.wait_time.observe(perf_counter() - start)
+        stats.checked_out += 1
+        stats.checkouts += 1
+        return record
+
+    def _do_return_conn(self, record) -> None:
+        self.stats.checked_out -= 1
+        super()._do_return_conn(record)  # type: ignore[misc]
+
+    # dispose() заменяет пул новым экземпляром - счетчики переносим
+    def recreate(self):
+        pool = super().recreate()  # type: ignore[misc]
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class InstrumentedNullPool(InstrumentedPoolMixin, NullPool):
+    pass
+
+
+# name - метка engine у метрики ожидания соединения (primary, host:port реплики)
+def create_pooled_engine(url: str, config: DBPool, name: str = "primary") -> AsyncEngine:
+    engine = _create_engine(url, config)
+    engine.pool.stats = PoolStats(name)  # type: ignore[attr-defined]
+    return engine
+
+
+def _create_engine(url: str, config: DBPool) -> AsyncEngine:
+    if config.pgbouncer:
+        return create_async_engine(
+            url,
+            poolclass=InstrumentedNullPool,
+            pool_pre_ping=config.pre_ping,
+            connect_args={
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                # asyncpg нумерует выражения в пределах соединения, за PgBouncer имена совпали бы
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            },
+        )
+
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=config.size,
+        max_overflow=config.max_overflow,
+        pool_timeout=config.timeout_seconds,
+        pool_recycle=config.recycle_seconds,
+        pool_pre_ping=config.pre_ping,
+        # Выражения готовит адаптер SQLAlchemy (prepared_statement_cache_size),
+        # внутренний кеш asyncpg - для остальных вызовов; размер общий
+        connect_args={
+            "statement_cache_size": config.statement_cache_size,
+            "prepared_statement_cache_size": config.statement_cache_size,
+        },
+    )
+
+
+def pool_stats(engine: AsyncEngine) -> dict[str, Any]:
+    pool = engine.pool
+    stats: PoolStats = pool.stats  # type: ignore[attr-defined]
+    snapshot: dict[str, Any] = {
+        "pool": type(pool).__name__,
+        "checked_out": stats.checked_out,
+        "waiters": stats.waiters,
+        "checkouts": stats.checkouts,
+        "timeouts": stats.timeouts,
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        snapshot["size"] = pool.size()
+        snapshot["idle"] = pool.checkedin()
+        snapshot["overflow"] = pool.overflow()
+    return snapshot
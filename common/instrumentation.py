@@ -0,0 +1,262 @@
+from time import perf_counter, time
+from typing import Any, Callable, Iterable
+
+import grpc
+from aiokafka import TopicPartition
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+# Prometheus метрики сервисов. Общий модуль для всех сервисов,
+# каждый использует только нужные ему части
+
+# Бакеты гистограмм задержек, в секундах
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being processed", ["method"]
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement latency by first keyword",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_ERRORS = Counter("db_query_errors", "SQL statements that raised", ["operation"])
+GRPC_CLIENT_DURATION = Histogram(
+    "grpc_client_handling_seconds",
+    "Outgoing gRPC call latency including retries",
+    ["method", "code"],
+    buckets=LATENCY_BUCKETS,
+)
+GRPC_SERVER_DURATION = Histogram(
+    "grpc_server_handling_seconds",
+    "gRPC handler latency",
+    ["method", "code"],
+    buckets=LATENCY_BUCKETS,
+)
+KAFKA_PRODUCE_DURATION = Histogram(
+    "kafka_produce_duration_seconds",
+    "Time until the broker acknowledged a send",
+    ["topic"],
+    buckets=LATENCY_BUCKETS,
+)
+KAFKA_CONSUME_LAG = Histogram(
+    "kafka_consume_lag_seconds",
+    "Time between message timestamp and processing",
+    ["topic"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+KAFKA_CONSUMER_OFFSET_LAG = Gauge(
+    "kafka_consumer_offset_lag",
+    "Messages behind the partition high watermark",
+    ["topic", "partition"],
+)
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+# ASGI middleware: задержка по шаблону маршрута (/users/{user_id}, а не конкретный id)
+# и число запросов в обработке. Для стриминга время считается до конца тела ответа
+class PrometheusMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            # Несовпавшие пути сводим в одну метку, иначе сканеры раздуют число рядов
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                method, route.path if route is not None else "unmatched", str(status)
+            ).observe(perf_counter() - start)
+
+
+def _operation(statement: str) -> str:
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "EMPTY"
+
+
+# Время каждого SQL запроса через события SQLAlchemy; движки с execution_options
+# (read_engine) делят события с исходным движком
+def instrument_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        DB_QUERY_DURATION.labels(_operation(statement)).observe(perf_counter() - start)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("query_start") if context.connection else None
+        if starts:
+            starts.pop()
+        DB_QUERY_ERRORS.labels(_operation(context.statement or "")).inc()
+
+
+def _method_name(method: str | bytes) -> str:
+    if isinstance(method, bytes):
+        method = method.decode()
+    return method.rsplit("/", 1)[-1]
+
+
+class GrpcClientMetricsInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        start = perf_counter()
+        call = await continuation(client_call_details, request)
+        code = await call.code()
+        GRPC_CLIENT_DURATION.labels(
+            _method_name(client_call_details.method), code.name
+        ).observe(perf_counter() - start)
+        return call
+
+
+def _server_code(context, failed: bool) -> str:
+    code = context.code()
+    if code is None:
+        return "UNKNOWN" if failed else "OK"
+    # grpc.aio отдает код как StatusCode или как число из core
+    if isinstance(code, grpc.StatusCode):
+        return code.name
+    return next((status.name for status in grpc.StatusCode if status.value[0] == code), str(code))
+
+
+class GrpcServerMetricsInterceptor(grpc.aio.ServerInterceptor):
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+
+        method = _method_name(handler_call_details.method)
+
+        def observe(context, start: float, failed: bool) -> None:
+            GRPC_SERVER_DURATION.labels(method, _server_code(context, failed)).observe(
+                perf_counter() - start
+            )
+
+        def wrap_unary(behavior):
+            async def wrapper(request_or_iterator, context):
+                start = perf_counter()
+                failed = True
+                try:
+                    response = await behavior(request_or_iterator, context)
+                    failed = False
+                    return response
+                finally:
+                    observe(context, start, failed)
+            return wrapper
+
+        def wrap_stream(behavior):
+            async def wrapper(request_or_iterator, context):
+                start = perf_counter()
+                failed = True
+                try:
+                    async for response in behavior(request_or_iterator, context):
+                        yield response
+                    failed = False
+                finally:
+                    observe(context, start, failed)
+            return wrapper
+
+        if handler.unary_unary:
+            factory, behavior = grpc.unary_unary_rpc_method_handler, wrap_unary(handler.unary_unary)
+        elif handler.stream_unary:
+            factory, behavior = grpc.stream_unary_rpc_method_handler, wrap_unary(handler.stream_unary)
+        elif handler.unary_stream:
+            factory, behavior = grpc.unary_stream_rpc_method_handler, wrap_stream(handler.unary_stream)
+        else:
+            factory, behavior = grpc.stream_stream_rpc_method_handler, wrap_stream(handler.stream_stream)
+
+        return factory(
+            behavior,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer,
+        )
+
+
+def observe_produce(topic: str, start: float) -> None:
+    KAFKA_PRODUCE_DURATION.labels(topic).observe(perf_counter() - start)
+
+
+# Отставание по времени (от timestamp сообщения) и по offset (до high watermark партиции)
+def observe_consumed(consumer, msg) -> None:
+    KAFKA_CONSUME_LAG.labels(msg.topic).observe(max(0.0, time() - msg.timestamp / 1000))
+    highwater = consumer.highwater(TopicPartition(msg.topic, msg.partition))
+    if highwater is not None:
+        KAFKA_CONSUMER_OFFSET_LAG.labels(msg.topic, str(msg.partition)).set(
+            highwater - msg.offset - 1
+        )
+
+
+StatsSource = Callable[[], Iterable[tuple[dict[str, str], dict | None]]]
+
+
+# Отдает в /metrics уже существующие stats() (кеш, пул соединений, circuit breaker...)
+# как gauge; задержки пишутся прямо в Histogram. Источник вызывается на каждый сбор
+class StatsCollector:
+    def __init__(self, prefix: str, source: StatsSource):
+        self.prefix = prefix
+        self.source = source
+
+    # Пустое описание: не вызывать source при регистрации, пока сервис не запущен
+    def describe(self) -> list:
+        return []
+
+    def collect(self):
+        families: dict[str, Any] = {}
+
+        def add(name: str, labels: dict[str, str], value: Any) -> None:
+            if isinstance(value, bool) or value is None:
+                return
+            if isinstance(value, (int, float)):
+                family = families.get(name)
+                if family is None:
+                    family = families[name] = GaugeMetricFamily(name, name, labels=list(labels))
+                family.add_metric(list(labels.values()), value)
+            elif isinstance(value, dict):
+                for key, item in value.items():
+                    add(f"{name}_{key}", labels, item)
+
+        for labels, stats in self.source():
+            if stats is not None:
+                add(self.prefix, labels, stats)
+        return list(families.values())
+
+
+def register_stats(prefix: str, source: StatsSource) -> None:
+    REGISTRY.register(StatsCollector(prefix, source))
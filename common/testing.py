@@ -0,0 +1,70 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+from opentelemetry import trace
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.util._once import Once
+
+from common.config import Tracing
+from common.tracing import setup_tracing, tracer
+
+
+# Помощники для тестов сервисов
+
+
+class RecordedSpans:
+    def __init__(self, provider, exporter: InMemorySpanExporter):
+        self._provider = provider
+        self._exporter = exporter
+
+    # Завершенные spans по имени; BatchSpanProcessor пишет в фоне - сначала сбрасываем
+    def by_name(self) -> dict[str, ReadableSpan]:
+        self._provider.force_flush()
+        return {span.name: span for span in self._exporter.get_finished_spans()}
+
+
+# Провайдер OpenTelemetry с записью spans в память на время теста.
+# Глобальный провайдер ставится один раз на процесс, а ProxyTracer запоминает
+# первый найденный - после теста все три возвращаются как были
+@contextmanager
+def recorded_spans(service_name: str) -> Iterator[RecordedSpans]:
+    saved = trace._TRACER_PROVIDER, trace._TRACER_PROVIDER_SET_ONCE, tracer._real_tracer
+    trace._TRACER_PROVIDER_SET_ONCE = Once()
+    exporter = InMemorySpanExporter()
+    provider = setup_tracing(service_name, Tracing(enabled=True, sample_ratio=1.0), exporter=exporter)
+    try:
+        yield RecordedSpans(provider, exporter)
+    finally:
+        provider.shutdown()
+        trace._TRACER_PROVIDER, trace._TRACER_PROVIDER_SET_ONCE, tracer._real_tracer = saved
+
+
+# Считает SQL запросы, ушедшие в БД. Защищает от возврата лишних round trip'ов
+class QueryCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @contextmanager
+    def assert_count(self, expected: int):
+        start = len(self.statements)
+        yield
+        executed = self.statements[start:]
+        assert len(executed) == expected, (
+            f"Expected {expected} queries, got {len(executed)}:\n" + "\n".join(executed)
+        )
+
+
+@contextmanager
+def counted_queries(engine: AsyncEngine) -> Iterator[QueryCounter]:
+    counter = QueryCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", counter)
@@ -0,0 +1,174 @@
+import sys
+from typing import IO
+
+import grpc
+from fastapi.telemetry import TelemetryConfig
+from opentelemetry import context, propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from common.config import Tracing
+
+
+# Трассировка OpenTelemetry, общая для всех сервисов.
+# Контекст передается заголовком traceparent (W3C) в HTTP, метаданных gRPC и заголовках Kafka.
+# Пока setup_tracing не вызван, API OpenTelemetry работает как no-op
+
+tracer = trace.get_tracer("microservices")
+
+
+def _json_line(span: ReadableSpan) -> str:
+    return span.to_json(indent=None) + "\n"
+
+
+def build_exporter(config: Tracing, out: IO[str] | None = None) -> SpanExporter:
+    if config.exporter == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:  # opentelemetry-exporter-otlp-proto-http - опциональная зависимость
+            raise RuntimeError("otlp exporter requires the opentelemetry-exporter-otlp-proto-http package")
+        return OTLPSpanExporter(endpoint=config.otlp_endpoint)
+
+    if out is None:
+        out = sys.stdout if config.exporter == "console" else open(config.file_path, "a")
+    # Одна строка JSON на span - файл можно читать построчно или отдать collector'у
+    return ConsoleSpanExporter(out=out, formatter=_json_line)
+
+
+# Решение о выборке принимается в корне трассы, дочерние spans и другие сервисы его наследуют
+def setup_tracing(
+    service_name: str, config: Tracing, exporter: SpanExporter | None = None
+) -> TracerProvider | None:
+    if not config.enabled:
+        return None
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(config.sample_ratio)),
+    )
+    # Экспорт пакетами в фоновом потоке, запрос не ждет записи
+    provider.add_span_processor(BatchSpanProcessor(exporter or build_exporter(config)))
+    trace.set_tracer_provider(provider)
+    return provider
+
+
+# HTTP spans создает сама FastAPI (встроенная телеметрия): продолжает трассу из traceparent,
+# имя span - шаблон маршрута. Работает, только когда задан провайдер, то есть после setup_tracing.
+# Метрики HTTP уже считает PrometheusMiddleware
+def fastapi_telemetry(config: Tracing) -> TelemetryConfig:
+    return {
+        "tracing": config.enabled,
+        "metrics": False,
+        "logs": False,
+        # Spans на зависимости, обработчик и сериализацию - подробнее, но дороже
+        "operation_spans": config.operation_spans,
+    }
+
+
+# Span на каждый SQL запрос; spans открываются без подмены текущего контекста,
+# поэтому хранятся в conn.info до after_cursor_execute
+def trace_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+        span = tracer.start_span(
+            operation,
+            kind=SpanKind.CLIENT,
+            attributes={"db.system": "postgresql", "db.statement": statement[:1000]},
+        )
+        conn.info.setdefault("trace_spans", []).append(span)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["trace_spans"].pop().end()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        spans = exception_context.connection.info.get("trace_spans") if exception_context.connection else None
+        if spans:
+            span = spans.pop()
+            span.record_exception(exception_context.original_exception)
+            span.set_status(Status(StatusCode.ERROR))
+            span.end()
+
+
+def _method_name(method: str | bytes) -> str:
+    if isinstance(method, bytes):
+        method = method.decode()
+    return method.lstrip("/")
+
+
+class GrpcClientTracingInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        with tracer.start_as_current_span(
+            _method_name(client_call_details.method), kind=SpanKind.CLIENT
+        ) as span:
+            carrier: dict[str, str] = {}
+            propagate.inject(carrier)
+            metadata = grpc.aio.Metadata(*(client_call_details.metadata or ()))
+            for key, value in carrier.items():
+                metadata.add(key, value)
+
+            call = await continuation(client_call_details._replace(metadata=metadata), request)
+            code = await call.code()
+            span.set_attribute("rpc.grpc.status_code", code.value[0])
+            if code != grpc.StatusCode.OK:
+                span.set_status(Status(StatusCode.ERROR, code.name))
+            return call
+
+
+class GrpcServerTracingInterceptor(grpc.aio.ServerInterceptor):
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+
+        name = _method_name(handler_call_details.method)
+        parent = propagate.extract(dict(handler_call_details.invocation_metadata or ()))
+
+        def wrap_unary(behavior):
+            async def wrapper(request_or_iterator, context):
+                with tracer.start_as_current_span(name, context=parent, kind=SpanKind.SERVER):
+                    return await behavior(request_or_iterator, context)
+            return wrapper
+
+        def wrap_stream(behavior):
+            async def wrapper(request_or_iterator, context):
+                with tracer.start_as_current_span(name, context=parent, kind=SpanKind.SERVER):
+                    async for response in behavior(request_or_iterator, context):
+                        yield response
+            return wrapper
+
+        if handler.unary_unary:
+            factory, behavior = grpc.unary_unary_rpc_method_handler, wrap_unary(handler.unary_unary)
+        elif handler.stream_unary:
+            factory, behavior = grpc.stream_unary_rpc_method_handler, wrap_unary(handler.stream_unary)
+        elif handler.unary_stream:
+            factory, behavior = grpc.unary_stream_rpc_method_handler, wrap_stream(handler.unary_stream)
+        else:
+            factory, behavior = grpc.stream_stream_rpc_method_handler, wrap_stream(handler.stream_stream)
+
+        return factory(
+            behavior,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer,
+        )
+
+
+# Заголовки Kafka для текущего контекста: [("traceparent", b"00-...")]
+def kafka_headers() -> list[tuple[str, bytes]] | None:
+    carrier: dict[str, str] = {}
+    propagate.inject(carrier)
+    return [(key, value.encode()) for key, value in carrier.items()] or None
+
+
+def kafka_context(headers) -> context.Context:
+    carrier = {key: value.decode() for key, value in headers or () if value is not None}
+    return propagate.extract(carrier)
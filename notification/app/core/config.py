@@ -1,22 +1,137 @@
 from pathlib import Path
+from typing import Literal
 
+from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from common.config import DBPool, Tracing
+
 BASE_DIR = Path(__file__).resolve().parents[2]
 
 
+# Конвейер чтения Kafka, задается как KAFKA_CONSUMER__WORKERS=16
+class KafkaConsumer(BaseModel):
+    topics: list[str] = ["my-topic"]
+    group_id: str = "notification"
+    auto_offset_reset: Literal["earliest", "latest"] = "latest"
+    # Сколько сообщений забирать одним getmany и сколько ждать, если их нет
+    max_poll_records: int = Field(default=500, ge=1)
+    poll_timeout_ms: int = Field(default=100, ge=1)
+    # Воркеры обрабатывают партиции параллельно, сообщения одной партиции - по порядку
+    workers: int = Field(default=8, ge=1)
+    # Сколько сообщений одной партиции отдается обработчику за раз
+    max_batch_size: int = Field(default=100, ge=1)
+    # Выше лимита буфера партиция ставится на паузу, снимается при опустошении наполовину
+    max_buffered: int = Field(default=5000, ge=1)
+    max_partition_buffered: int = Field(default=1000, ge=1)
+    commit_interval_ms: int = Field(default=1000, ge=0)
+    # Ошибка обработчика - повтор той же пачки с экспоненциальной паузой, offset не двигается.
+    # После max_attempts неудач сообщения пачки обрабатываются по одному, не прошедшие
+    # уходят в dead_letters, и партиция читается дальше
+    retry_initial_backoff_ms: int = 100
+    retry_max_backoff_ms: int = 5000
+    max_attempts: int = Field(default=10, ge=1)
+    # Сколько при остановке ждать обработки уже прочитанного
+    shutdown_timeout_seconds: float = 10.0
+
+
+# Запись уведомлений пачками: INSERT уходит, когда набралось max_rows строк
+# или прошло max_delay_ms с первой строки пачки. NOTIFICATIONS_BULK__MAX_ROWS=1000
+class BulkInsert(BaseModel):
+    max_rows: int = Field(default=500, ge=1)
+    max_delay_ms: float = Field(default=20.0, ge=0)
+
+
+# Кеш скомпилированных шаблонов уведомлений, задается как TEMPLATES__MAX_ENTRIES=500
+class Templates(BaseModel):
+    max_entries: int = Field(default=1000, ge=1)
+    # Как часто сверять версии (updated_at) шаблонов с БД
+    refresh_interval_seconds: float = 5.0
+    # При старте компилируются самые используемые шаблоны за последние preload_window_hours
+    preload_limit: int = Field(default=100, ge=0)
+    preload_window_hours: int = Field(default=24, ge=1)
+    # HTML экранирование подставляемых значений в теле письма; тема не экранируется
+    autoescape: bool = True
+
+
+# Отправка уведомлений, задается как DELIVERY__BATCH_SIZE=200.
+# Строки забираются пачками с арендой: упавшая реплика не держит их дольше lease_seconds
+class Delivery(BaseModel):
+    enabled: bool = True
+    batch_size: int = Field(default=100, ge=1)
+    # Сколько пачек одна реплика отправляет одновременно
+    concurrency: int = Field(default=2, ge=1)
+    # Пауза, когда очередь пуста
+    poll_interval_seconds: float = 1.0
+    lease_seconds: float = 60.0
+    # После стольких неудачных попыток уведомление остается FAILED без следующей попытки
+    max_attempts: int = Field(default=5, ge=1)
+    # Пауза перед n-й повторной попыткой: initial * 2^(n-1), но не больше max, со случайным разбросом
+    backoff_initial_seconds: float = 30.0
+    backoff_max_seconds: float = 3600.0
+
+
+# Отправка через SMTP, задается как SMTP__HOST=mail.local
+class Smtp(BaseModel):
+    host: str = "localhost"
+    port: int = 25
+    # starttls - повышение до TLS после EHLO, tls - TLS сразу (порт 465)
+    tls: Literal["none", "starttls", "tls"] = "none"
+    username: str | None = None
+    password: str | None = None
+    sender: str = "noreply@example.com"
+    timeout_seconds: float = 10.0
+    # Постоянные соединения; одна пачка делится между ними
+    pool_size: int = Field(default=4, ge=1)
+    # Серверы ограничивают число писем на соединение - после стольких открываем новое
+    max_messages_per_connection: int = Field(default=100, ge=1)
+    # Простоявшее дольше соединение сервер мог уже закрыть - не переиспользуем
+    idle_timeout_seconds: float = 30.0
+    # Команды нескольких писем уходят без ожидания ответов (если сервер объявил PIPELINING)
+    pipelining: bool = True
+    # Общий лимит писем в секунду на реплику (token bucket), 0 - без лимита
+    rate_limit_per_second: float = Field(default=0.0, ge=0)
+    rate_limit_burst: int = Field(default=50, ge=1)
+    html: bool = True
+
+
+# Приемник вместо почтового сервера: письма в памяти или JSON строками в файл
+class MailSink(BaseModel):
+    path: Path | None = None
+    # Сколько последних писем держать в памяти
+    max_kept: int = Field(default=10_000, ge=0)
+    # Имитация задержки сети на пачку
+    latency_ms: float = Field(default=0.0, ge=0)
+
+
 class Settings(BaseSettings):
     DB_HOST: str
     DB_PORT: str
     DB_NAME: str
     DB_USER: str
     DB_PASS: str
+    DB_POOL: DBPool = DBPool()
+    TRACING: Tracing = Tracing()
 
-    model_config = SettingsConfigDict(env_file=str(BASE_DIR / ".env"))
+    KAFKA_BOOTSTRAP_SERVERS: str = "localhost:9092"
+    KAFKA_CONSUMER: KafkaConsumer = KafkaConsumer()
+    NOTIFICATIONS_BULK: BulkInsert = BulkInsert()
+    TEMPLATES: Templates = Templates()
+    DELIVERY: Delivery = Delivery()
+    # log - только печать, sink - приемник для тестов и бенчмарков, smtp - почтовый сервер
+    MAIL_TRANSPORT: Literal["log", "sink", "smtp"] = "log"
+    SMTP: Smtp = Smtp()
+    MAIL_SINK: MailSink = MailSink()
+
+    model_config = SettingsConfigDict(env_file=str(BASE_DIR / ".env"), env_nested_delimiter="__")
 
     @property
     def DATABASE_URL(self):
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
-    
+
+
+class TestSettings(Settings):
+    model_config = SettingsConfigDict(env_file=str(BASE_DIR / ".test.env"), env_nested_delimiter="__")
+
 
 settings = Settings()
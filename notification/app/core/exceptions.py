@@ -0,0 +1,4 @@
+class TemplateNotFoundError(Exception):
+    def __init__(self, template_id):
+        self.template_id = template_id
+        super().__init__(f"Template with id - {self.template_id} not found!")
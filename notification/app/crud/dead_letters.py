@@ -0,0 +1,10 @@
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.models import DeadLetter
+
+
+# Записи редкие, executemany без unnest достаточно
+async def insert_dead_letters(conn: AsyncConnection, rows: list[dict]) -> None:
+    if rows:
+        await conn.execute(insert(DeadLetter), rows)
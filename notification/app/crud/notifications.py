@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
+
+from sqlalchemy import DateTime, Integer, Row, String, bindparam, cast, func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as SQLUUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.enums import PendingStatusEnum
+from app.db.models import Notification
+
+
+# INSERT ... SELECT FROM unnest(...) ON CONFLICT (message_key) DO NOTHING:
+# шесть параметров-массивов при любом размере пачки - запрос готовится в asyncpg один раз.
+# Уже записанные ключи (повторная доставка) пропускаются; вернет число новых строк
+_rows = func.unnest(
+    bindparam("ids", type_=ARRAY(SQLUUID(as_uuid=True))),
+    bindparam("message_keys", type_=ARRAY(String)),
+    bindparam("user_ids", type_=ARRAY(SQLUUID(as_uuid=True))),
+    bindparam("template_ids", type_=ARRAY(SQLUUID(as_uuid=True))),
+    bindparam("recipient_emails", type_=ARRAY(String)),
+    bindparam("verification_tokens", type_=ARRAY(String)),
+).table_valued(
+    "id", "message_key", "user_id", "template_id", "recipient_email", "verification_token"
+).render_derived()
+
+INSERT_NOTIFICATIONS = (
+    pg_insert(Notification)
+    .from_select(
+        [
+            Notification.id,
+            Notification.message_key,
+            Notification.user_id,
+            Notification.template_id,
+            Notification.recipient_email,
+            Notification.verification_token,
+            Notification.status,
+            Notification.attempts,
+            Notification.created_at,
+        ],
+        # Default колонок в INSERT ... SELECT не применяются - задаем явно
+        select(
+            *_rows.c,
+            cast(literal(PendingStatusEnum.pending.name), Notification.status.type),
+            literal(0),
+            func.now(),
+        ),
+    )
+    .on_conflict_do_nothing(index_elements=[Notification.message_key])
+)
+
+
+async def insert_notifications_bulk(conn: AsyncConnection, rows: list[dict]) -> int:
+    result = await conn.execute(
+        INSERT_NOTIFICATIONS,
+        {
+            "ids": [uuid4() for _ in rows],
+            "message_keys": [row["message_key"] for row in rows],
+            "user_ids": [row["user_id"] for row in rows],
+            "template_ids": [row["template_id"] for row in rows],
+            "recipient_emails": [row["recipient_email"] for row in rows],
+            "verification_tokens": [row["verification_token"] for row in rows],
+        },
+    )
+    return result.rowcount
+
+
+# Забирает до limit строк, чей срок подошел. SKIP LOCKED - реплики не ждут друг друга
+# и не берут одни и те же строки. Забранная строка сразу получает +1 попытку и
+# next_attempt_at через lease: отправка идет вне транзакции, а если реплика упадет,
+# строка вернется в очередь по истечении аренды.
+# attempts из ответа - метка аренды для record_*
+async def claim_due_notifications(
+    conn: AsyncConnection, limit: int, lease_seconds: float
+) -> list[Row]:
+    due = (
+        select(Notification.id)
+        .where(
+            Notification.status.in_([PendingStatusEnum.pending, PendingStatusEnum.failed]),
+            Notification.next_attempt_at <= func.now(),
+        )
+        .order_by(Notification.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(Notification)
+        .where(Notification.id.in_(due.scalar_subquery()))
+        .values(
+            attempts=Notification.attempts + 1,
+            next_attempt_at=func.now() + timedelta(seconds=lease_seconds),
+        )
+        .returning(
+            Notification.id,
+            Notification.user_id,
+            Notification.template_id,
+            Notification.recipient_email,
+            Notification.verification_token,
+            Notification.attempts,
+        )
+    )
+    result = await conn.execute(stmt)
+    return list(result)
+
+
+# Результаты пишутся только для строк, чья аренда еще наша (attempts не изменился);
+# возвращает число обновленных строк
+async def record_sent(conn: AsyncConnection, ids: list[UUID], attempts: list[int]) -> int:
+    if not ids:
+        return 0
+    rows = func.unnest(
+        bindparam("ids", type_=ARRAY(SQLUUID(as_uuid=True))),
+        bindparam("claimed_attempts", type_=ARRAY(Integer)),
+    ).table_valued("id", "attempts").render_derived()
+    stmt = (
+        update(Notification)
+        .where(Notification.id == rows.c.id, Notification.attempts == rows.c.attempts)
+        .values(status=PendingStatusEnum.sent, sent_at=func.now(), next_attempt_at=None)
+    )
+    result = await conn.execute(stmt, {"ids": ids, "claimed_attempts": attempts})
+    return result.rowcount
+
+
+# next_attempt_at None - попыток больше не будет
+async def record_failed(
+    conn: AsyncConnection,
+    ids: list[UUID],
+    attempts: list[int],
+    next_attempts: list[datetime | None],
+) -> int:
+    if not ids:
+        return 0
+    rows = func.unnest(
+        bindparam("ids", type_=ARRAY(SQLUUID(as_uuid=True))),
+        bindparam("claimed_attempts", type_=ARRAY(Integer)),
+        bindparam("next_attempts", type_=ARRAY(DateTime(timezone=True))),
+    ).table_valued("id", "attempts", "next_attempt_at").render_derived()
+    stmt = (
+        update(Notification)
+        .where(Notification.id == rows.c.id, Notification.attempts == rows.c.attempts)
+        .values(status=PendingStatusEnum.failed, next_attempt_at=rows.c.next_attempt_at)
+    )
+    result = await conn.execute(
+        stmt, {"ids": ids, "claimed_attempts": attempts, "next_attempts": next_attempts}
+    )
+    return result.rowcount
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import Row, func, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.models import Notification, Template
+
+
+_TEMPLATE_COLUMNS = (Template.id, Template.subject, Template.body, Template.updated_at)
+
+
+async def get_template_row(conn: AsyncConnection, template_id: UUID) -> Row | None:
+    result = await conn.execute(select(*_TEMPLATE_COLUMNS).where(Template.id == template_id))
+    return result.one_or_none()
+
+
+# Шаблонов единицы-сотни: полный список версий дешевле слежения за изменениями
+async def get_template_versions(conn: AsyncConnection) -> dict[UUID, datetime]:
+    result = await conn.execute(select(Template.id, Template.updated_at))
+    return {template_id: updated_at for template_id, updated_at in result}
+
+
+# Самые используемые шаблоны за окно - по числу уведомлений
+async def get_hot_template_rows(conn: AsyncConnection, limit: int, window_hours: int) -> list[Row]:
+    since = datetime.now(timezone.utc) - timedelta(hours=window_hours)
+    hot = (
+        select(Notification.template_id, func.count().label("uses"))
+        .where(Notification.created_at >= since)
+        .group_by(Notification.template_id)
+        .order_by(func.count().desc())
+        .limit(limit)
+        .subquery()
+    )
+    result = await conn.execute(
+        select(*_TEMPLATE_COLUMNS).join(hot, hot.c.template_id == Template.id).order_by(hot.c.uses.desc())
+    )
+    return list(result)
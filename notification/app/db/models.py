@@ -2,9 +2,9 @@ from typing import Annotated
 from uuid import UUID
 from datetime import datetime, timezone
 
-from sqlalchemy import ForeignKey, String, DateTime
+from sqlalchemy import BigInteger, ForeignKey, Index, String, DateTime, Text, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.dialects.postgresql import UUID as SQLUUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID as SQLUUID
 
 from app.db.base import Base, limited_string
 from app.db.enums import PendingStatusEnum
@@ -13,6 +13,8 @@ from app.db.enums import PendingStatusEnum
 class Notification(Base):
     __tablename__ = "notifications"
 
+    # Идентификатор исходного сообщения: повторная доставка из Kafka не создает дубликат
+    message_key: Mapped[str] = mapped_column(String(256), unique=True)
     user_id: Mapped[UUID] = mapped_column(SQLUUID())
     template_id: Mapped[UUID] = mapped_column(ForeignKey("templates.id"))
     recipient_email: Mapped[limited_string]
@@ -20,12 +22,25 @@ class Notification(Base):
     status: Mapped[PendingStatusEnum] = mapped_column(default=PendingStatusEnum.pending)
     attempts: Mapped[int] = mapped_column(default=0)
     sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    # Когда строку можно забрать на отправку; NULL - отправлено или попытки исчерпаны
+    next_attempt_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
 
     template: Mapped["Template"] = relationship(
         "Template",
         back_populates="notifications"
     )
 
+    __table_args__ = (
+        # Очередь на отправку: в индексе только строки, ждущие попытки
+        Index(
+            "ix_notifications_due",
+            "next_attempt_at",
+            postgresql_where=text("status IN ('pending', 'failed')"),
+        ),
+    )
+
 
 class Template(Base):
     __tablename__ = "templates"
@@ -33,8 +48,30 @@ class Template(Base):
     name: Mapped[limited_string]
     subject: Mapped[limited_string]
     body: Mapped[str | None]
-    
+    # Версия шаблона для кеша скомпилированных шаблонов; на любом UPDATE
+    # выставляется триггером templates_set_updated_at, в том числе при правке руками
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
     notifications: Mapped[list["Notification"]] = relationship(
         "Notification",
         back_populates="template"
     )
+
+
+# Сообщения и строки, которые не удалось сохранить после всех попыток.
+# Лежат здесь для разбора и повторной отправки руками, чтобы не держать партицию
+class DeadLetter(Base):
+    __tablename__ = "dead_letters"
+
+    # kafka - сообщение из топика, writer - строка, отклоненная INSERT
+    source: Mapped[str] = mapped_column(String(32))
+    topic: Mapped[str | None] = mapped_column(String(256))
+    partition: Mapped[int | None]
+    offset: Mapped[int | None] = mapped_column(BigInteger)
+    payload: Mapped[dict | None] = mapped_column(JSONB)
+    error: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
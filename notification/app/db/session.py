@@ -0,0 +1,14 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from common.instrumentation import instrument_engine
+from common.tracing import trace_engine
+from common.db_pool import create_pooled_engine
+
+
+engine = create_pooled_engine(settings.DATABASE_URL, settings.DB_POOL)
+instrument_engine(engine)
+if settings.TRACING.enabled:
+    trace_engine(engine)
+
+async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
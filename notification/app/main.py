@@ -1,14 +1,47 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from contextlib import asynccontextmanager
 
+from app.core.config import settings
+from common.instrumentation import PrometheusMiddleware, metrics_response, register_stats
+from common.tracing import fastapi_telemetry, setup_tracing
+from common.db_pool import pool_stats
+from app.db.session import engine
+from app.services.delivery import delivery_scheduler
+from app.services.notifications import notification_writer
+from app.services.templates import template_cache
 from consumer import consumer
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    tracer_provider = setup_tracing("notification", settings.TRACING)
+    await template_cache.preload()
+    template_cache.start()
     await consumer.start()
+    await delivery_scheduler.start()
     yield
     await consumer.stop()
+    await delivery_scheduler.stop()
+    await notification_writer.close()
+    await template_cache.stop()
+    await engine.dispose()
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
 
 
-app = FastAPI(title="Notification service", lifespan=lifespan)
\ No newline at end of file
+app = FastAPI(
+    title="Notification service", lifespan=lifespan, telemetry=fastapi_telemetry(settings.TRACING)
+)
+app.add_middleware(PrometheusMiddleware)
+
+register_stats("db_pool", lambda: [({}, pool_stats(engine))])
+register_stats("kafka_consumer", lambda: [({}, consumer.stats())])
+register_stats("notification_writer", lambda: [({}, notification_writer.stats())])
+register_stats("template_cache", lambda: [({}, template_cache.stats())])
+register_stats("delivery", lambda: [({}, delivery_scheduler.stats())])
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> Response:
+    return metrics_response()
+
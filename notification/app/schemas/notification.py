@@ -0,0 +1,16 @@
+from uuid import UUID
+
+from pydantic import BaseModel, EmailStr, Field
+
+
+# Сообщение о новом уведомлении из Kafka.
+# message_key задает продюсер, чтобы повтор отправки не создал второе уведомление;
+# без него ключом служат координаты сообщения (topic:partition:offset)
+class NotificationMessage(BaseModel):
+    user_id: UUID
+    template_id: UUID
+    # Адрес уходит в RCPT TO и заголовок To: CR/LF или угловые скобки в нем
+    # дописали бы в SMTP сессию чужие команды, поэтому проверяется до записи в БД
+    recipient_email: EmailStr = Field(max_length=256)
+    verification_token: str | None = None
+    message_key: str | None = Field(default=None, max_length=256)
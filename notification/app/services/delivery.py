@@ -0,0 +1,205 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+from prometheus_client import Counter, Histogram
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import Delivery, settings
+from common.instrumentation import LATENCY_BUCKETS
+from app.crud.notifications import claim_due_notifications, record_failed, record_sent
+from app.db.session import engine
+from app.services.templates import TemplateCache, template_cache
+from app.transport.base import DeliveryResult, OutgoingEmail, Transport
+from app.transport.log import LogTransport
+from app.transport.sink import SinkTransport
+from app.transport.smtp import SMTPTransport
+
+
+DELIVERY_BATCH_DURATION = Histogram(
+    "notification_delivery_batch_duration_seconds",
+    "Claim, render, send and record time of one delivery batch",
+    buckets=LATENCY_BUCKETS,
+)
+# retry - будет еще попытка, permanent - отказ сервера, exhausted - попытки кончились.
+# Неудачи только считаются: строка в вывод на каждое письмо при массовом сбое
+# получателя забивала бы его и тормозила цикл отправки
+DELIVERY_FAILURES = Counter(
+    "notification_delivery_failures", "Failed delivery attempts by outcome", ["outcome"]
+)
+DELIVERY_BATCH_ERRORS = Counter(
+    "notification_delivery_batch_errors", "Delivery batches that raised before recording results"
+)
+
+
+# Отправка PENDING/FAILED уведомлений, у которых подошел next_attempt_at.
+# config.concurrency циклов: забрать пачку (SKIP LOCKED + аренда), отрисовать шаблоны,
+# отдать транспорту, записать результаты двумя UPDATE на всю пачку.
+# Неудача - следующая попытка через экспоненциальную паузу с разбросом, чтобы
+# массовый сбой получателя не возвращал все письма в одну и ту же секунду.
+# Реплик может быть сколько угодно: строки между ними делит SKIP LOCKED
+class DeliveryScheduler:
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        transport: Transport,
+        templates: TemplateCache,
+        config: Delivery,
+    ):
+        self._engine = engine
+        self.transport = transport
+        self._templates = templates
+        self.config = config
+        self._workers: list[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+        self.claimed = 0
+        self.sent = 0
+        self.failed = 0
+        self.exhausted = 0
+        self.permanent_failures = 0
+        # Аренда истекла и строку забрала другая реплика - наш результат не записан
+        self.lost_leases = 0
+        self.batches = 0
+        self.failed_batches = 0
+
+    # Пауза перед следующей попыткой после attempts неудачных; None - попытки исчерпаны
+    def backoff_seconds(self, attempts: int) -> float | None:
+        config = self.config
+        if attempts >= config.max_attempts:
+            return None
+        delay = min(config.backoff_max_seconds, config.backoff_initial_seconds * 2 ** (attempts - 1))
+        return random.uniform(delay / 2, delay)
+
+    async def run_once(self) -> int:
+        async with self._engine.begin() as conn:
+            rows = await claim_due_notifications(
+                conn, self.config.batch_size, self.config.lease_seconds
+            )
+        if not rows:
+            return 0
+
+        start = perf_counter()
+        self.claimed += len(rows)
+        results: list[DeliveryResult] = []
+        messages: list[OutgoingEmail] = []
+        for row in rows:
+            try:
+                rendered = await self._templates.render(
+                    row.template_id,
+                    {
+                        "user_id": row.user_id,
+                        "recipient_email": row.recipient_email,
+                        "verification_token": row.verification_token,
+                    },
+                )
+            except Exception as e:
+                # Шаблон могут исправить - обычная неудачная попытка
+                results.append(DeliveryResult(row.id, f"render failed: {e}"))
+                continue
+            messages.append(OutgoingEmail(row.id, row.recipient_email, rendered.subject, rendered.body))
+
+        if messages:
+            try:
+                results.extend(await self.transport.send_batch(messages))
+            except Exception as e:
+                results.extend(DeliveryResult(message.notification_id, str(e)) for message in messages)
+
+        await self._record(rows, results)
+        self.batches += 1
+        DELIVERY_BATCH_DURATION.observe(perf_counter() - start)
+        return len(rows)
+
+    async def _record(self, rows: list[Row], results: list[DeliveryResult]) -> None:
+        attempts = {row.id: row.attempts for row in rows}
+        now = datetime.now(timezone.utc)
+        sent_ids, sent_attempts = [], []
+        failed_ids, failed_attempts, next_attempts = [], [], []
+        permanent = exhausted = 0
+        for result in results:
+            row_attempts = attempts[result.notification_id]
+            if result.error is None:
+                sent_ids.append(result.notification_id)
+                sent_attempts.append(row_attempts)
+                continue
+
+            delay = None if result.permanent else self.backoff_seconds(row_attempts)
+            if result.permanent:
+                permanent += 1
+            elif delay is None:
+                exhausted += 1
+            failed_ids.append(result.notification_id)
+            failed_attempts.append(row_attempts)
+            next_attempts.append(now + timedelta(seconds=delay) if delay is not None else None)
+
+        async with self._engine.begin() as conn:
+            updated = await record_sent(conn, sent_ids, sent_attempts)
+            updated += await record_failed(conn, failed_ids, failed_attempts, next_attempts)
+        self.sent += len(sent_ids)
+        self.failed += len(failed_ids)
+        self.permanent_failures += permanent
+        self.exhausted += exhausted
+        DELIVERY_FAILURES.labels("permanent").inc(permanent)
+        DELIVERY_FAILURES.labels("exhausted").inc(exhausted)
+        DELIVERY_FAILURES.labels("retry").inc(len(failed_ids) - permanent - exhausted)
+        self.lost_leases += len(results) - updated
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                self.failed_batches += 1
+                DELIVERY_BATCH_ERRORS.inc()
+                print(f"Ошибка отправки уведомлений - {e!r}")
+                claimed = 0
+            # Полная пачка - очередь, вероятно, не пуста, берем следующую сразу
+            if claimed < self.config.batch_size:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.config.poll_interval_seconds)
+                except TimeoutError:
+                    pass
+
+    async def start(self) -> None:
+        if not self.config.enabled or self._workers:
+            return
+        await self.transport.start()
+        self._stopping.clear()
+        self._workers = [asyncio.create_task(self._run()) for _ in range(self.config.concurrency)]
+
+    # Текущие пачки дописывают результаты; не успевшие вернутся в очередь по истечении аренды
+    async def stop(self) -> None:
+        if not self._workers:
+            return
+        self._stopping.set()
+        _, pending = await asyncio.wait(self._workers, timeout=self.config.lease_seconds)
+        for worker in pending:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self.transport.close()
+
+    def stats(self) -> dict:
+        return {
+            "claimed": self.claimed,
+            "sent": self.sent,
+            "failed": self.failed,
+            "exhausted": self.exhausted,
+            "permanent_failures": self.permanent_failures,
+            "lost_leases": self.lost_leases,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "transport": self.transport.stats(),
+        }
+
+
+def build_transport() -> Transport:
+    if settings.MAIL_TRANSPORT == "smtp":
+        return SMTPTransport(settings.SMTP)
+    if settings.MAIL_TRANSPORT == "sink":
+        return SinkTransport(settings.MAIL_SINK)
+    return LogTransport()
+
+
+delivery_scheduler = DeliveryScheduler(engine, build_transport(), template_cache, settings.DELIVERY)
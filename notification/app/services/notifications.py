@@ -0,0 +1,138 @@
+import asyncio
+from time import perf_counter
+from uuid import UUID
+
+from prometheus_client import Histogram
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import BulkInsert, settings
+from common.instrumentation import LATENCY_BUCKETS
+from app.crud.dead_letters import insert_dead_letters
+from app.crud.notifications import insert_notifications_bulk
+from app.db.session import engine
+
+
+NOTIFICATION_FLUSH_DURATION = Histogram(
+    "notification_writer_flush_duration_seconds",
+    "Bulk INSERT time of one notifications flush",
+    buckets=LATENCY_BUCKETS,
+)
+
+
+# Копит строки уведомлений от воркеров консьюмера и пишет их одним INSERT:
+# пачка уходит при max_rows строк или через max_delay_ms после первой строки.
+# write() возвращается после записи пачки, поэтому offset в Kafka фиксируется
+# только за сохраненные строки; ошибка записи достается всем, кто ждал эту пачку.
+# Нарушение ограничения (template_id, которого нет в templates) отклоняет весь INSERT:
+# тогда пачка пишется по строке, отклоненные строки уходят в dead_letters,
+# и остальные не повторяются из-за одной плохой
+class NotificationWriter:
+    def __init__(self, engine: AsyncEngine, config: BulkInsert):
+        self._engine = engine
+        self.max_rows = config.max_rows
+        self.max_delay_seconds = config.max_delay_ms / 1000
+        self._pending: list[dict] = []
+        self._waiters: list[asyncio.Future] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.rows = 0
+        self.inserted = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.rejected = 0
+
+    async def write(self, rows: list[dict]) -> None:
+        if not rows:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._pending.extend(rows)
+        self._waiters.append(future)
+
+        if len(self._pending) >= self.max_rows:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.max_delay_seconds, self._flush
+            )
+
+        # shield: отмена одного ожидающего не должна отменять запись пачки для остальных
+        await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+
+        rows, self._pending = self._pending, []
+        waiters, self._waiters = self._waiters, []
+        task = asyncio.create_task(self._run(rows, waiters))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, rows: list[dict], waiters: list[asyncio.Future]) -> None:
+        self.flushes += 1
+        start = perf_counter()
+        try:
+            inserted = await self._insert(rows)
+        except Exception as e:
+            self.failed_flushes += 1
+            for future in waiters:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            NOTIFICATION_FLUSH_DURATION.observe(perf_counter() - start)
+
+        self.rows += len(rows)
+        self.inserted += inserted
+        for future in waiters:
+            if not future.done():
+                future.set_result(None)
+
+    async def _insert(self, rows: list[dict]) -> int:
+        try:
+            async with self._engine.begin() as conn:
+                return await insert_notifications_bulk(conn, rows)
+        except IntegrityError as e:
+            print(f"Пачка из {len(rows)} уведомлений отклонена, запись по одному - {e.orig}")
+
+        inserted = 0
+        rejected = []
+        async with self._engine.connect() as conn:
+            for row in rows:
+                try:
+                    async with conn.begin():
+                        inserted += await insert_notifications_bulk(conn, [row])
+                except IntegrityError as e:
+                    rejected.append({"source": "writer", "payload": _jsonable(row), "error": str(e.orig)})
+            async with conn.begin():
+                await insert_dead_letters(conn, rejected)
+        self.rejected += len(rejected)
+        return inserted
+
+    async def close(self) -> None:
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            # Строки с уже записанным message_key - повторная доставка
+            "duplicates": self.rows - self.inserted - self.rejected,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "pending": len(self._pending),
+        }
+
+
+def _jsonable(row: dict) -> dict:
+    return {key: str(value) if isinstance(value, UUID) else value for key, value in row.items()}
+
+
+notification_writer = NotificationWriter(engine, settings.NOTIFICATIONS_BULK)
@@ -0,0 +1,195 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from time import perf_counter
+from typing import Any, NamedTuple
+from uuid import UUID
+
+from jinja2 import Environment, StrictUndefined, Template as JinjaTemplate
+from prometheus_client import Histogram
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import Templates, settings
+from app.core.exceptions import TemplateNotFoundError
+from common.instrumentation import LATENCY_BUCKETS
+from app.crud.templates import get_hot_template_rows, get_template_row, get_template_versions
+from app.db.session import engine
+
+
+TEMPLATE_COMPILE_DURATION = Histogram(
+    "notification_template_compile_duration_seconds",
+    "Jinja2 compile time of one template version",
+    buckets=LATENCY_BUCKETS,
+)
+
+
+class RenderedTemplate(NamedTuple):
+    subject: str
+    body: str
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledTemplate:
+    id: UUID
+    updated_at: datetime
+    subject: JinjaTemplate
+    body: JinjaTemplate | None
+
+    def render(self, context: dict[str, Any]) -> RenderedTemplate:
+        return RenderedTemplate(
+            self.subject.render(context), self.body.render(context) if self.body is not None else ""
+        )
+
+
+# Шаблоны Jinja2 компилируются один раз и лежат в LRU по (template_id, updated_at),
+# рендер уведомления - только подстановка переменных.
+# Текущая версия каждого шаблона сверяется с БД раз в refresh_interval_seconds:
+# изменившийся шаблон вытесняется и перекомпилируется при следующем обращении.
+# Не хватает переменной - jinja2.UndefinedError, а не пустое место в письме.
+# Не потокобезопасен - рассчитан на использование из одного event loop
+class TemplateCache:
+    def __init__(self, engine: AsyncEngine, config: Templates):
+        self._engine = engine
+        self.config = config
+        self._subject_env = Environment(undefined=StrictUndefined, autoescape=False)
+        self._body_env = Environment(undefined=StrictUndefined, autoescape=config.autoescape)
+        self._entries: OrderedDict[tuple[UUID, datetime], CompiledTemplate] = OrderedDict()
+        # Последняя известная версия шаблона
+        self._versions: dict[UUID, datetime] = {}
+        self._inflight: dict[UUID, asyncio.Task] = {}
+        self._task: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.failed_refreshes = 0
+
+    async def render(self, template_id: UUID, context: dict[str, Any]) -> RenderedTemplate:
+        return (await self.get(template_id)).render(context)
+
+    async def get(self, template_id: UUID) -> CompiledTemplate:
+        version = self._versions.get(template_id)
+        if version is not None:
+            compiled = self._entries.get((template_id, version))
+            if compiled is not None:
+                self._entries.move_to_end((template_id, version))
+                self.hits += 1
+                return compiled
+
+        task = self._inflight.get(template_id)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._load(template_id))
+            self._inflight[template_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(template_id, None))
+
+        # shield: отмена одного ожидающего не должна отменять загрузку для остальных
+        return await asyncio.shield(task)
+
+    async def _load(self, template_id: UUID) -> CompiledTemplate:
+        async with self._engine.connect() as conn:
+            row = await get_template_row(conn, template_id)
+        if row is None:
+            raise TemplateNotFoundError(template_id)
+        return self._store(row)
+
+    def _compile(self, row: Row) -> CompiledTemplate:
+        start = perf_counter()
+        try:
+            return CompiledTemplate(
+                id=row.id,
+                updated_at=row.updated_at,
+                subject=self._subject_env.from_string(row.subject),
+                body=self._body_env.from_string(row.body) if row.body is not None else None,
+            )
+        finally:
+            TEMPLATE_COMPILE_DURATION.observe(perf_counter() - start)
+
+    def _store(self, row: Row) -> CompiledTemplate:
+        compiled = self._compile(row)
+        known = self._versions.get(row.id)
+        # Проверка версий могла уже увидеть более новую правку - старую версию не закрепляем
+        if known is None or known <= row.updated_at:
+            if known is not None and known != row.updated_at:
+                self._evict_version(row.id, known)
+            self._versions[row.id] = row.updated_at
+        self._entries[(row.id, row.updated_at)] = compiled
+        self._entries.move_to_end((row.id, row.updated_at))
+        while len(self._entries) > self.config.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return compiled
+
+    def _evict_version(self, template_id: UUID, version: datetime) -> None:
+        if self._entries.pop((template_id, version), None) is not None:
+            self.invalidations += 1
+
+    def invalidate(self, template_id: UUID) -> None:
+        version = self._versions.pop(template_id, None)
+        if version is not None:
+            self._evict_version(template_id, version)
+
+    # Сверка версий: новая версия вытесняет скомпилированную старую, удаленный шаблон забывается
+    async def refresh(self) -> None:
+        async with self._engine.connect() as conn:
+            versions = await get_template_versions(conn)
+        for template_id, version in list(self._versions.items()):
+            current = versions.get(template_id)
+            if current is None:
+                self.invalidate(template_id)
+            elif current != version:
+                self._evict_version(template_id, version)
+                self._versions[template_id] = current
+
+    async def preload(self) -> None:
+        if not self.config.preload_limit:
+            return
+        async with self._engine.connect() as conn:
+            rows = await get_hot_template_rows(
+                conn, self.config.preload_limit, self.config.preload_window_hours
+            )
+        # Самые используемые добавляются последними - дальше всех от вытеснения
+        for row in reversed(rows):
+            self._store(row)
+
+    async def _run_refresh(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.refresh_interval_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.failed_refreshes += 1
+                print(f"Не удалось сверить версии шаблонов - {e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_refresh())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "failed_refreshes": self.failed_refreshes,
+            "inflight": len(self._inflight),
+        }
+
+
+template_cache = TemplateCache(engine, settings.TEMPLATES)
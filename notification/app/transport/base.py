@@ -0,0 +1,36 @@
+from abc import ABC, abstractmethod
+from typing import NamedTuple
+from uuid import UUID
+
+
+class OutgoingEmail(NamedTuple):
+    notification_id: UUID
+    recipient: str
+    subject: str
+    body: str
+
+
+# error None - доставлено. permanent - повтор не поможет (адрес отклонен сервером)
+class DeliveryResult(NamedTuple):
+    notification_id: UUID
+    error: str | None = None
+    permanent: bool = False
+
+
+# Способ доставки уведомлений. Пачка целиком - чтобы реализация могла отправлять
+# письма параллельно или конвейером по одному соединению.
+# На каждое письмо пачки - ровно один результат; исключение из send_batch
+# считается временной ошибкой для всей пачки
+class Transport(ABC):
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def send_batch(self, messages: list[OutgoingEmail]) -> list[DeliveryResult]:
+        ...
+
+    def stats(self) -> dict:
+        return {}
@@ -0,0 +1,9 @@
+from app.transport.base import DeliveryResult, OutgoingEmail, Transport
+
+
+# Ничего не отправляет, только печатает письма - для локального запуска без почтового сервера
+class LogTransport(Transport):
+    async def send_batch(self, messages: list[OutgoingEmail]) -> list[DeliveryResult]:
+        for message in messages:
+            print(f"[mail]{message.recipient}[->]{message.subject}")
+        return [DeliveryResult(message.notification_id) for message in messages]
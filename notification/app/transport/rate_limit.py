@@ -0,0 +1,36 @@
+import asyncio
+from time import monotonic
+from typing import Callable
+
+
+# Token bucket: в среднем rate операций в секунду, всплеск до burst.
+# Ожидающие обслуживаются по очереди - блокировка держится и на время ожидания
+class TokenBucket:
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = monotonic):
+        self.rate = rate
+        self.capacity = float(burst)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                self.waits += 1
+                self.wait_seconds += wait
+                await asyncio.sleep(wait)
+                self._refill()
+            self._tokens -= 1
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "waits": self.waits, "wait_seconds": self.wait_seconds}
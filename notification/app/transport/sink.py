@@ -0,0 +1,56 @@
+import asyncio
+import json
+from collections import deque
+from typing import IO
+
+from app.core.config import MailSink
+from app.transport.base import DeliveryResult, OutgoingEmail, Transport
+
+
+# Принимает все письма: в память (последние max_kept) или JSON строкой на письмо в файл.
+# Для тестов и замеров сквозной скорости отправки без почтового сервера
+class SinkTransport(Transport):
+    def __init__(self, config: MailSink):
+        self.config = config
+        self.messages: deque[OutgoingEmail] = deque(maxlen=config.max_kept)
+        self._file: IO[str] | None = None
+        self.sent = 0
+        self.batches = 0
+
+    async def start(self) -> None:
+        if self.config.path is not None and self._file is None:
+            self._file = open(self.config.path, "a")
+
+    async def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def send_batch(self, messages: list[OutgoingEmail]) -> list[DeliveryResult]:
+        if self.config.latency_ms:
+            await asyncio.sleep(self.config.latency_ms / 1000)
+        if self._file is not None:
+            self._file.write(
+                "".join(
+                    json.dumps(
+                        {
+                            "notification_id": str(message.notification_id),
+                            "recipient": message.recipient,
+                            "subject": message.subject,
+                            "body": message.body,
+                        },
+                        ensure_ascii=False,
+                    )
+                    + "\n"
+                    for message in messages
+                )
+            )
+            self._file.flush()
+        else:
+            self.messages.extend(messages)
+        self.sent += len(messages)
+        self.batches += 1
+        return [DeliveryResult(message.notification_id) for message in messages]
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "batches": self.batches, "kept": len(self.messages)}
@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import json
+from time import perf_counter
+from uuid import UUID, uuid4
+
+from sqlalchemy import text
+
+from app.core.config import Delivery, MailSink, Smtp, settings
+from app.db.session import engine
+from app.services.delivery import DeliveryScheduler
+from app.services.templates import TemplateCache
+from app.transport.base import Transport
+from app.transport.sink import SinkTransport
+from app.transport.smtp import SMTPTransport
+
+
+# Сквозная скорость отправки: очередь в notifications -> DeliveryScheduler -> транспорт.
+# --transport smtp поднимает локальный SMTP приемник (PIPELINING, без сохранения писем),
+# --rtt-ms добавляет задержку перед каждой порцией ответов - как сеть до настоящего сервера,
+# на ней видно, что дает конвейер (--no-pipelining) и размер пула соединений.
+# Строки создаются и удаляются самим бенчмарком; нужна отдельная БД с миграциями.
+# Запуск из каталога notification: python -m benchmarks.delivery --transport smtp --rtt-ms 2
+
+MESSAGE_KEY_PREFIX = "bench-delivery:"
+
+SEED_SQL = text("""
+    INSERT INTO notifications (id, message_key, user_id, template_id, recipient_email,
+                               verification_token, status, attempts, created_at)
+    SELECT gen_random_uuid(), :prefix || n, gen_random_uuid(), :template_id,
+           'user-' || n || '@delivery.test', md5(n::text), 'pending', 0, now()
+    FROM generate_series(1, :messages) AS n
+""")
+
+
+# Минимальный SMTP сервер: принимает и считает письма. Ответы копятся, пока клиент
+# присылает данные, и уходят одной записью после задержки rtt
+class SMTPSink:
+    def __init__(self, rtt_seconds: float):
+        self.rtt_seconds = rtt_seconds
+        self.received = 0
+        self.connections = 0
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        writer.write(b"220 sink ESMTP\r\n")
+        buffer = b""
+        in_data = False
+        has_recipient = False
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\r\n")
+                replies = []
+                closing = False
+                for line in lines:
+                    if in_data:
+                        if line == b".":
+                            in_data = has_recipient = False
+                            self.received += 1
+                            replies.append(b"250 queued")
+                        continue
+                    verb = line[:4].upper()
+                    if verb == b"EHLO":
+                        replies.append(b"250-sink\r\n250-PIPELINING\r\n250 8BITMIME")
+                    elif verb == b"MAIL":
+                        has_recipient = False
+                        replies.append(b"250 ok")
+                    elif verb == b"RCPT":
+                        has_recipient = True
+                        replies.append(b"250 ok")
+                    elif verb == b"DATA":
+                        if has_recipient:
+                            in_data = True
+                            replies.append(b"354 go ahead")
+                        else:
+                            replies.append(b"503 no valid recipients")
+                    elif verb in (b"RSET", b"NOOP", b"HELO"):
+                        has_recipient = False
+                        replies.append(b"250 ok")
+                    elif verb == b"QUIT":
+                        replies.append(b"221 bye")
+                        closing = True
+                        break
+                    else:
+                        replies.append(b"500 unknown command")
+                if replies:
+                    if self.rtt_seconds:
+                        await asyncio.sleep(self.rtt_seconds)
+                    writer.write(b"\r\n".join(replies) + b"\r\n")
+                    await writer.drain()
+                if closing:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def seed(messages: int) -> UUID:
+    template_id = uuid4()
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("""
+                INSERT INTO templates (id, name, subject, body, created_at)
+                VALUES (:id, 'bench-delivery', 'Подтвердите адрес {{ recipient_email }}',
+                        '<p>Код подтверждения: <b>{{ verification_token }}</b></p>', now())
+            """),
+            {"id": template_id},
+        )
+        await conn.execute(
+            SEED_SQL, {"prefix": MESSAGE_KEY_PREFIX, "template_id": template_id, "messages": messages}
+        )
+    return template_id
+
+
+async def cleanup(template_id: UUID) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM notifications WHERE template_id = :id"), {"id": template_id})
+        await conn.execute(text("DELETE FROM templates WHERE id = :id"), {"id": template_id})
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Сквозная скорость отправки уведомлений")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--transport", choices=["sink", "smtp"], default="smtp")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--no-pipelining", action="store_true")
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="задержка ответов SMTP приемника")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="писем в секунду, 0 - без лимита")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    sink_server = None
+    if args.transport == "smtp":
+        sink_server = SMTPSink(args.rtt_ms / 1000)
+        port = await sink_server.start()
+        transport: Transport = SMTPTransport(
+            Smtp(
+                host="127.0.0.1",
+                port=port,
+                pool_size=args.pool_size,
+                pipelining=not args.no_pipelining,
+                rate_limit_per_second=args.rate_limit,
+                max_messages_per_connection=args.messages,
+            )
+        )
+    else:
+        transport = SinkTransport(MailSink(max_kept=0))
+
+    template_id = await seed(args.messages)
+    scheduler = DeliveryScheduler(
+        engine,
+        transport,
+        TemplateCache(engine, settings.TEMPLATES),
+        Delivery(batch_size=args.batch_size, concurrency=args.concurrency, poll_interval_seconds=0.05),
+    )
+    try:
+        start = perf_counter()
+        await scheduler.start()
+        async with asyncio.timeout(args.timeout):
+            while scheduler.sent + scheduler.failed < args.messages:
+                await asyncio.sleep(0.01)
+        elapsed = perf_counter() - start
+        await scheduler.stop()
+
+        print(
+            f"{args.transport}: {scheduler.sent} sent, {scheduler.failed} failed "
+            f"in {elapsed:.2f} s - {scheduler.sent / elapsed:.0f} messages/s"
+        )
+        if sink_server is not None:
+            print(f"sink received {sink_server.received} over {sink_server.connections} connections")
+        print(json.dumps(scheduler.stats(), indent=2, default=str))
+    finally:
+        await scheduler.stop()
+        if sink_server is not None:
+            await sink_server.stop()
+        await cleanup(template_id)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,41 +1,377 @@
+import asyncio
 import json
+from collections import deque
+from time import perf_counter
+from typing import Awaitable, Callable
 
-from aiokafka import AIOKafkaConsumer
-import asyncio
+from aiokafka import AIOKafkaConsumer, ConsumerRebalanceListener, TopicPartition
+from aiokafka.errors import KafkaError
+from aiokafka.structs import ConsumerRecord
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind
+from prometheus_client import Histogram
+from pydantic import ValidationError
+
+from app.core.config import KafkaConsumer, settings
+from app.crud.dead_letters import insert_dead_letters
+from app.db.session import engine
+from common.instrumentation import LATENCY_BUCKETS, observe_consumed
+from common.tracing import kafka_context, tracer
+from app.schemas.notification import NotificationMessage
+from app.services.notifications import notification_writer
+
+# Пачка подряд идущих сообщений одной партиции
+BatchHandler = Callable[[list[ConsumerRecord]], Awaitable[None]]
+# Сообщение, которое обработчик так и не принял, и последняя ошибка
+DeadLetterHandler = Callable[[ConsumerRecord, Exception], Awaitable[None]]
+
+CONSUMER_BATCH_DURATION = Histogram(
+    "notification_consumer_batch_duration_seconds",
+    "Handler time of one partition batch",
+    buckets=LATENCY_BUCKETS,
+)
+
+
+# Некорректный JSON не должен останавливать чтение партиции - обработчик пропустит None
+def deserialize(value: bytes | None) -> dict | None:
+    try:
+        return json.loads(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _RebalanceListener(ConsumerRebalanceListener):
+    def __init__(self, consumer: "BatchConsumer"):
+        self._consumer = consumer
+
+    async def on_partitions_revoked(self, revoked):
+        await self._consumer._on_revoked(revoked)
 
+    async def on_partitions_assigned(self, assigned):
+        self._consumer._on_assigned(assigned)
+
+
+# Чтение getmany пачками в буферы партиций, обработка пулом из config.workers воркеров.
+# Партиция с сообщениями стоит в очереди готовых не больше одного раза, поэтому
+# ее сообщения обрабатываются строго по порядку, а разные партиции - параллельно.
+# Offset фиксируется вручную и только после успешной обработки (at-least-once):
+# периодически, при отзыве партиций и при остановке.
+# Пачка, упавшая max_attempts раз, разбирается по одному сообщению: не принятые
+# уходят в dead_letter, offset идет дальше. Не удалось записать dead letter - пачка
+# повторяется, как раньше, ничего не теряется.
+# Переполненный буфер ставит партиции на паузу, пока воркеры его не разберут
+class BatchConsumer:
+    def __init__(self, config: KafkaConsumer, handler: BatchHandler, dead_letter: DeadLetterHandler):
+        self.config = config
+        self._handler = handler
+        self._dead_letter = dead_letter
+        self._consumer: AIOKafkaConsumer | None = None
+        self._buffers: dict[TopicPartition, deque[ConsumerRecord]] = {}
+        self._assigned: set[TopicPartition] = set()
+        self._paused: set[TopicPartition] = set()
+        # Партиции в очереди готовых или в обработке
+        self._scheduled: set[TopicPartition] = set()
+        self._ready: asyncio.Queue[TopicPartition] = asyncio.Queue()
+        self._active: dict[TopicPartition, asyncio.Event] = {}
+        # Следующий offset для чтения после обработанного и уже зафиксированный
+        self._offsets: dict[TopicPartition, int] = {}
+        self._committed: dict[TopicPartition, int] = {}
+        self._poll_task: asyncio.Task | None = None
+        self._workers: list[asyncio.Task] = []
+        self._running = False
+        self.consumed = 0
+        self.processed = 0
+        self.batches = 0
+        self.handler_errors = 0
+        self.dead_letters = 0
+        self.poll_restarts = 0
+        self.commits = 0
+        self.commit_errors = 0
+        self.pauses = 0
 
-class KafkaConsumer:
-    def __init__(self):
-        self._consumer = None
-        self._consumer_task = None
-        self._is_running = False
-    
     async def start(self):
+        config = self.config
         self._consumer = AIOKafkaConsumer(
-            "my-topic",
-            bootstrap_servers="localhost:9092",
-            value_deserializer=lambda v: json.loads(v),
-            auto_offset_reset="latest"
+            bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
+            group_id=config.group_id,
+            value_deserializer=deserialize,
+            auto_offset_reset=config.auto_offset_reset,
+            enable_auto_commit=False,
         )
+        self._consumer.subscribe(config.topics, listener=_RebalanceListener(self))
         await self._consumer.start()
-        self._is_running = True
-        self._consumer_task = asyncio.create_task(self.consume())
-    
-    async def consume(self):
+        self._running = True
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(config.workers)]
+        self._poll_task = asyncio.create_task(self._run_poll())
+
+    # Цикл чтения не должен тихо умирать: любая ошибка вне KafkaError
+    # пишется в лог, и чтение перезапускается после паузы
+    async def _run_poll(self):
+        backoff = self.config.retry_initial_backoff_ms / 1000
+        while self._running:
+            try:
+                await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.poll_restarts += 1
+                print(f"Цикл чтения Kafka упал, перезапуск через {backoff:.1f} с - {e!r}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.config.retry_max_backoff_ms / 1000)
+
+    async def _poll(self):
+        config = self.config
+        consumer = self._consumer
+        next_commit = perf_counter() + config.commit_interval_ms / 1000
+        while self._running:
+            try:
+                batches = await consumer.getmany(
+                    timeout_ms=config.poll_timeout_ms, max_records=config.max_poll_records
+                )
+            except KafkaError as e:
+                print(f"Kafka consumpting error: {e}")
+                await asyncio.sleep(config.retry_initial_backoff_ms / 1000)
+                continue
+
+            for tp, records in batches.items():
+                buffer = self._buffers.get(tp)
+                if buffer is None:
+                    continue
+                buffer.extend(records)
+                self.consumed += len(records)
+                if tp not in self._scheduled:
+                    self._scheduled.add(tp)
+                    self._ready.put_nowait(tp)
+
+            self._apply_backpressure()
+            if perf_counter() >= next_commit:
+                await self._commit()
+                next_commit = perf_counter() + config.commit_interval_ms / 1000
+
+    # Пауза по партиции или по общему объему буферов; снимается, когда оба опустели наполовину
+    def _apply_backpressure(self) -> None:
+        config = self.config
+        total = sum(len(buffer) for buffer in self._buffers.values())
+        to_pause, to_resume = [], []
+        for tp, buffer in self._buffers.items():
+            if tp in self._paused:
+                if (
+                    len(buffer) <= config.max_partition_buffered // 2
+                    and total <= config.max_buffered // 2
+                ):
+                    to_resume.append(tp)
+            elif len(buffer) >= config.max_partition_buffered or total >= config.max_buffered:
+                to_pause.append(tp)
+
+        if to_pause:
+            self._consumer.pause(*to_pause)
+            self._paused.update(to_pause)
+            self.pauses += len(to_pause)
+        if to_resume:
+            self._consumer.resume(*to_resume)
+            self._paused.difference_update(to_resume)
+
+    async def _worker(self):
+        while True:
+            tp = await self._ready.get()
+            buffer = self._buffers.get(tp)
+            if not buffer:
+                self._scheduled.discard(tp)
+                continue
+
+            done = self._active[tp] = asyncio.Event()
+            try:
+                chunk = [buffer[i] for i in range(min(len(buffer), self.config.max_batch_size))]
+                if await self._process(tp, chunk):
+                    for _ in chunk:
+                        buffer.popleft()
+                    # После отзыва партиции offset фиксировать уже нельзя
+                    if tp in self._assigned:
+                        self._offsets[tp] = chunk[-1].offset + 1
+                    observe_consumed(self._consumer, chunk[-1])
+            finally:
+                del self._active[tp]
+                done.set()
+
+            # Партицию могли отозвать и назначить снова - смотрим на текущий буфер
+            if self._buffers.get(tp):
+                self._ready.put_nowait(tp)
+            else:
+                self._scheduled.discard(tp)
+
+    # Повторяет пачку до успеха или до разбора в dead letter; False - партицию отозвали,
+    # пачку обработает новый владелец
+    async def _process(self, tp: TopicPartition, chunk: list[ConsumerRecord]) -> bool:
+        backoff = self.config.retry_initial_backoff_ms / 1000
+        attempts = 0
+        while True:
+            try:
+                await self._handle(tp, chunk)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.handler_errors += 1
+                attempts += 1
+                print(f"Ошибка обработки {tp.topic}[{tp.partition}] с offset {chunk[0].offset}: {e}")
+                if tp not in self._buffers:
+                    return False
+                if attempts >= self.config.max_attempts and await self._isolate(tp, chunk):
+                    return True
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.config.retry_max_backoff_ms / 1000)
+                continue
+
+            self.batches += 1
+            self.processed += len(chunk)
+            return True
+
+    async def _handle(self, tp: TopicPartition, chunk: list[ConsumerRecord]) -> None:
+        start = perf_counter()
         try:
-            async for msg in self._consumer:
-                print(f"[->]{msg.topic}[->]{msg.offset}[->]{msg.value}")
-                if not self._is_running:
-                    break
-        except Exception as e:
-            print(f"Kafka consumpting error: {e}")
-    
+            with tracer.start_as_current_span(
+                f"{tp.topic} process", kind=SpanKind.CONSUMER, links=self._links(chunk)
+            ) as span:
+                span.set_attribute("messaging.batch.message_count", len(chunk))
+                await self._handler(chunk)
+        finally:
+            CONSUMER_BATCH_DURATION.observe(perf_counter() - start)
+
+    # Каждое сообщение пачки - отдельным вызовом; упавшие уходят в dead letter.
+    # False - dead letter не записан, пачку нужно повторить целиком
+    async def _isolate(self, tp: TopicPartition, chunk: list[ConsumerRecord]) -> bool:
+        for record in chunk:
+            try:
+                await self._handle(tp, [record])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                try:
+                    await self._dead_letter(record, e)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as dead_letter_error:
+                    print(f"Не удалось записать dead letter {tp.topic}[{tp.partition}:{record.offset}]: {dead_letter_error}")
+                    return False
+                self.dead_letters += 1
+                print(f"Сообщение {tp.topic}[{tp.partition}:{record.offset}] в dead letter: {e}")
+        self.batches += 1
+        self.processed += len(chunk)
+        return True
+
+    # Пачка продолжает несколько трасс: span обработки ссылается на каждую из них
+    def _links(self, chunk: list[ConsumerRecord]) -> list[trace.Link]:
+        if not settings.TRACING.enabled:
+            return []
+        links = []
+        for record in chunk:
+            span_context = trace.get_current_span(kafka_context(record.headers)).get_span_context()
+            if span_context.is_valid:
+                links.append(trace.Link(span_context))
+        return links
+
+    async def _commit(self, partitions: set[TopicPartition] | None = None) -> None:
+        offsets = {
+            tp: offset
+            for tp, offset in self._offsets.items()
+            if self._committed.get(tp) != offset and (partitions is None or tp in partitions)
+        }
+        if not offsets:
+            return
+        try:
+            await self._consumer.commit(offsets)
+        except KafkaError as e:
+            self.commit_errors += 1
+            print(f"Kafka commit error: {e}")
+            return
+        self._committed.update(offsets)
+        self.commits += 1
+
+    def _on_assigned(self, assigned) -> None:
+        for tp in assigned:
+            self._assigned.add(tp)
+            self._buffers.setdefault(tp, deque())
+
+    # Новые пачки по отозванным партициям не берутся; текущие дорабатывают,
+    # их offset фиксируется до передачи партиций другому участнику группы
+    async def _on_revoked(self, revoked) -> None:
+        revoked = set(revoked)
+        for tp in revoked:
+            self._buffers.pop(tp, None)
+        active = [self._active[tp].wait() for tp in revoked if tp in self._active]
+        if active:
+            try:
+                async with asyncio.timeout(self.config.shutdown_timeout_seconds):
+                    await asyncio.gather(*active)
+            except TimeoutError:
+                print(f"Обработка отозванных партиций не завершилась за {self.config.shutdown_timeout_seconds} с")
+        await self._commit(revoked)
+        for tp in revoked:
+            self._assigned.discard(tp)
+            self._paused.discard(tp)
+            self._offsets.pop(tp, None)
+            self._committed.pop(tp, None)
+
     async def stop(self):
-        self._is_running = False
+        self._running = False
+        if self._poll_task:
+            await self._poll_task
+        # Дорабатываем прочитанное, дальше его перечитает следующий запуск
+        try:
+            async with asyncio.timeout(self.config.shutdown_timeout_seconds):
+                while any(self._buffers.values()) or self._active:
+                    await asyncio.sleep(0.05)
+        except TimeoutError:
+            print("Не все прочитанные сообщения обработаны до остановки")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
         if self._consumer:
+            await self._commit()
             await self._consumer.stop()
-        if self._consumer_task:
-            self._consumer_task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "consumed": self.consumed,
+            "processed": self.processed,
+            "batches": self.batches,
+            "handler_errors": self.handler_errors,
+            "dead_letters": self.dead_letters,
+            "poll_restarts": self.poll_restarts,
+            "commits": self.commits,
+            "commit_errors": self.commit_errors,
+            "pauses": self.pauses,
+            "buffered": sum(len(buffer) for buffer in self._buffers.values()),
+            "assigned_partitions": len(self._assigned),
+            "paused_partitions": len(self._paused),
+        }
+
+
+# Некорректные сообщения пропускаются - повтор их не исправит, а партиция встанет
+async def save_notifications(records: list[ConsumerRecord]) -> None:
+    rows = []
+    for msg in records:
+        try:
+            message = NotificationMessage.model_validate(msg.value)
+        except ValidationError as e:
+            print(f"Некорректное сообщение {msg.topic}[{msg.partition}:{msg.offset}]: {e}")
+            continue
+        row = message.model_dump()
+        if row["message_key"] is None:
+            row["message_key"] = f"{msg.topic}:{msg.partition}:{msg.offset}"
+        rows.append(row)
+    await notification_writer.write(rows)
+
+
+async def save_dead_letter(record: ConsumerRecord, error: Exception) -> None:
+    async with engine.begin() as conn:
+        await insert_dead_letters(conn, [{
+            "source": "kafka",
+            "topic": record.topic,
+            "partition": record.partition,
+            "offset": record.offset,
+            "payload": record.value,
+            "error": repr(error),
+        }])
 
 
-consumer = KafkaConsumer()
\ No newline at end of file
+consumer = BatchConsumer(settings.KAFKA_CONSUMER, save_notifications, save_dead_letter)
@@ -0,0 +1,33 @@
+"""add message_key to notifications
+
+Revision ID: 5d2e8c41a7b3
+Revises: 3281c290ed27
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e8c41a7b3'
+down_revision: Union[str, Sequence[str], None] = '3281c290ed27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notifications', sa.Column('message_key', sa.String(length=256), nullable=True))
+    # Уже записанные строки получают ключ по своему id
+    op.execute("UPDATE notifications SET message_key = id::text")
+    op.alter_column('notifications', 'message_key', nullable=False)
+    op.create_unique_constraint('notifications_message_key_key', 'notifications', ['message_key'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('notifications_message_key_key', 'notifications', type_='unique')
+    op.drop_column('notifications', 'message_key')
@@ -0,0 +1,51 @@
+"""add updated_at to templates
+
+Revision ID: 9a4f1c7e2b60
+Revises: 5d2e8c41a7b3
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4f1c7e2b60'
+down_revision: Union[str, Sequence[str], None] = '5d2e8c41a7b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'templates',
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+    # Версия меняется на любом UPDATE, даже мимо приложения - иначе кеш шаблонов не узнает о правке
+    op.execute(
+        """
+        CREATE FUNCTION templates_set_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at = clock_timestamp();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER templates_set_updated_at
+        BEFORE UPDATE ON templates
+        FOR EACH ROW EXECUTE FUNCTION templates_set_updated_at()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER templates_set_updated_at ON templates")
+    op.execute("DROP FUNCTION templates_set_updated_at()")
+    op.drop_column('templates', 'updated_at')
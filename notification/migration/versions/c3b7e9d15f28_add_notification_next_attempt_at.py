@@ -0,0 +1,41 @@
+"""add next_attempt_at to notifications
+
+Revision ID: c3b7e9d15f28
+Revises: 9a4f1c7e2b60
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3b7e9d15f28'
+down_revision: Union[str, Sequence[str], None] = '9a4f1c7e2b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'notifications',
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    )
+    # Уже отправленным строкам ждать нечего
+    op.execute("UPDATE notifications SET next_attempt_at = NULL WHERE status = 'sent'")
+    op.create_index(
+        'ix_notifications_due',
+        'notifications',
+        ['next_attempt_at'],
+        unique=False,
+        postgresql_where=sa.text("status IN ('pending', 'failed')"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notifications_due', table_name='notifications')
+    op.drop_column('notifications', 'next_attempt_at')
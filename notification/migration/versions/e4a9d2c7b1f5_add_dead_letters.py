@@ -0,0 +1,40 @@
+"""add dead_letters
+
+Revision ID: e4a9d2c7b1f5
+Revises: c3b7e9d15f28
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a9d2c7b1f5'
+down_revision: Union[str, Sequence[str], None] = 'c3b7e9d15f28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'dead_letters',
+        sa.Column('source', sa.String(length=32), nullable=False),
+        sa.Column('topic', sa.String(length=256), nullable=True),
+        sa.Column('partition', sa.Integer(), nullable=True),
+        sa.Column('offset', sa.BigInteger(), nullable=True),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('error', sa.Text(), nullable=False),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('dead_letters')
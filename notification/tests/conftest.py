@@ -0,0 +1,76 @@
+import os
+
+# Settings требует параметры подключения к БД при импорте app.core.config
+for name, value in {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "notification_test",
+    "DB_USER": "test",
+    "DB_PASS": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import TestSettings
+from app.db.base import Base
+from app.db.models import DeadLetter, Notification, Template
+
+
+test_settings = TestSettings()  # type: ignore
+
+
+@pytest.fixture(scope="session")
+async def test_engine():
+    assert "test" in test_settings.DATABASE_URL
+    engine = create_async_engine(test_settings.DATABASE_URL, poolclass=NullPool)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+
+    await engine.dispose()
+
+
+# Писатель, планировщик и кеш шаблонов фиксируют свои транзакции сами,
+# поэтому вместо отката - очистка таблиц после каждого теста
+@pytest.fixture
+async def db(test_engine):
+    yield test_engine
+    async with test_engine.begin() as conn:
+        await conn.execute(text("TRUNCATE notifications, templates, dead_letters"))
+
+
+@pytest.fixture
+async def template(db):
+    template_id = uuid4()
+    async with db.begin() as conn:
+        await conn.execute(
+            text("""
+                INSERT INTO templates (id, name, subject, body, created_at, updated_at)
+                VALUES (:id, 'confirm', 'Код для {{ recipient_email }}',
+                        '<p>{{ verification_token }}</p>', now(), now())
+            """),
+            {"id": template_id},
+        )
+    return template_id
+
+
+def notification_row(template_id, n: int = 0, **values) -> dict:
+    return {
+        "message_key": f"test:{n}",
+        "user_id": uuid4(),
+        "template_id": template_id,
+        "recipient_email": f"user-{n}@example.com",
+        "verification_token": f"token-{n}",
+        **values,
+    }
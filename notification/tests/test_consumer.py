@@ -0,0 +1,226 @@
+import asyncio
+from time import time
+
+import pytest
+from aiokafka import TopicPartition
+from aiokafka.structs import ConsumerRecord
+
+import consumer as consumer_module
+from app.core.config import KafkaConsumer
+from consumer import BatchConsumer
+
+TP = TopicPartition("notifications", 0)
+
+
+def record(offset: int, value: dict | None = None) -> ConsumerRecord:
+    return ConsumerRecord(
+        topic=TP.topic, partition=TP.partition, offset=offset, timestamp=int(time() * 1000),
+        timestamp_type=0, key=None, value=value or {}, checksum=None,
+        serialized_key_size=0, serialized_value_size=0, headers=(),
+    )
+
+
+# Вместо брокера: getmany отдает то, что тест положил в очередь (исключение - выбрасывает),
+# pause/resume/commit только запоминаются
+class FakeKafka:
+    def __init__(self, *args, **kwargs):
+        self.polls: asyncio.Queue[list[ConsumerRecord] | Exception] = asyncio.Queue()
+        self.paused: list[TopicPartition] = []
+        self.resumed: list[TopicPartition] = []
+        self.commits: list[dict[TopicPartition, int]] = []
+        self._listener = None
+
+    def subscribe(self, topics, listener):
+        self._listener = listener
+
+    async def start(self):
+        await self._listener.on_partitions_assigned([TP])
+
+    async def stop(self):
+        pass
+
+    async def getmany(self, timeout_ms, max_records):
+        try:
+            batch = await asyncio.wait_for(self.polls.get(), timeout_ms / 1000)
+        except TimeoutError:
+            return {}
+        if isinstance(batch, Exception):
+            raise batch
+        return {TP: batch}
+
+    def pause(self, *partitions):
+        self.paused.extend(partitions)
+
+    def resume(self, *partitions):
+        self.resumed.extend(partitions)
+
+    async def commit(self, offsets):
+        self.commits.append(dict(offsets))
+
+    def highwater(self, tp):
+        return None
+
+
+async def wait_until(predicate, timeout: float = 2.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not predicate():
+            await asyncio.sleep(0.005)
+
+
+@pytest.fixture
+def kafka(monkeypatch):
+    fake = FakeKafka()
+    monkeypatch.setattr(consumer_module, "AIOKafkaConsumer", lambda *args, **kwargs: fake)
+    return fake
+
+
+@pytest.fixture
+async def start_consumer(kafka):
+    started = []
+
+    async def start(handler, dead_letter=None, **config) -> BatchConsumer:
+        async def no_dead_letter(record, error):
+            raise AssertionError(f"unexpected dead letter at offset {record.offset}")
+
+        config = {
+            "workers": 2,
+            "poll_timeout_ms": 10,
+            "commit_interval_ms": 0,
+            "retry_initial_backoff_ms": 1,
+            "retry_max_backoff_ms": 5,
+            "shutdown_timeout_seconds": 1.0,
+            **config,
+        }
+        batch_consumer = BatchConsumer(KafkaConsumer(**config), handler, dead_letter or no_dead_letter)
+        await batch_consumer.start()
+        started.append(batch_consumer)
+        return batch_consumer
+
+    yield start
+
+    for batch_consumer in started:
+        await batch_consumer.stop()
+
+
+async def test_consumer_commits_after_processing_in_order(kafka, start_consumer):
+    handled = []
+    release = asyncio.Event()
+
+    async def handler(records):
+        await release.wait()
+        handled.extend(r.offset for r in records)
+
+    batch_consumer = await start_consumer(handler)
+    await kafka.polls.put([record(0), record(1), record(2)])
+    await wait_until(lambda: batch_consumer.consumed == 3)
+    await asyncio.sleep(0.05)
+    # Пока пачка не обработана, фиксировать нечего
+    assert kafka.commits == []
+
+    release.set()
+    await kafka.polls.put([record(3), record(4)])
+    await wait_until(lambda: kafka.commits and kafka.commits[-1] == {TP: 5})
+
+    assert handled == [0, 1, 2, 3, 4]
+    committed = [commit[TP] for commit in kafka.commits]
+    assert committed == sorted(committed)
+    assert batch_consumer.stats()["processed"] == 5
+
+
+async def test_consumer_pauses_full_partition_and_resumes_when_drained(kafka, start_consumer):
+    release = asyncio.Event()
+
+    async def handler(records):
+        await release.wait()
+
+    batch_consumer = await start_consumer(
+        handler, max_partition_buffered=4, max_batch_size=2, max_buffered=100
+    )
+    await kafka.polls.put([record(offset) for offset in range(5)])
+    await wait_until(lambda: kafka.paused == [TP])
+    assert kafka.resumed == []
+    assert batch_consumer.stats()["paused_partitions"] == 1
+
+    release.set()
+    await wait_until(lambda: kafka.resumed == [TP])
+    await wait_until(lambda: batch_consumer.processed == 5)
+    assert batch_consumer.stats()["paused_partitions"] == 0
+
+
+async def test_consumer_retries_transient_failure(kafka, start_consumer):
+    calls = 0
+
+    async def handler(records):
+        nonlocal calls
+        calls += 1
+        if calls <= 2:
+            raise ConnectionError("database is restarting")
+
+    batch_consumer = await start_consumer(handler, max_attempts=5)
+    await kafka.polls.put([record(0)])
+    await wait_until(lambda: kafka.commits and kafka.commits[-1] == {TP: 1})
+
+    assert calls == 3
+    stats = batch_consumer.stats()
+    assert stats["handler_errors"] == 2
+    assert stats["dead_letters"] == 0
+
+
+async def test_consumer_dead_letters_poison_record(kafka, start_consumer):
+    handled = []
+    dead = []
+
+    async def handler(records):
+        if any(r.value.get("poison") for r in records):
+            raise ValueError("poison")
+        handled.extend(r.offset for r in records)
+
+    async def dead_letter(record, error):
+        dead.append((record.offset, error))
+
+    batch_consumer = await start_consumer(handler, dead_letter, max_attempts=2)
+    await kafka.polls.put([record(0), record(1, {"poison": True}), record(2)])
+    await wait_until(lambda: kafka.commits and kafka.commits[-1] == {TP: 3})
+
+    # Пачка упала max_attempts раз, затем разобрана по одному: соседи обработаны
+    assert handled == [0, 2]
+    assert [(offset, type(error)) for offset, error in dead] == [(1, ValueError)]
+    assert batch_consumer.stats()["dead_letters"] == 1
+    assert batch_consumer.stats()["handler_errors"] == 2
+
+
+async def test_consumer_retries_when_dead_letter_write_fails(kafka, start_consumer):
+    dead_letter_calls = 0
+
+    async def handler(records):
+        raise ValueError("poison")
+
+    async def dead_letter(record, error):
+        nonlocal dead_letter_calls
+        dead_letter_calls += 1
+        if dead_letter_calls <= 2:
+            raise ConnectionError("dead_letters unavailable")
+
+    batch_consumer = await start_consumer(handler, dead_letter, max_attempts=1)
+    await kafka.polls.put([record(0)])
+    await wait_until(lambda: kafka.commits and kafka.commits[-1] == {TP: 1})
+
+    # Offset не двигался, пока dead letter не записан
+    assert kafka.commits == [{TP: 1}]
+    assert dead_letter_calls == 3
+    assert batch_consumer.stats()["dead_letters"] == 1
+
+
+async def test_consumer_restarts_poll_after_unexpected_error(kafka, start_consumer):
+    handled = []
+
+    async def handler(records):
+        handled.extend(r.offset for r in records)
+
+    batch_consumer = await start_consumer(handler)
+    await kafka.polls.put(RuntimeError("unexpected"))
+    await kafka.polls.put([record(0)])
+    await wait_until(lambda: handled == [0])
+
+    assert batch_consumer.stats()["poll_restarts"] == 1
+    assert not batch_consumer._poll_task.done()
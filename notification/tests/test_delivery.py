@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import Delivery, Templates
+from app.crud.notifications import (
+    claim_due_notifications,
+    insert_notifications_bulk,
+    record_failed,
+    record_sent,
+)
+from app.db.enums import PendingStatusEnum
+from app.db.models import Notification
+from app.services.delivery import DeliveryScheduler
+from app.services.templates import TemplateCache
+from app.transport.base import DeliveryResult, OutgoingEmail, Transport
+from tests.conftest import notification_row
+
+
+# Результат по адресу получателя: None - доставлено, иначе (ошибка, permanent)
+class FakeTransport(Transport):
+    def __init__(self, outcomes: dict[str, tuple[str, bool]] | None = None, on_send=None):
+        self.outcomes = outcomes or {}
+        self.on_send = on_send
+        self.messages: list[OutgoingEmail] = []
+
+    async def send_batch(self, messages: list[OutgoingEmail]) -> list[DeliveryResult]:
+        self.messages.extend(messages)
+        if self.on_send is not None:
+            await self.on_send(messages)
+        return [
+            DeliveryResult(message.notification_id, *self.outcomes.get(message.recipient, (None, False)))
+            for message in messages
+        ]
+
+
+@pytest.fixture
+async def queued(db, template):
+    async with db.begin() as conn:
+        await insert_notifications_bulk(conn, [notification_row(template, n) for n in range(5)])
+
+
+async def notifications(engine) -> dict[str, Notification]:
+    async with engine.connect() as conn:
+        result = await conn.execute(select(Notification))
+        return {row.recipient_email: row for row in result}
+
+
+def scheduler(engine, transport: Transport, **config) -> DeliveryScheduler:
+    return DeliveryScheduler(
+        engine, transport, TemplateCache(engine, Templates()), Delivery(**config)
+    )
+
+
+async def test_concurrent_claims_are_disjoint(db, queued):
+    async with db.connect() as first, db.connect() as second:
+        async with first.begin():
+            claimed = await claim_due_notifications(first, 3, lease_seconds=60)
+            # Строки первой транзакции еще заблокированы - вторая их пропускает, а не ждет
+            async with second.begin():
+                others = await claim_due_notifications(second, 10, lease_seconds=60)
+
+    assert len(claimed) == 3
+    assert len(others) == 2
+    assert {row.id for row in claimed}.isdisjoint(row.id for row in others)
+    assert {row.attempts for row in claimed + others} == {1}
+
+    async with db.begin() as conn:
+        assert await claim_due_notifications(conn, 10, lease_seconds=60) == []
+
+
+async def test_expired_lease_is_reclaimed_and_stale_results_ignored(db, queued):
+    async with db.begin() as conn:
+        first = await claim_due_notifications(conn, 10, lease_seconds=0)
+    async with db.begin() as conn:
+        second = await claim_due_notifications(conn, 10, lease_seconds=60)
+
+    assert {row.id for row in second} == {row.id for row in first}
+    assert {row.attempts for row in second} == {2}
+    ids = [first[0].id]
+    async with db.begin() as conn:
+        # Первая аренда истекла: ее результаты не затирают вторую
+        assert await record_sent(conn, ids, [1]) == 0
+        assert await record_failed(conn, ids, [1], [None]) == 0
+        assert await record_sent(conn, ids, [2]) == 1
+        assert await record_failed(conn, ids, [2], [None]) == 1
+
+
+def test_backoff_seconds_grows_and_stops_at_max_attempts():
+    delivery = DeliveryScheduler(
+        None, FakeTransport(), None,
+        Delivery(max_attempts=4, backoff_initial_seconds=10, backoff_max_seconds=25),
+    )
+
+    for _ in range(100):
+        assert 5 <= delivery.backoff_seconds(1) <= 10
+        assert 10 <= delivery.backoff_seconds(2) <= 20
+        assert 12.5 <= delivery.backoff_seconds(3) <= 25
+    assert delivery.backoff_seconds(4) is None
+    assert delivery.backoff_seconds(5) is None
+
+
+async def test_scheduler_records_sent_retry_and_permanent_failures(db, queued):
+    transport = FakeTransport({
+        "user-1@example.com": ("451 try later", False),
+        "user-2@example.com": ("550 no such user", True),
+    })
+    delivery = scheduler(db, transport, batch_size=10, backoff_initial_seconds=60)
+
+    start = datetime.now(timezone.utc)
+    assert await delivery.run_once() == 5
+    assert await delivery.run_once() == 0
+
+    rows = await notifications(db)
+    sent = rows["user-0@example.com"]
+    assert sent.status == PendingStatusEnum.sent
+    assert sent.sent_at is not None and sent.next_attempt_at is None
+    retry = rows["user-1@example.com"]
+    assert retry.status == PendingStatusEnum.failed
+    assert start + timedelta(seconds=30) <= retry.next_attempt_at <= start + timedelta(seconds=61)
+    permanent = rows["user-2@example.com"]
+    assert permanent.status == PendingStatusEnum.failed
+    assert permanent.next_attempt_at is None
+    assert {row.attempts for row in rows.values()} == {1}
+
+    assert transport.messages[0].subject.startswith("Код для ")
+    stats = delivery.stats()
+    assert stats["sent"] == 3
+    assert stats["failed"] == 2
+    assert stats["permanent_failures"] == 1
+    assert stats["exhausted"] == 0
+    assert stats["lost_leases"] == 0
+
+
+async def test_scheduler_stops_retrying_after_max_attempts(db, queued):
+    transport = FakeTransport({f"user-{n}@example.com": ("451 try later", False) for n in range(5)})
+    delivery = scheduler(db, transport, batch_size=10, max_attempts=2, backoff_initial_seconds=0)
+
+    assert await delivery.run_once() == 5
+    assert await delivery.run_once() == 5
+    assert await delivery.run_once() == 0
+
+    rows = await notifications(db)
+    assert {(row.status, row.attempts, row.next_attempt_at) for row in rows.values()} == {
+        (PendingStatusEnum.failed, 2, None)
+    }
+    stats = delivery.stats()
+    assert stats["exhausted"] == 5
+    assert stats["failed"] == 10
+
+
+async def test_scheduler_counts_lost_leases(db, queued):
+    stolen: list[UUID] = []
+
+    # Пока письма уходят, аренда истекает и строки забирает другая реплика
+    async def steal(messages):
+        async with db.begin() as conn:
+            stolen.extend(row.id for row in await claim_due_notifications(conn, 10, lease_seconds=60))
+
+    delivery = scheduler(db, FakeTransport(on_send=steal), batch_size=10, lease_seconds=0)
+    assert await delivery.run_once() == 5
+
+    assert len(stolen) == 5
+    assert delivery.stats()["lost_leases"] == 5
+    assert delivery.stats()["sent"] == 5
+    rows = await notifications(db)
+    assert {(row.status, row.attempts) for row in rows.values()} == {(PendingStatusEnum.pending, 2)}
@@ -0,0 +1,85 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import func, select
+
+from app.core.config import BulkInsert
+from app.crud.notifications import insert_notifications_bulk
+from app.db.enums import PendingStatusEnum
+from app.db.models import DeadLetter, Notification
+from app.schemas.notification import NotificationMessage
+from app.services.notifications import NotificationWriter
+from tests.conftest import notification_row
+
+
+@pytest.mark.parametrize(
+    "recipient_email",
+    [
+        "user@example.com\r\nRCPT TO:<victim@example.com>",
+        "user@example.com>",
+        "<user@example.com",
+        "not an address",
+    ],
+)
+def test_notification_message_rejects_unsafe_recipient(recipient_email):
+    with pytest.raises(ValidationError):
+        NotificationMessage(user_id=uuid4(), template_id=uuid4(), recipient_email=recipient_email)
+
+
+async def count_notifications(engine) -> int:
+    async with engine.connect() as conn:
+        return await conn.scalar(select(func.count()).select_from(Notification))
+
+
+async def test_insert_notifications_bulk_skips_known_message_keys(db, template):
+    rows = [notification_row(template, n) for n in range(3)]
+
+    async with db.begin() as conn:
+        assert await insert_notifications_bulk(conn, rows) == 3
+    # Повторная доставка тех же сообщений и одно новое
+    async with db.begin() as conn:
+        assert await insert_notifications_bulk(conn, rows + [notification_row(template, 3)]) == 1
+
+    assert await count_notifications(db) == 4
+    async with db.connect() as conn:
+        result = await conn.execute(select(Notification.status, Notification.attempts).distinct())
+        assert result.all() == [(PendingStatusEnum.pending, 0)]
+
+
+async def test_writer_batches_concurrent_writes_into_one_flush(db, template):
+    writer = NotificationWriter(db, BulkInsert(max_rows=100, max_delay_ms=20))
+
+    await asyncio.gather(*(writer.write([notification_row(template, n)]) for n in range(5)))
+    await writer.write([notification_row(template, 0)])
+
+    stats = writer.stats()
+    assert stats["flushes"] == 2
+    assert stats["inserted"] == 5
+    assert stats["duplicates"] == 1
+    assert await count_notifications(db) == 5
+
+
+async def test_writer_dead_letters_rows_rejected_by_constraint(db, template):
+    writer = NotificationWriter(db, BulkInsert(max_rows=3, max_delay_ms=1000))
+    orphan = notification_row(uuid4(), 1)
+
+    await writer.write([notification_row(template, 0), orphan, notification_row(template, 2)])
+
+    async with db.connect() as conn:
+        keys = (await conn.scalars(select(Notification.message_key).order_by(Notification.message_key))).all()
+        dead_letters = (await conn.execute(select(DeadLetter.source, DeadLetter.payload, DeadLetter.error))).all()
+    assert keys == ["test:0", "test:2"]
+    assert len(dead_letters) == 1
+    source, payload, error = dead_letters[0]
+    assert source == "writer"
+    assert payload["message_key"] == orphan["message_key"]
+    assert payload["template_id"] == str(orphan["template_id"])
+    assert "foreign key" in error
+
+    stats = writer.stats()
+    assert stats["inserted"] == 2
+    assert stats["rejected"] == 1
+    assert stats["duplicates"] == 0
+    assert stats["failed_flushes"] == 0
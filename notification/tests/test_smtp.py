@@ -0,0 +1,204 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from app.core.config import Smtp
+from app.transport.base import OutgoingEmail
+from app.transport.smtp import SMTPConnection
+
+
+# SMTP сервер в процессе теста. Запоминает команды и принятые письма;
+# rejected - получатели, которым RCPT TO отвечает 550; drop_on_message - после
+# тела этого по счету письма (с 1) соединение рвется без ответа
+class FakeSMTPServer:
+    def __init__(self, pipelining: bool = True, rejected: set[str] = frozenset(), drop_on_message: int | None = None):
+        self.pipelining = pipelining
+        self.rejected = rejected
+        self.drop_on_message = drop_on_message
+        self.commands: list[str] = []
+        # Что сервер получил одним чтением - по ним видно, шли ли команды конвейером
+        self.reads: list[bytes] = []
+        self.received: list[bytes] = []
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.write(b"220 fake ESMTP\r\n")
+        buffer = b""
+        data: list[bytes] | None = None
+        has_recipient = False
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    return
+                self.reads.append(chunk)
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\r\n")
+                replies = []
+                for line in lines:
+                    if data is not None:
+                        if line != b".":
+                            data.append(line)
+                            continue
+                        self.received.append(b"\r\n".join(data))
+                        data = None
+                        has_recipient = False
+                        if len(self.received) == self.drop_on_message:
+                            return
+                        replies.append(b"250 queued")
+                        continue
+
+                    command = line.decode()
+                    self.commands.append(command)
+                    verb = command[:4].upper()
+                    if verb == "EHLO":
+                        replies.append(b"250-fake\r\n250-PIPELINING" if self.pipelining else b"250-fake")
+                        replies.append(b"250 8BITMIME")
+                    elif verb == "MAIL":
+                        replies.append(b"250 ok")
+                    elif verb == "RCPT":
+                        recipient = command.partition("<")[2].rstrip(">")
+                        if recipient in self.rejected:
+                            replies.append(b"550 no such user")
+                        else:
+                            has_recipient = True
+                            replies.append(b"250 ok")
+                    elif verb == "DATA":
+                        if has_recipient:
+                            data = []
+                            replies.append(b"354 go ahead")
+                        else:
+                            replies.append(b"503 no valid recipients")
+                    elif verb == "RSET":
+                        has_recipient = False
+                        replies.append(b"250 ok")
+                    elif verb == "QUIT":
+                        writer.write(b"221 bye\r\n")
+                        return
+                    else:
+                        replies.append(b"500 unknown command")
+                if replies:
+                    writer.write(b"\r\n".join(replies) + b"\r\n")
+                    await writer.drain()
+        finally:
+            writer.close()
+
+    def sent_commands(self) -> list[str]:
+        return [command for command in self.commands if not command.startswith("EHLO")]
+
+
+def email(recipient: str) -> tuple[OutgoingEmail, bytes]:
+    message = OutgoingEmail(uuid4(), recipient, "subject", "body")
+    return message, f"To: {recipient}\r\n\r\nbody\r\n.\r\n".encode()
+
+
+@pytest.fixture
+async def smtp_connection():
+    servers: list[FakeSMTPServer] = []
+    connections: list[SMTPConnection] = []
+
+    async def connect(pipelining: bool = True, **server_options) -> tuple[FakeSMTPServer, SMTPConnection]:
+        server = FakeSMTPServer(pipelining=pipelining, **server_options)
+        port = await server.start()
+        servers.append(server)
+        connection = SMTPConnection(Smtp(host="127.0.0.1", port=port, pipelining=True, timeout_seconds=2))
+        await connection.connect()
+        connections.append(connection)
+        return server, connection
+
+    yield connect
+
+    for connection in connections:
+        await connection.close()
+    for server in servers:
+        await server.stop()
+
+
+@pytest.mark.parametrize("pipelining", [True, False])
+async def test_send_many_delivers_every_message(smtp_connection, pipelining):
+    server, connection = await smtp_connection(pipelining=pipelining)
+    items = [email(f"user-{n}@example.com") for n in range(3)]
+
+    results = await connection.send_many(items)
+
+    assert connection.pipelining is pipelining
+    assert [result.notification_id for result in results] == [message.notification_id for message, _ in items]
+    assert all(result.error is None for result in results)
+    assert server.received == [data[: -len(b"\r\n.\r\n")] for _, data in items]
+    assert connection.messages_sent == 3
+    assert server.sent_commands() == [
+        command
+        for n in range(3)
+        for command in ("MAIL FROM:<noreply@example.com>", f"RCPT TO:<user-{n}@example.com>", "DATA")
+    ]
+    # С конвейером конверт письма приходит одной записью, без него - по команде
+    envelopes = [read for read in server.reads if b"MAIL FROM" in read]
+    assert all((b"RCPT TO" in read and b"DATA" in read) is pipelining for read in envelopes)
+
+
+@pytest.mark.parametrize("pipelining", [True, False])
+async def test_send_many_resets_after_rejected_recipient(smtp_connection, pipelining):
+    server, connection = await smtp_connection(pipelining=pipelining, rejected={"missing@example.com"})
+    items = [email("user-0@example.com"), email("missing@example.com"), email("user-2@example.com")]
+
+    results = await connection.send_many(items)
+
+    assert [result.notification_id for result in results] == [message.notification_id for message, _ in items]
+    assert results[0].error is None and results[2].error is None
+    assert results[1].error == "RCPT TO: 550 no such user"
+    assert results[1].permanent
+    assert len(server.received) == 2
+    # После отказа - RSET, следующее письмо начинается с чистой транзакции
+    commands = server.sent_commands()
+    rejected = commands.index("RCPT TO:<missing@example.com>")
+    expected = ["RSET", "MAIL FROM:<noreply@example.com>"]
+    if pipelining:
+        # Конвейер отправляет DATA, не дожидаясь ответа на RCPT TO
+        expected.insert(0, "DATA")
+    assert commands[rejected + 1: rejected + 1 + len(expected)] == expected
+
+
+@pytest.mark.parametrize("pipelining", [True, False])
+async def test_send_many_fails_unsent_messages_on_broken_connection(smtp_connection, pipelining):
+    server, connection = await smtp_connection(pipelining=pipelining, drop_on_message=2)
+    items = [email(f"user-{n}@example.com") for n in range(4)]
+
+    results = await connection.send_many(items)
+
+    assert connection.broken
+    assert len(results) == 4
+    assert {result.notification_id for result in results} == {message.notification_id for message, _ in items}
+    delivered = {result.notification_id for result in results if result.error is None}
+    assert delivered == {items[0][0].notification_id}
+    failed = [result for result in results if result.error is not None]
+    assert all(result.error.startswith("SMTP connection failed") for result in failed)
+    # Разрыв - временная ошибка, письма уйдут следующей попыткой
+    assert not any(result.permanent for result in failed)
+
+
+@pytest.mark.parametrize("pipelining", [True, False])
+async def test_send_many_refuses_recipient_with_smtp_syntax(smtp_connection, pipelining):
+    server, connection = await smtp_connection(pipelining=pipelining)
+    injected = "user@example.com>\r\nRCPT TO:<victim@example.com"
+    items = [email("user-0@example.com"), email(injected), email("user-2@example.com")]
+
+    results = {result.notification_id: result for result in await connection.send_many(items)}
+
+    # С конвейером результат отклоненного письма приходит раньше ответа на предыдущее
+    first, rejected, last = (results[message.notification_id] for message, _ in items)
+    assert len(results) == 3
+    assert first.error is None and last.error is None
+    assert rejected.error.startswith("invalid recipient address")
+    assert rejected.permanent
+    assert not connection.broken
+    assert len(server.received) == 2
+    assert not any("victim" in command for command in server.commands)
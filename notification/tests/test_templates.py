@@ -0,0 +1,88 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from jinja2 import UndefinedError
+from sqlalchemy import text
+
+from app.core.config import Templates
+from app.core.exceptions import TemplateNotFoundError
+from app.crud.notifications import insert_notifications_bulk
+from app.services.templates import TemplateCache
+from tests.conftest import notification_row
+
+CONTEXT = {"recipient_email": "user@example.com", "verification_token": "<b>42</b>"}
+
+
+async def update_template(engine, template_id, body: str) -> None:
+    # В тестовой схеме нет триггера templates_set_updated_at - версия выставляется явно
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("UPDATE templates SET body = :body, updated_at = updated_at + interval '1 second' WHERE id = :id"),
+            {"id": template_id, "body": body},
+        )
+
+
+async def test_template_cache_compiles_once(db, template):
+    cache = TemplateCache(db, Templates())
+
+    results = await asyncio.gather(*(cache.render(template, CONTEXT) for _ in range(5)))
+    await cache.render(template, CONTEXT)
+
+    assert {result.subject for result in results} == {"Код для user@example.com"}
+    # Тело экранируется, тема письма - нет
+    assert results[0].body == "<p>&lt;b&gt;42&lt;/b&gt;</p>"
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["hits"] == 1
+    assert stats["entries"] == 1
+
+
+async def test_template_cache_recompiles_after_updated_at_changes(db, template):
+    cache = TemplateCache(db, Templates())
+    await cache.get(template)
+
+    await update_template(db, template, "<p>Новый код: {{ verification_token }}</p>")
+    # До сверки версий отдается закешированная версия
+    assert (await cache.render(template, CONTEXT)).body == "<p>&lt;b&gt;42&lt;/b&gt;</p>"
+
+    await cache.refresh()
+    assert (await cache.render(template, CONTEXT)).body == "<p>Новый код: &lt;b&gt;42&lt;/b&gt;</p>"
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    assert stats["misses"] == 2
+    assert stats["entries"] == 1
+
+
+async def test_template_cache_forgets_deleted_template(db, template):
+    cache = TemplateCache(db, Templates())
+    await cache.get(template)
+
+    async with db.begin() as conn:
+        await conn.execute(text("DELETE FROM templates WHERE id = :id"), {"id": template})
+    await cache.refresh()
+
+    with pytest.raises(TemplateNotFoundError):
+        await cache.get(template)
+    with pytest.raises(TemplateNotFoundError):
+        await cache.get(uuid4())
+
+
+async def test_template_cache_rejects_missing_variable(db, template):
+    cache = TemplateCache(db, Templates())
+
+    with pytest.raises(UndefinedError):
+        await cache.render(template, {"recipient_email": "user@example.com"})
+
+
+async def test_template_cache_preloads_hot_templates(db, template):
+    async with db.begin() as conn:
+        await insert_notifications_bulk(conn, [notification_row(template)])
+    cache = TemplateCache(db, Templates())
+
+    await cache.preload()
+    await cache.get(template)
+
+    assert cache.stats()["misses"] == 0
+    assert cache.stats()["hits"] == 1
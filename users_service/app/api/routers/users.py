@@ -1,7 +1,8 @@
 from typing import Annotated, Sequence
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import EmailStr
 
 from app.db.models import User
@@ -9,19 +10,31 @@ from app.core.exceptions import UserNotFoundByEmailError, UserNotFoundByIdError,
 from app.crud.users import (
     get_user_by_email,
     get_user_by_id,
+    get_user_row_by_id,
+    get_user_rows,
     get_users,
+    next_users_cursor,
     create_user,
     deactivate_user,
     update_user,
 )
 
-from app.db.session import session_DB
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.session import get_read_session_maker, read_session_DB, session_DB
 from app.schemas.user import (
     UserCreateSchema,
     UserOutSchema,
     UserUpdateSchema,
+    UsersBulkCreateSchema,
+    UsersBulkResultSchema,
+    UsersExportQuerySchema,
     UsersListQuerySchema,
+    user_row_adapter,
+    user_rows_adapter,
 )
+from app.services.users import EXPORT_MEDIA_TYPES, bulk_create_users, export_users
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -38,17 +51,55 @@ async def create_user_handler(user_data: UserCreateSchema, session: session_DB)
         )
 
 
+# Импорт пачками: одна строка с ошибкой не отклоняет остальные, исход - по каждой строке
+@router.post("/bulk", response_model=UsersBulkResultSchema)
+async def bulk_create_users_handler(
+    data: UsersBulkCreateSchema, session: session_DB
+) -> UsersBulkResultSchema:
+    return await bulk_create_users(data.users, session)
+
+
+def set_next_cursor(response: Response, users, params: UsersListQuerySchema) -> None:
+    cursor = next_users_cursor(users, params)
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = cursor
+
+
 @router.get("/", response_model=list[UserOutSchema])
 async def get_users_handler(
-    params: Annotated[UsersListQuerySchema, Depends()], session: session_DB
+    params: Annotated[UsersListQuerySchema, Query()], session: read_session_DB, response: Response
 ) -> list[UserOutSchema]:
+    # FAST_JSON: строки БД сериализуются сразу в байты, минуя ORM и валидацию response_model
+    if settings.FAST_JSON:
+        rows = await get_user_rows(params, session)
+        fast_response = Response(
+            content=user_rows_adapter.dump_json([row._asdict() for row in rows]),
+            media_type="application/json",
+        )
+        set_next_cursor(fast_response, rows, params)
+        return fast_response
+
     users = await get_users(params=params, session=session)
+    set_next_cursor(response, users, params)
     return users
 
 
+# Объявлен до /{user_id}, иначе "export" разбирался бы как id
+@router.get("/export", response_class=StreamingResponse)
+async def export_users_handler(
+    params: Annotated[UsersExportQuerySchema, Query()],
+    session_maker: Annotated[async_sessionmaker[AsyncSession], Depends(get_read_session_maker)],
+) -> StreamingResponse:
+    return StreamingResponse(
+        export_users(params, session_maker),
+        media_type=EXPORT_MEDIA_TYPES[params.format],
+        headers={"Content-Disposition": f'attachment; filename="users.{params.format.value}"'},
+    )
+
+
 @router.get("/by-email", response_model=UserOutSchema)
 async def get_user_by_email_handler(
-    user_email: EmailStr, session: session_DB
+    user_email: EmailStr, session: read_session_DB
 ) -> UserOutSchema:
     try:
         user = await get_user_by_email(user_email=user_email, session=session)
@@ -58,8 +109,13 @@ async def get_user_by_email_handler(
 
 
 @router.get("/{user_id}", response_model=UserOutSchema)
-async def get_user_by_id_handler(user_id: UUID, session: session_DB) -> UserOutSchema:
+async def get_user_by_id_handler(user_id: UUID, session: read_session_DB) -> UserOutSchema:
     try:
+        if settings.FAST_JSON:
+            user = await get_user_row_by_id(user_id, session)
+            return Response(
+                content=user_row_adapter.dump_json(user._asdict()), media_type="application/json"
+            )
         user = await get_user_by_id(user_id=user_id, session=session)
         return user
     except UserNotFoundByIdError as e:
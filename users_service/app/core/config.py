@@ -1,6 +1,9 @@
 from pathlib import Path
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from common.config import DBPool, Tracing
+
 
 BASE_DIR = Path(__file__).resolve().parents[2]
 
@@ -11,16 +14,59 @@ class Settings(BaseSettings):
     DB_NAME: str
     DB_USER: str
     DB_PASS: str
+    DB_POOL: DBPool = DBPool()
+    TRACING: Tracing = Tracing()
+
+    # Реплики для чтения, "host:port"; имя БД, пользователь и пароль - как у primary.
+    # В .env задается JSON списком: DB_REPLICAS='["replica-1:5432","replica-2:5432"]'
+    DB_REPLICAS: list[str] = []
+    DB_REPLICA_CHECK_INTERVAL_SECONDS: float = 5.0
+    DB_REPLICA_CHECK_TIMEOUT_SECONDS: float = 1.0
+    # Отстающая сильнее реплика выводится из ротации
+    DB_REPLICA_MAX_LAG_SECONDS: float = 10.0
+
+    KAFKA_BOOTSTRAP_SERVERS: str = "localhost:9092"
+    # user.created / user.updated / user.deactivated, по ним auth_service сбрасывает кеш
+    USER_EVENTS_TOPIC: str = "users.events"
+
+    # GET /users/ и /users/{id} без ORM объектов: строки из БД сразу в JSON
+    FAST_JSON: bool = False
+
+    # POST /users/bulk и CreateUsers: строк в одном запросе / сообщении потока
+    USERS_BULK_MAX_ROWS: int = 10_000
+    # Строк в одном INSERT ... SELECT FROM unnest
+    USERS_BULK_CHUNK_SIZE: int = 5000
+
+    # gRPC сервер
+    GRPC_BIND: str = "0.0.0.0:50051"
+    # Сверх лимита сервер сразу отвечает RESOURCE_EXHAUSTED, а не копит очередь
+    GRPC_MAX_CONCURRENT_RPCS: int = 512
+    # Потоков на одно HTTP/2 соединение; клиенты держат несколько каналов
+    GRPC_MAX_CONCURRENT_STREAMS: int = 128
+    GRPC_COMPRESSION: Literal["none", "gzip", "deflate"] = "none"
+    # Сколько ждать завершения текущих вызовов при остановке
+    GRPC_SHUTDOWN_GRACE_SECONDS: float = 10.0
+    # Порт HTTP для /metrics процесса gRPC сервера, 0 - не поднимать
+    GRPC_METRICS_PORT: int = 9101
+    # Верхняя граница пакета в GetUsersByEmails/GetUsersByIds
+    GRPC_MAX_BATCH_SIZE: int = 1000
 
     # Конфигурируем .env файл
-    model_config = SettingsConfigDict(env_file=str(BASE_DIR / ".env"))
+    model_config = SettingsConfigDict(env_file=str(BASE_DIR / ".env"), env_nested_delimiter="__")
 
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+
+    @property
+    def REPLICA_URLS(self) -> list[str]:
+        return [
+            f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{replica}/{self.DB_NAME}"
+            for replica in self.DB_REPLICAS
+        ]
     
 class TestSettings(Settings):
-    model_config = SettingsConfigDict(env_file=str(BASE_DIR / ".test.env"))
+    model_config = SettingsConfigDict(env_file=str(BASE_DIR / ".test.env"), env_nested_delimiter="__")
 
 
 settings = Settings()  # type: ignore
@@ -0,0 +1,33 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import User
+from kafka_producer import producer
+
+
+PENDING_EVENTS_KEY = "pending_user_events"
+
+
+# События копятся в сессии и уходят в Kafka только после commit,
+# иначе потребитель может перечитать еще не зафиксированные данные
+def queue_user_event(session: AsyncSession, event: str, user: User) -> None:
+    session.info.setdefault(PENDING_EVENTS_KEY, []).append(
+        {"event": event, "user_id": str(user.id), "email": user.email}
+    )
+
+
+def discard_user_events(session: AsyncSession) -> None:
+    session.info.pop(PENDING_EVENTS_KEY, None)
+
+
+async def publish_user_events(session: AsyncSession) -> None:
+    events = session.info.pop(PENDING_EVENTS_KEY, [])
+    if not events:
+        return
+    try:
+        await producer.send_many(
+            settings.USER_EVENTS_TOPIC, [(event["user_id"], event) for event in events]
+        )
+    except Exception as e:
+        # Потребители кешируют данные с коротким TTL, потеря события не критична
+        print(f"Не удалось отправить {len(events)} событий - {e}")
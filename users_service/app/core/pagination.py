@@ -0,0 +1,22 @@
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+
+# Непрозрачный курсор keyset пагинации: значение колонки сортировки и id
+# последней строки страницы плюс сама сортировка, чтобы курсор нельзя было
+# применить к выдаче с другим порядком
+def encode_cursor(sort_by: str, sort_order: str, value: datetime, user_id: UUID) -> str:
+    payload = {"s": sort_by, "o": sort_order, "v": value.isoformat(), "id": str(user_id)}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, str, datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        return payload["s"], payload["o"], datetime.fromisoformat(payload["v"]), UUID(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
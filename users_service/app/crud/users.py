@@ -1,10 +1,21 @@
-from uuid import UUID
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID, uuid4
+from sqlalchemy import Boolean, String, any_, bindparam, func, insert, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as SQLUUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 from sqlalchemy.exc import IntegrityError
 
+from app.core.config import settings
 from app.db.models import User
-from app.schemas.user import SortBy, SortOrder, UserCreateSchema, UserUpdateSchema, UsersListQuerySchema
+from app.core.events import queue_user_event
+from app.core.pagination import decode_cursor, encode_cursor
+from app.schemas.user import (
+    SortBy,
+    SortOrder,
+    UserCreateSchema,
+    UserUpdateSchema,
+    UsersFilterSchema,
+    UsersListQuerySchema,
+)
 
 from app.core.exceptions import (
     UserNotFoundByIdError,
@@ -13,86 +24,202 @@ from app.core.exceptions import (
 )
 
 
+# Все записи - один запрос INSERT/UPDATE ... RETURNING вместо flush + refresh.
+# populate_existing обновляет объект, если он уже есть в identity map сессии
 async def create_user(user_data: dict, session: AsyncSession):
-    user = User(**user_data)
-    session.add(user)
+    # None - значит поле не задано, пусть сработает default колонки
+    values = {field: value for field, value in user_data.items() if value is not None}
+    stmt = insert(User).values(**values).returning(User)
     try:
-        await session.flush()
-        await session.refresh(user)
-        return user
+        result = await session.scalars(stmt)
+        user = result.one()
     except IntegrityError as e:
-        raise UserAlreadyExistsError(user.email)
+        raise UserAlreadyExistsError(user_data["email"])
+
+    queue_user_event(session, "user.created", user)
+    return user
+
+
+# INSERT ... SELECT FROM unnest($1, $2, $3, $4) ON CONFLICT (email) DO NOTHING RETURNING:
+# четыре параметра-массива при любом размере пачки, поэтому запрос компилируется
+# и готовится в asyncpg один раз, а не на каждую пачку со своим числом VALUES.
+# В ответе только вставленные строки: email, которого нет в результате, уже существовал
+async def create_users_bulk(
+    users_data: list[dict], session: AsyncSession, chunk_size: int = settings.USERS_BULK_CHUNK_SIZE
+) -> dict[str, UUID]:
+    rows = func.unnest(
+        bindparam("ids", type_=ARRAY(SQLUUID(as_uuid=True))),
+        bindparam("emails", type_=ARRAY(String)),
+        bindparam("is_active", type_=ARRAY(Boolean)),
+        bindparam("is_verified", type_=ARRAY(Boolean)),
+    ).table_valued("id", "email", "is_active", "is_verified").render_derived()
+    stmt = (
+        pg_insert(User)
+        .from_select([User.id, User.email, User.is_active, User.is_verified], select(*rows.c))
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User.id, User.email)
+    )
+
+    # Через Core соединение сессии: ORM execute превратил бы это в свой bulk insert
+    conn = await session.connection()
+    created: dict[str, UUID] = {}
+    for start in range(0, len(users_data), chunk_size):
+        chunk = users_data[start:start + chunk_size]
+        params = {
+            # id генерируем здесь: default колонки в INSERT ... SELECT не применяется
+            "ids": [uuid4() for _ in chunk],
+            "emails": [user_data["email"] for user_data in chunk],
+            "is_active": [user_data.get("is_active") is not False for user_data in chunk],
+            "is_verified": [bool(user_data.get("is_verified")) for user_data in chunk],
+        }
+        result = await conn.execute(stmt, params)
+        for row in result:
+            queue_user_event(session, "user.created", row)
+            created[row.email] = row.id
+    return created
 
 
 async def deactivate_user(user_id: UUID, session: AsyncSession):
+    stmt = (
+        update(User)
+        .where(User.id == user_id, User.is_active.is_(True))
+        .values(is_active=False)
+        .returning(User)
+        .execution_options(populate_existing=True)
+    )
+    result = await session.scalars(stmt)
+    user = result.one_or_none()
+
+    if user is not None:
+        queue_user_event(session, "user.deactivated", user)
+        return user
+
+    # Пользователь уже неактивен или его нет
     user = await session.get(User, user_id)
 
     if user is None:
         raise UserNotFoundByIdError(user_id)
 
-    if user.is_active is False:
-        return user
-
-    user.is_active = False
-    await session.flush()
-    await session.refresh(user)
     return user
 
 
 async def update_user(
     user_id: UUID, user_data: UserUpdateSchema, session: AsyncSession
 ):
-    user = await session.get(User, user_id)
-
-    if user is None:
-        raise UserNotFoundByIdError(user_id)
-
     update_data = user_data.model_dump(exclude_unset=True)
 
-    if not update_data:
-        return user
+    if update_data:
+        # Обновляем строку, только если хотя бы одно поле действительно меняется,
+        # иначе updated_at не должен сдвигаться
+        has_changes = or_(
+            *(getattr(User, field).is_distinct_from(value) for field, value in update_data.items())
+        )
+        stmt = (
+            update(User)
+            .where(User.id == user_id, has_changes)
+            .values(**update_data)
+            .returning(User)
+            .execution_options(populate_existing=True)
+        )
+        result = await session.scalars(stmt)
+        user = result.one_or_none()
 
-    has_changes = False
+        if user is not None:
+            queue_user_event(session, "user.updated", user)
+            return user
 
-    for field, value in update_data.items():
-        if getattr(user, field) != value:
-            setattr(user, field, value)
-            has_changes = True
+    user = await session.get(User, user_id)
 
-    if not has_changes:
-        return user
+    if user is None:
+        raise UserNotFoundByIdError(user_id)
 
-    await session.flush()
-    await session.refresh(user)
     return user
 
+# Колонки UserOutSchema - для выборок без ORM объектов
+USER_OUT_COLUMNS = (User.id, User.email, User.is_active, User.is_verified, User.created_at, User.updated_at)
+
 SORT_MAPPED = {
     SortBy.CREATED_AT: User.created_at,
     SortBy.UPDATED_AT: User.updated_at
 }
 
-async def get_users(params: UsersListQuerySchema, session: AsyncSession):
-    stmt = select(User)
-    
-    if params.is_active:
+# Порядок всегда (колонка, id) в одном направлении: тогда страница - это
+# сравнение строк (created_at, id) < (:v, :id) и обход индекса (created_at, id)
+# с нужного места, время не зависит от глубины
+def filter_users(stmt, params: UsersFilterSchema):
+    if params.is_active is not None:
         stmt = stmt.where(User.is_active == params.is_active)
 
-    if params.is_verified:
+    if params.is_verified is not None:
         stmt = stmt.where(User.is_verified == params.is_verified)
-        
+
     sort_column = SORT_MAPPED[params.sort_by]
 
     if params.sort_order == SortOrder.DESC:
-        stmt = stmt.order_by(sort_column.desc(), User.id.asc())
-    else:
-        stmt = stmt.order_by(sort_column.asc(), User.id.asc())
+        return stmt.order_by(sort_column.desc(), User.id.desc())
+    return stmt.order_by(sort_column.asc(), User.id.asc())
+
 
-    stmt = stmt.limit(params.limit).offset(params.offset)
+def users_page(stmt, params: UsersListQuerySchema):
+    stmt = filter_users(stmt, params)
 
+    if params.cursor is not None:
+        _, _, value, last_id = decode_cursor(params.cursor)
+        position = tuple_(SORT_MAPPED[params.sort_by], User.id)
+        if params.sort_order == SortOrder.DESC:
+            stmt = stmt.where(position < tuple_(value, last_id))
+        else:
+            stmt = stmt.where(position > tuple_(value, last_id))
+
+    return stmt.limit(params.limit).offset(params.offset)
+
+
+async def get_users(params: UsersListQuerySchema, session: AsyncSession):
+    stmt = users_page(select(User), params)
     result = await session.execute(stmt)
     users = result.scalars().all()
     return users
 
+
+# Та же страница строками, без ORM объектов и identity map
+async def get_user_rows(params: UsersListQuerySchema, conn: AsyncConnection | AsyncSession):
+    result = await conn.execute(users_page(select(*USER_OUT_COLUMNS), params))
+    return result.all()
+
+
+async def get_user_row_by_id(user_id: UUID, conn: AsyncConnection | AsyncSession):
+    result = await conn.execute(select(*USER_OUT_COLUMNS).where(User.id == user_id))
+    user = result.one_or_none()
+
+    if user is None:
+        raise UserNotFoundByIdError(user_id)
+
+    return user
+
+
+
+
+# Выгрузка через серверный курсор: в памяти не больше chunk_size строк.
+# Строки, а не ORM объекты - identity map сессии не растет
+async def stream_users(params: UsersFilterSchema, session: AsyncSession, chunk_size: int = 1000):
+    stmt = filter_users(select(*USER_OUT_COLUMNS), params).execution_options(yield_per=chunk_size)
+    result = await session.stream(stmt)
+    async for rows in result.partitions():
+        yield rows
+
+
+# Курсор следующей страницы; None, если страница неполная и дальше ничего нет
+def next_users_cursor(users, params: UsersListQuerySchema) -> str | None:
+    if len(users) < params.limit:
+        return None
+    last = users[-1]
+    return encode_cursor(
+        params.sort_by.value,
+        params.sort_order.value,
+        getattr(last, params.sort_by.value),
+        last.id,
+    )
+
 async def get_user_by_id(user_id: UUID, session: AsyncSession):
     user = await session.get(User, user_id)
 
@@ -110,3 +237,34 @@ async def get_user_by_email(user_email: str, session: AsyncSession):
         raise UserNotFoundByEmailError(user_email)
 
     return user
+
+
+# Проекция для gRPC: только поля ответа, без сборки ORM объектов и identity map.
+# Работает и с AsyncConnection, и с AsyncSession.
+# Пакеты передаются одним параметром-массивом (email = ANY($1)),
+# поэтому текст запроса и план в кеше asyncpg не зависят от размера пакета
+USER_STATUS_COLUMNS = (User.id, User.email, User.is_active, User.is_verified)
+
+
+async def get_user_status_by_email(user_email: str, conn: AsyncConnection | AsyncSession):
+    stmt = select(*USER_STATUS_COLUMNS).where(User.email == user_email)
+    result = await conn.execute(stmt)
+    return result.one_or_none()
+
+
+async def get_user_statuses_by_emails(emails: list[str], conn: AsyncConnection | AsyncSession):
+    if not emails:
+        return []
+    emails_param = bindparam("emails", emails, type_=ARRAY(String))
+    stmt = select(*USER_STATUS_COLUMNS).where(User.email == any_(emails_param))
+    result = await conn.execute(stmt)
+    return result.all()
+
+
+async def get_user_statuses_by_ids(user_ids: list[UUID], conn: AsyncConnection | AsyncSession):
+    if not user_ids:
+        return []
+    ids_param = bindparam("user_ids", user_ids, type_=ARRAY(SQLUUID(as_uuid=True)))
+    stmt = select(*USER_STATUS_COLUMNS).where(User.id == any_(ids_param))
+    result = await conn.execute(stmt)
+    return result.all()
@@ -1,6 +1,6 @@
 from datetime import datetime
 from uuid import UUID, uuid4
-from sqlalchemy import DateTime, func
+from sqlalchemy import DateTime, Index, func
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID as SQLUUID
 
@@ -9,6 +9,19 @@ from app.db.base import Base
 
 class User(Base):
     __tablename__ = "users"
+    # Индексы под keyset пагинацию GET /users/: сортировка (колонка, id) после
+    # равенств фильтра. На каждую колонку сортировки - по индексу на сочетание
+    # фильтров is_active/is_verified, иначе страница читается с фильтром и сортировкой
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+        Index("ix_users_updated_at_id", "updated_at", "id"),
+        Index("ix_users_active_created_at_id", "is_active", "created_at", "id"),
+        Index("ix_users_active_updated_at_id", "is_active", "updated_at", "id"),
+        Index("ix_users_verified_created_at_id", "is_verified", "created_at", "id"),
+        Index("ix_users_verified_updated_at_id", "is_verified", "updated_at", "id"),
+        Index("ix_users_active_verified_created_at_id", "is_active", "is_verified", "created_at", "id"),
+        Index("ix_users_active_verified_updated_at_id", "is_active", "is_verified", "updated_at", "id"),
+    )
 
     id: Mapped[UUID] = mapped_column(SQLUUID, primary_key=True, default=uuid4)
     email: Mapped[str] = mapped_column(unique=True)
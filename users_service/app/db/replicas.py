@@ -0,0 +1,103 @@
+import asyncio
+from itertools import count
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+# Время с последней примененной транзакции растет и без отставания, пока на primary
+# нет записей; поэтому реплика, применившая все полученное WAL, отстает на 0.
+# На primary pg_last_xact_replay_timestamp() - NULL, отставание тоже нулевое
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+# Раздает движки для чтения по кругу среди здоровых реплик.
+# Реплика, не ответившая на проверку или отставшая больше max_lag_seconds,
+# выводится из ротации до следующей успешной проверки.
+# Нет здоровых реплик (или они не настроены) - чтение идет в primary.
+# autocommit=True - вариант движка без транзакции для одиночных SELECT;
+# серверному курсору (стриминг) транзакция нужна
+class ReplicaRouter:
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: list[AsyncEngine],
+        check_interval_seconds: float = 5.0,
+        check_timeout_seconds: float = 1.0,
+        max_lag_seconds: float = 10.0,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.check_interval_seconds = check_interval_seconds
+        self.check_timeout_seconds = check_timeout_seconds
+        self.max_lag_seconds = max_lag_seconds
+        # До первой проверки считаем реплики здоровыми
+        self._healthy: list[AsyncEngine] = list(replicas)
+        self._autocommit = {
+            engine: engine.execution_options(isolation_level="AUTOCOMMIT")
+            for engine in (primary, *replicas)
+        }
+        self._counter = count()
+        self._task: asyncio.Task | None = None
+        self.primary_fallbacks = 0
+        self.failed_checks = 0
+
+    def primary_engine(self, autocommit: bool = False) -> AsyncEngine:
+        return self._autocommit[self.primary] if autocommit else self.primary
+
+    def read_engine(self, autocommit: bool = False) -> AsyncEngine:
+        healthy = self._healthy
+        if healthy:
+            engine = healthy[next(self._counter) % len(healthy)]
+        else:
+            if self.replicas:
+                self.primary_fallbacks += 1
+            engine = self.primary
+        return self._autocommit[engine] if autocommit else engine
+
+    async def _is_healthy(self, replica: AsyncEngine) -> bool:
+        try:
+            async with asyncio.timeout(self.check_timeout_seconds):
+                async with replica.connect() as conn:
+                    lag = await conn.scalar(REPLICA_LAG_QUERY)
+        except Exception as e:
+            self.failed_checks += 1
+            print(f"Реплика {replica.url.host}:{replica.url.port} недоступна - {e}")
+            return False
+        return float(lag) <= self.max_lag_seconds
+
+    async def check(self) -> None:
+        results = await asyncio.gather(*(self._is_healthy(replica) for replica in self.replicas))
+        self._healthy = [replica for replica, ok in zip(self.replicas, results) if ok]
+
+    async def _run_checks(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval_seconds)
+
+    def start(self) -> None:
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._run_checks())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "replicas": len(self.replicas),
+            "healthy": len(self._healthy),
+            "primary_fallbacks": self.primary_fallbacks,
+            "failed_checks": self.failed_checks,
+        }
@@ -1,29 +1,101 @@
 from typing import Annotated
-from fastapi import Depends
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from fastapi import Depends, Request
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncEngine, AsyncSession
 
 from app.core.config import settings
+from app.core.events import discard_user_events, publish_user_events
+from common.instrumentation import instrument_engine
+from common.tracing import trace_engine
+from common.db_pool import create_pooled_engine, pool_stats
+from app.db.replicas import ReplicaRouter
 
 DATABASE_URL = settings.DATABASE_URL
 
+
+# Метка реплики в метриках пула
+def replica_label(url: URL) -> str:
+    return f"{url.host}:{url.port}"
+
+
 # Создаем асинхронный движок для работы с БД
-engine = create_async_engine(url=DATABASE_URL)
+engine = create_pooled_engine(DATABASE_URL, settings.DB_POOL)
+
+# Тот же пул, но без транзакции: для одиночных SELECT не нужны BEGIN и ROLLBACK
+read_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
 
 # Создаем асинхронную фабрику сессий для взаимодействия с БД
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+# Чтение без записи уходит в реплики
+replicas = ReplicaRouter(
+    primary=engine,
+    replicas=[
+        create_pooled_engine(url, settings.DB_POOL, name=replica_label(make_url(url)))
+        for url in settings.REPLICA_URLS
+    ],
+    check_interval_seconds=settings.DB_REPLICA_CHECK_INTERVAL_SECONDS,
+    check_timeout_seconds=settings.DB_REPLICA_CHECK_TIMEOUT_SECONDS,
+    max_lag_seconds=settings.DB_REPLICA_MAX_LAG_SECONDS,
+)
+# Метрики и трассировка SQL на primary и всех репликах
+for db_engine in (engine, *replicas.replicas):
+    instrument_engine(db_engine)
+    if settings.TRACING.enabled:
+        trace_engine(db_engine)
+
+
+# Источник для register_stats: пулы primary и реплик
+def db_pool_sources():
+    yield {"engine": "primary"}, pool_stats(engine)
+    for replica in replicas.replicas:
+        yield {"engine": replica_label(replica.url)}, pool_stats(replica)
+
+# Read-your-writes: клиент, только что изменивший данные, просит читать из primary.
+# Тот же ключ в метаданных gRPC вызова
+READ_PRIMARY_HEADER = "x-read-primary"
+
+
+def wants_primary(value: str | None) -> bool:
+    return value is not None and value.lower() in ("1", "true")
+
+
+def pick_read_engine(read_primary: bool = False, autocommit: bool = False) -> AsyncEngine:
+    if read_primary:
+        return read_engine if autocommit else engine
+    return replicas.read_engine(autocommit)
+
 async def create_async_session():
     async with async_session_maker() as session:
         try:
             yield session
             await session.commit()
+            await publish_user_events(session)
         except Exception as e:
             await session.rollback()
+            discard_user_events(session)
             print(f"Ошибка при работе с сессией - {e}")
             raise
 
 session_DB = Annotated[AsyncSession, Depends(create_async_session)]
 
+# Сессия только для чтения: без commit и событий, реплика выбирается на запрос
+async def create_read_session(request: Request):
+    read_primary = wants_primary(request.headers.get(READ_PRIMARY_HEADER))
+    async with async_session_maker(bind=pick_read_engine(read_primary, autocommit=True)) as session:
+        yield session
+
+read_session_DB = Annotated[AsyncSession, Depends(create_read_session)]
+
+# Для обработчиков, которым нужна своя сессия вне жизненного цикла запроса (стриминг)
+def get_session_maker() -> async_sessionmaker[AsyncSession]:
+    return async_session_maker
+
+# То же для чтения: выгрузка целиком уходит в реплику
+def get_read_session_maker(request: Request) -> async_sessionmaker[AsyncSession]:
+    read_primary = wants_primary(request.headers.get(READ_PRIMARY_HEADER))
+    return async_sessionmaker(pick_read_engine(read_primary), expire_on_commit=False)
+
 # # Декоратор для выдачи функциям сессий
 # def connection(method):
 #     async def wrapper(*args, **kwargs):
@@ -1,8 +1,42 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 
 from app.api.routers.users import router as user_router
+from app.core.config import settings
+from common.instrumentation import PrometheusMiddleware, metrics_response, register_stats
+from common.tracing import fastapi_telemetry, setup_tracing
+from app.db.session import db_pool_sources, engine, replicas
+from kafka_producer import producer
 
 
-app = FastAPI(title="Users service")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tracer_provider = setup_tracing("users_service", settings.TRACING)
+    #kafka
+    await producer.start()
+    # Периодическая проверка реплик для чтения
+    replicas.start()
+    yield
+    await replicas.stop()
+    await producer.stop()
+    await engine.dispose()
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
+
+
+app = FastAPI(
+    title="Users service", lifespan=lifespan, telemetry=fastapi_telemetry(settings.TRACING)
+)
+app.add_middleware(PrometheusMiddleware)
 
 app.include_router(user_router)
+
+
+register_stats("db_pool", db_pool_sources)
+register_stats("db_replicas", lambda: [({}, replicas.stats())])
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> Response:
+    return metrics_response()
+
@@ -1,7 +1,12 @@
 from datetime import datetime
 from enum import Enum
 from uuid import UUID
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from typing import Any, Literal, TypedDict
+
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, TypeAdapter, model_validator
+
+from app.core.config import settings
+from app.core.pagination import decode_cursor
 
 
 class UserCreateSchema(BaseModel):
@@ -12,7 +17,9 @@ class UserCreateSchema(BaseModel):
 
 class UserOutSchema(BaseModel):
     id: UUID
-    email: EmailStr
+    # email из БД уже проверен при записи; EmailStr на выходе заново гонял бы
+    # каждый адрес через email-validator/idna (~0.25 мс на строку)
+    email: str
     is_active: bool | None
     is_verified: bool | None
     created_at: datetime
@@ -21,6 +28,20 @@ class UserOutSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Тот же JSON, что и UserOutSchema, но для dict из строк БД: сериализуется
+# TypeAdapter.dump_json без валидации и без ORM объектов
+class UserOutRow(TypedDict):
+    id: UUID
+    email: str
+    is_active: bool
+    is_verified: bool
+    created_at: datetime
+    updated_at: datetime
+
+user_row_adapter = TypeAdapter(UserOutRow)
+user_rows_adapter = TypeAdapter(list[UserOutRow])
+
+
 class UserUpdateSchema(BaseModel):
     email: EmailStr | None = None
     is_verified: bool | None = None
@@ -35,12 +56,52 @@ class SortOrder(str, Enum):
     ASC = "asc"
     DESC = "desc"
 
-class UsersListQuerySchema(BaseModel):
-    limit: int = Field(default=20, gt=0, lt=100)
-    offset: int = Field(default=0, ge=0)
-    
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+# Фильтры и сортировка, общие для постраничного списка и выгрузки
+class UsersFilterSchema(BaseModel):
     is_active: bool | None = None
     is_verified: bool | None = None
     
     sort_by: SortBy = Field(default=SortBy.CREATED_AT)
     sort_order: SortOrder = Field(SortOrder.DESC)
+
+class UsersListQuerySchema(UsersFilterSchema):
+    limit: int = Field(default=20, gt=0, lt=100)
+    offset: int = Field(default=0, ge=0)
+    # Курсор из заголовка X-Next-Cursor предыдущей страницы, вместо offset
+    cursor: str | None = None
+
+    @model_validator(mode="after")
+    def check_cursor(self):
+        if self.cursor is None:
+            return self
+        if self.offset:
+            raise ValueError("cursor and offset can not be used together")
+        sort_by, sort_order, _, _ = decode_cursor(self.cursor)
+        if (sort_by, sort_order) != (self.sort_by.value, self.sort_order.value):
+            raise ValueError("cursor was issued for a different sort order")
+        return self
+
+class UsersExportQuerySchema(UsersFilterSchema):
+    format: ExportFormat = Field(default=ExportFormat.NDJSON)
+
+# Строки проверяются по одной через UserCreateSchema: одна ошибка не отклоняет всю пачку
+class UsersBulkCreateSchema(BaseModel):
+    users: list[dict[str, Any]] = Field(min_length=1, max_length=settings.USERS_BULK_MAX_ROWS)
+
+class BulkUserResultSchema(BaseModel):
+    index: int
+    email: str | None = None
+    # duplicate - тот же email уже встречался выше в этой пачке
+    status: Literal["created", "exists", "duplicate", "invalid"]
+    id: UUID | None = None
+    error: str | None = None
+
+class UsersBulkResultSchema(BaseModel):
+    created: int
+    skipped: int
+    invalid: int
+    results: list[BulkUserResultSchema]
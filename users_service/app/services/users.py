@@ -1,8 +1,115 @@
+import csv
+import io
+from typing import AsyncIterator
 from uuid import UUID
-from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.schemas.user import UserCreateSchema, UserUpdateSchema
-from app.crud.users import create_user, deactivate_user, update_user
+from app.schemas.user import (
+    BulkUserResultSchema,
+    ExportFormat,
+    UserCreateSchema,
+    UserUpdateSchema,
+    UsersBulkResultSchema,
+    UsersExportQuerySchema,
+    user_row_adapter,
+)
+from app.crud.users import create_user, create_users_bulk, deactivate_user, update_user, stream_users
 from app.db.models import User
 
 
+EXPORT_FIELDS = ("id", "email", "is_active", "is_verified", "created_at", "updated_at")
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+def _export_values(row) -> list:
+    return [str(row.id), row.email, row.is_active, row.is_verified,
+            row.created_at.isoformat(), row.updated_at.isoformat()]
+
+
+def _ndjson_chunk(rows) -> bytes:
+    return b"".join(user_row_adapter.dump_json(row._asdict()) + b"\n" for row in rows)
+
+
+def _csv_chunk(rows, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows(_export_values(row) for row in rows)
+    return buffer.getvalue().encode()
+
+
+# Сессия открывается внутри генератора: StreamingResponse читает его уже после
+# выхода из обработчика, сессия из зависимости к этому моменту может быть закрыта
+async def export_users(
+    params: UsersExportQuerySchema,
+    session_maker: async_sessionmaker[AsyncSession],
+    chunk_size: int = 1000,
+) -> AsyncIterator[bytes]:
+    if params.format == ExportFormat.CSV:
+        yield _csv_chunk([], header=True)
+
+    async with session_maker() as session:
+        async for rows in stream_users(params, session, chunk_size=chunk_size):
+            if params.format == ExportFormat.CSV:
+                yield _csv_chunk(rows)
+            else:
+                yield _ndjson_chunk(rows)
+
+
+def _validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+    )
+
+
+# Результат по каждой строке в порядке запроса. Вставка - в транзакции вызывающего,
+# commit делает зависимость сессии или gRPC обработчик
+async def bulk_create_users(users_data: list[dict], session: AsyncSession) -> UsersBulkResultSchema:
+    results: list[BulkUserResultSchema | None] = [None] * len(users_data)
+    first_index: dict[str, int] = {}
+    to_insert = []
+
+    for index, raw in enumerate(users_data):
+        try:
+            user = UserCreateSchema.model_validate(raw)
+        except ValidationError as e:
+            email = raw.get("email") if isinstance(raw, dict) else None
+            results[index] = BulkUserResultSchema(
+                index=index,
+                email=None if email is None else str(email),
+                status="invalid",
+                error=_validation_error(e),
+            )
+            continue
+
+        if user.email in first_index:
+            results[index] = BulkUserResultSchema(index=index, email=user.email, status="duplicate")
+            continue
+
+        first_index[user.email] = index
+        to_insert.append(user.model_dump())
+
+    created = await create_users_bulk(to_insert, session)
+
+    for email, index in first_index.items():
+        user_id = created.get(email)
+        results[index] = BulkUserResultSchema(
+            index=index,
+            email=email,
+            status="created" if user_id is not None else "exists",
+            id=user_id,
+        )
+
+    statuses = [result.status for result in results]
+    return UsersBulkResultSchema(
+        created=statuses.count("created"),
+        skipped=statuses.count("exists") + statuses.count("duplicate"),
+        invalid=statuses.count("invalid"),
+        results=results,
+    )
@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import multiprocessing
+from itertools import cycle
+from statistics import quantiles
+from time import perf_counter
+
+import grpc
+from sqlalchemy import delete, insert
+
+from app.db.base import Base
+from app.db.models import User
+from app.db.session import engine
+from gRPC.src import users_service_pb2 as pb
+from gRPC.src import users_service_pb2_grpc as grpc_pb
+
+
+# Нагрузочный прогон gRPC методов users_service в духе ghz: concurrency клиентов
+# в течение duration секунд, на выходе RPS и p50/p99 для каждого метода.
+# Без --target сервер поднимается в отдельном процессе на базе из DB_* переменных,
+# тестовые пользователи создаются и удаляются самим скриптом.
+# Запуск из каталога users_service: python -m benchmarks.grpc_load --concurrency 64 --duration 10
+
+EMAIL_DOMAIN = "load.test"
+RPCS = ("GetUserByEmail", "GetUsersByEmails", "GetUsersByIds", "StreamUsersByEmails")
+
+
+def run_server(bind: str) -> None:
+    from gRPC.src.server import create_server
+
+    async def serve():
+        server, _ = create_server(bind)
+        await server.start()
+        await server.wait_for_termination()
+
+    asyncio.run(serve())
+
+
+async def seed_users(count: int) -> list[tuple[str, str]]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        rows = []
+        for start in range(0, count, 5000):
+            values = [
+                {"email": f"user-{i}@{EMAIL_DOMAIN}", "is_verified": True}
+                for i in range(start, min(start + 5000, count))
+            ]
+            result = await conn.execute(insert(User).returning(User.email, User.id), values)
+            rows.extend((email, str(user_id)) for email, user_id in result)
+    return rows
+
+
+async def cleanup_users() -> None:
+    async with engine.begin() as conn:
+        await conn.execute(delete(User).where(User.email.like(f"%@{EMAIL_DOMAIN}")))
+
+
+def make_call(rpc: str, stub, users: list[tuple[str, str]], batch_size: int):
+    emails = cycle([email for email, _ in users])
+    ids = cycle([user_id for _, user_id in users])
+
+    if rpc == "GetUserByEmail":
+        return lambda: stub.GetUserByEmail(pb.GetUserByEmailRequest(email=next(emails)))
+    if rpc == "GetUsersByEmails":
+        return lambda: stub.GetUsersByEmails(
+            pb.GetUsersByEmailsRequest(emails=[next(emails) for _ in range(batch_size)])
+        )
+    if rpc == "GetUsersByIds":
+        return lambda: stub.GetUsersByIds(
+            pb.GetUsersByIdsRequest(ids=[next(ids) for _ in range(batch_size)])
+        )
+    raise ValueError(f"Unknown RPC - {rpc}")
+
+
+async def unary_worker(call, deadline: float, timings: list[float], errors: list[int]) -> None:
+    while perf_counter() < deadline:
+        start = perf_counter()
+        try:
+            await call()
+        except grpc.aio.AioRpcError:
+            errors[0] += 1
+            continue
+        timings.append(perf_counter() - start)
+
+
+# Один долгоживущий поток на клиента, пакеты отправляются по одному и ждут ответа
+async def stream_worker(stub, users, batch_size: int, deadline: float, timings: list[float], errors: list[int]) -> None:
+    emails = cycle([email for email, _ in users])
+    stream = stub.StreamUsersByEmails()
+    try:
+        while perf_counter() < deadline:
+            start = perf_counter()
+            await stream.write(pb.GetUsersByEmailsRequest(emails=[next(emails) for _ in range(batch_size)]))
+            await stream.read()
+            timings.append(perf_counter() - start)
+        await stream.done_writing()
+    except grpc.aio.AioRpcError:
+        errors[0] += 1
+
+
+async def run_rpc(rpc: str, stubs: list, users, args) -> dict:
+    timings: list[float] = []
+    errors = [0]
+    deadline = perf_counter() + args.duration
+    stub_iter = cycle(stubs)
+
+    if rpc == "StreamUsersByEmails":
+        workers = [
+            stream_worker(next(stub_iter), users, args.batch_size, deadline, timings, errors)
+            for _ in range(args.concurrency)
+        ]
+    else:
+        workers = [
+            unary_worker(make_call(rpc, next(stub_iter), users, args.batch_size), deadline, timings, errors)
+            for _ in range(args.concurrency)
+        ]
+
+    start = perf_counter()
+    await asyncio.gather(*workers)
+    elapsed = perf_counter() - start
+
+    percentiles = quantiles(timings, n=100) if len(timings) > 1 else [0.0] * 99
+    return {
+        "rpc": rpc,
+        "calls": len(timings),
+        "errors": errors[0],
+        "rps": len(timings) / elapsed,
+        "p50_ms": percentiles[49] * 1000,
+        "p99_ms": percentiles[98] * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Нагрузка на gRPC методы users_service")
+    parser.add_argument("--target", help="адрес уже запущенного сервера; по умолчанию поднимается локальный")
+    parser.add_argument("--port", type=int, default=50061)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--rpc", action="append", choices=RPCS, help="можно указать несколько раз")
+    args = parser.parse_args()
+
+    server_process = None
+    target = args.target
+    if target is None:
+        target = f"127.0.0.1:{args.port}"
+        server_process = multiprocessing.get_context("spawn").Process(
+            target=run_server, args=(target,), daemon=True
+        )
+        server_process.start()
+
+    users = await seed_users(args.users)
+    channels = [grpc.aio.insecure_channel(target) for _ in range(args.channels)]
+    try:
+        for channel in channels:
+            await asyncio.wait_for(channel.channel_ready(), timeout=10)
+        stubs = [grpc_pb.UserServiceStub(channel) for channel in channels]
+
+        for rpc in args.rpc or RPCS:
+            result = await run_rpc(rpc, stubs, users, args)
+            print(
+                f"{result['rpc']:<20} rps={result['rps']:>9.1f} "
+                f"p50={result['p50_ms']:.2f} ms p99={result['p99_ms']:.2f} ms "
+                f"calls={result['calls']} errors={result['errors']}"
+            )
+    finally:
+        for channel in channels:
+            await channel.close()
+        if server_process is not None:
+            server_process.terminate()
+            server_process.join()
+        await cleanup_users()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
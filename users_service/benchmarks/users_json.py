@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+from time import perf_counter, process_time
+
+from sqlalchemy import delete, insert
+
+from app.core.config import settings
+from app.db.base import Base
+from app.db.models import User
+from app.db.session import engine
+from app.main import app
+
+
+# CPU на запрос GET /users/?limit=99: ORM + response_model против FAST_JSON
+# (строки из БД сразу в TypeAdapter.dump_json). Приложение вызывается напрямую
+# через ASGI, без HTTP клиента, чтобы в замер попадала только серверная часть.
+# Запуск из каталога users_service: python -m benchmarks.users_json --requests 2000
+
+EMAIL_DOMAIN = "json-bench.example.com"
+PATH = b"/users/"
+QUERY = b"limit=99"
+
+
+async def call_app() -> bytes:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": PATH.decode(),
+        "raw_path": PATH,
+        "query_string": QUERY,
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def run(fast_json: bool, requests: int) -> dict:
+    settings.FAST_JSON = fast_json
+    for _ in range(50):
+        await call_app()
+
+    wall_start, cpu_start = perf_counter(), process_time()
+    for _ in range(requests):
+        await call_app()
+    wall, cpu = perf_counter() - wall_start, process_time() - cpu_start
+
+    return {"cpu_us": cpu / requests * 1e6, "wall_us": wall / requests * 1e6}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Сериализация GET /users/?limit=99: CPU на запрос")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            insert(User),
+            [{"email": f"user-{i}@{EMAIL_DOMAIN}", "is_verified": True} for i in range(200)],
+        )
+
+    try:
+        for fast_json in (False, True):
+            result = await run(fast_json, args.requests)
+            print(
+                f"FAST_JSON={fast_json!s:<5} cpu={result['cpu_us']:.0f} us/request "
+                f"wall={result['wall_us']:.0f} us/request"
+            )
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(delete(User).where(User.email.like(f"%@{EMAIL_DOMAIN}")))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+from statistics import median
+from time import perf_counter
+
+from sqlalchemy import delete, text
+
+from app.core.pagination import encode_cursor
+from app.crud.users import get_users
+from app.db.base import Base
+from app.db.models import User
+from app.db.session import async_session_maker, engine
+from app.schemas.user import UsersListQuerySchema
+
+
+# Задержка страницы GET /users/ в зависимости от глубины: OFFSET против курсора.
+# Таблица заполняется на стороне Postgres (generate_series), по умолчанию 10M строк -
+# нужна отдельная БД, сами строки удаляются в конце (--keep оставляет их для повторных прогонов).
+# Запуск из каталога users_service: python -m benchmarks.users_pagination --rows 10000000
+
+EMAIL_DOMAIN = "pagination.test"
+CHUNK = 1_000_000
+
+SEED_SQL = text(f"""
+    INSERT INTO users (id, email, is_active, is_verified, created_at, updated_at)
+    SELECT gen_random_uuid(),
+           'user-' || n || '@{EMAIL_DOMAIN}',
+           n % 10 <> 0,
+           n % 3 <> 0,
+           ts,
+           ts + (n % 1000) * interval '1 minute'
+    FROM generate_series(:start, :stop - 1) AS n,
+         LATERAL (SELECT now() - (n * interval '1 second') AS ts) AS t
+""")
+
+
+async def seed(rows: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        existing = await conn.scalar(
+            text(f"SELECT count(*) FROM users WHERE email LIKE '%@{EMAIL_DOMAIN}'")
+        )
+    for start in range(existing, rows, CHUNK):
+        async with engine.begin() as conn:
+            await conn.execute(SEED_SQL, {"start": start, "stop": min(start + CHUNK, rows)})
+        print(f"seeded {min(start + CHUNK, rows)}/{rows}")
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE users"))
+
+
+async def time_page(params: UsersListQuerySchema, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        async with async_session_maker() as session:
+            start = perf_counter()
+            await get_users(params, session)
+            timings.append((perf_counter() - start) * 1000)
+    return median(timings)
+
+
+async def measure(position: int, limit: int, repeats: int, filters: dict) -> tuple[float, float]:
+    offset_params = UsersListQuerySchema(limit=limit, offset=position, **filters)
+    offset_ms = await time_page(offset_params, repeats)
+
+    # Курсор строки перед позицией - как если бы клиент дошел сюда постранично
+    async with async_session_maker() as session:
+        previous = await get_users(UsersListQuerySchema(limit=1, offset=position - 1, **filters), session)
+    last = previous[0]
+    cursor = encode_cursor("created_at", "desc", last.created_at, last.id)
+    cursor_ms = await time_page(UsersListQuerySchema(limit=limit, cursor=cursor, **filters), repeats)
+    return offset_ms, cursor_ms
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="OFFSET против keyset пагинации на большой таблице users")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="не удалять тестовые строки")
+    args = parser.parse_args()
+
+    await seed(args.rows)
+
+    positions = [p for p in (1_000, 10_000, 100_000, 1_000_000, 5_000_000, 9_000_000) if p < args.rows]
+    try:
+        for label, filters in (("all", {}), ("active+verified", {"is_active": True, "is_verified": True})):
+            for position in positions:
+                offset_ms, cursor_ms = await measure(position, args.limit, args.repeats, filters)
+                print(
+                    f"{label:<16} position={position:>9} "
+                    f"offset={offset_ms:>9.2f} ms cursor={cursor_ms:>6.2f} ms"
+                )
+    finally:
+        if not args.keep:
+            async with engine.begin() as conn:
+                await conn.execute(delete(User).where(User.email.like(f"%@{EMAIL_DOMAIN}")))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,63 +1,263 @@
 import grpc
 import asyncio
+import signal
+from uuid import UUID
 from grpc import aio
+from prometheus_client import start_http_server
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 from gRPC.src import users_service_pb2_grpc as grpc_pb
 from gRPC.src import users_service_pb2 as pb
 
-from app.db.session import async_session_maker
-from app.crud.users import create_user, get_user_by_email
-from app.core.exceptions import UserAlreadyExistsError, UserNotFoundByEmailError
+from app.db.replicas import ReplicaRouter
+from app.db.session import (
+    READ_PRIMARY_HEADER,
+    async_session_maker,
+    db_pool_sources,
+    engine,
+    replicas,
+    wants_primary,
+)
+from app.core.config import settings
+from common.instrumentation import GrpcServerMetricsInterceptor, register_stats
+from common.tracing import GrpcServerTracingInterceptor, setup_tracing
+from app.crud.users import (
+    create_user,
+    get_user_status_by_email,
+    get_user_statuses_by_emails,
+    get_user_statuses_by_ids,
+)
+from app.core.exceptions import UserAlreadyExistsError
+from app.core.events import publish_user_events
+from kafka_producer import producer
 from app.schemas.user import UserCreateSchema
+from app.services.users import bulk_create_users
 
 
+COMPRESSION = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+
+BULK_STATUSES = {
+    "created": pb.CreateUserResult.CREATED,
+    "exists": pb.CreateUserResult.EXISTS,
+    "duplicate": pb.CreateUserResult.DUPLICATE,
+    "invalid": pb.CreateUserResult.INVALID,
+}
+
+
+def new_user_data(user: pb.NewUser) -> dict:
+    return {
+        "email": user.email,
+        "is_active": user.is_active if user.HasField("is_active") else None,
+        "is_verified": user.is_verified if user.HasField("is_verified") else None,
+    }
+
+
+def user_info(user) -> pb.UserInfo:
+    return pb.UserInfo(
+        id=str(user.id),
+        email=user.email,
+        is_active=user.is_active,
+        is_verified=user.is_verified,
+    )
+
+
+# Чтение идет через соединение в autocommit: один запрос без BEGIN/ROLLBACK
+# и без ORM сессии, в ответ нужны только четыре колонки.
+# Движки и фабрика сессий передаются снаружи - тесты подставляют тестовую БД
 class UserServiceServicer(grpc_pb.UserServiceServicer):
+    def __init__(
+        self,
+        router: ReplicaRouter = replicas,
+        session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+    ):
+        self._router = router
+        self._session_maker = session_maker
+
+    # Реплика для чтения; метаданные x-read-primary: 1 - read-your-writes через primary
+    def _lookup_engine(self, context) -> AsyncEngine:
+        metadata = dict(context.invocation_metadata() or ())
+        if wants_primary(metadata.get(READ_PRIMARY_HEADER)):
+            return self._router.primary_engine(autocommit=True)
+        return self._router.read_engine(autocommit=True)
+
     async def GetUserByEmail(
         self, request, context
     ) -> pb.GetUserByEmailResponse | None:
-        async with async_session_maker() as session:
-            try:
-                user = await get_user_by_email(request.email, session)
-                response = pb.GetUserByEmailResponse(
-                    id=str(user.id),
-                    is_active=user.is_active,
-                    is_verified=user.is_verified,
-                )
-                return response
-            except UserNotFoundByEmailError:
-                await context.abort(
-                    grpc.StatusCode.NOT_FOUND,
-                    f"User with email {request.email} not found",
-                )
+        lookup = self._lookup_engine(context)
+        async with lookup.connect() as conn:
+            user = await get_user_status_by_email(request.email, conn)
+
+        # Вход сразу после регистрации: реплика могла еще не получить пользователя
+        primary = self._router.primary_engine(autocommit=True)
+        if user is None and lookup.pool is not primary.pool:
+            async with primary.connect() as conn:
+                user = await get_user_status_by_email(request.email, conn)
+
+        if user is None:
+            await context.abort(
+                grpc.StatusCode.NOT_FOUND,
+                f"User with email {request.email} not found",
+            )
+
+        return pb.GetUserByEmailResponse(
+            id=str(user.id),
+            is_active=user.is_active,
+            is_verified=user.is_verified,
+        )
 
     async def CreateUserByEmail(
         self, request, context
     ) -> pb.GetUserByEmailResponse | None:
-        async with async_session_maker() as session:
+        async with self._session_maker() as session:
             try:
                 user_data = UserCreateSchema(
                     email=request.email, is_active=True, is_verified=True
                 )  # is_verified: True - заглушка до момента создания notification service
                 user = await create_user(user_data.model_dump(), session)
                 await session.commit()
+                await publish_user_events(session)
                 response = pb.GetUserByEmailResponse(
                     id=str(user.id), is_active=user.is_active, is_verified=user.is_verified
                 )
                 return response
             except ValidationError as e:
-                session.rollback()
+                await session.rollback()
                 await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
             except UserAlreadyExistsError as e:
-                session.rollback()
+                await session.rollback()
                 await context.abort(grpc.StatusCode.ALREADY_EXISTS, str(e))
 
+    async def GetUsersByEmails(self, request, context) -> pb.GetUsersResponse:
+        return await self._get_users_by_emails(request.emails, context)
+
+    async def GetUsersByIds(self, request, context) -> pb.GetUsersResponse:
+        await self._check_batch_size(len(request.ids), context)
+        try:
+            user_ids = list({UUID(user_id) for user_id in request.ids})
+        except ValueError:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Invalid user id")
+
+        users = await self._read_with_fallback(
+            context, get_user_statuses_by_ids, user_ids, lambda user: user.id
+        )
+        return pb.GetUsersResponse(users=[user_info(user) for user in users])
+
+    async def StreamUsersByEmails(self, request_iterator, context):
+        async for request in request_iterator:
+            yield await self._get_users_by_emails(request.emails, context)
+
+    async def CreateUsers(self, request_iterator, context):
+        async for request in request_iterator:
+            if len(request.users) > settings.USERS_BULK_MAX_ROWS:
+                await context.abort(
+                    grpc.StatusCode.INVALID_ARGUMENT,
+                    f"Batch size {len(request.users)} exceeds {settings.USERS_BULK_MAX_ROWS}",
+                )
+
+            async with self._session_maker() as session:
+                result = await bulk_create_users(
+                    [new_user_data(user) for user in request.users], session
+                )
+                await session.commit()
+                await publish_user_events(session)
+
+            yield pb.CreateUsersResponse(results=[
+                pb.CreateUserResult(
+                    index=row.index,
+                    email=row.email or "",
+                    status=BULK_STATUSES[row.status],
+                    id=str(row.id) if row.id else "",
+                    error=row.error or "",
+                )
+                for row in result.results
+            ])
+
+    async def _get_users_by_emails(self, emails, context) -> pb.GetUsersResponse:
+        await self._check_batch_size(len(emails), context)
+        users = await self._read_with_fallback(
+            context, get_user_statuses_by_emails, list(set(emails)), lambda user: user.email
+        )
+        return pb.GetUsersResponse(users=[user_info(user) for user in users])
+
+    # Как в GetUserByEmail: ключи, которых нет на отстающей реплике,
+    # дочитываются с primary одним запросом - вход пачкой сразу после регистрации
+    async def _read_with_fallback(self, context, fetch, keys: list, key_of) -> list:
+        lookup = self._lookup_engine(context)
+        async with lookup.connect() as conn:
+            users = list(await fetch(keys, conn))
+
+        primary = self._router.primary_engine(autocommit=True)
+        if len(users) == len(keys) or lookup.pool is primary.pool:
+            return users
+        found = {key_of(user) for user in users}
+        async with primary.connect() as conn:
+            users += await fetch([key for key in keys if key not in found], conn)
+        return users
+
+    async def _check_batch_size(self, size: int, context) -> None:
+        if size > settings.GRPC_MAX_BATCH_SIZE:
+            await context.abort(
+                grpc.StatusCode.INVALID_ARGUMENT,
+                f"Batch size {size} exceeds {settings.GRPC_MAX_BATCH_SIZE}",
+            )
+
+
+def create_server(
+    bind: str = settings.GRPC_BIND, servicer: UserServiceServicer | None = None
+) -> tuple[aio.Server, int]:
+    interceptors: list = [GrpcServerMetricsInterceptor()]
+    if settings.TRACING.enabled:
+        # Трассировка снаружи: span продолжает трассу из traceparent в метаданных вызова
+        interceptors.insert(0, GrpcServerTracingInterceptor())
+    server = aio.server(
+        options=[
+            ("grpc.max_concurrent_streams", settings.GRPC_MAX_CONCURRENT_STREAMS),
+            # Клиенты держат соединения keepalive пингами раз в 30 секунд,
+            # по умолчанию сервер разрывает соединение за пинги чаще 5 минут
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.http2.min_recv_ping_interval_without_data_ms", 10_000),
+            ("grpc.http2.max_ping_strikes", 0),
+        ],
+        maximum_concurrent_rpcs=settings.GRPC_MAX_CONCURRENT_RPCS,
+        compression=COMPRESSION[settings.GRPC_COMPRESSION],
+        interceptors=interceptors,
+    )
+    grpc_pb.add_UserServiceServicer_to_server(servicer or UserServiceServicer(), server)
+    port = server.add_insecure_port(bind)
+    return server, port
+
 
 async def server():
-    server = aio.server()
-    grpc_pb.add_UserServiceServicer_to_server(UserServiceServicer(), server)
-    server.add_insecure_port("0.0.0.0:50051")
+    tracer_provider = setup_tracing("users_service", settings.TRACING)
+    await producer.start()
+    replicas.start()
+    if settings.GRPC_METRICS_PORT:
+        register_stats("db_pool", db_pool_sources)
+        register_stats("db_replicas", lambda: [({}, replicas.stats())])
+        start_http_server(settings.GRPC_METRICS_PORT)
+    server, _ = create_server()
     await server.start()
-    await server.wait_for_termination()
+
+    stop_requested = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_requested.set)
+
+    try:
+        await stop_requested.wait()
+    finally:
+        # Новые вызовы отклоняются сразу, текущие дорабатывают grace секунд
+        await server.stop(settings.GRPC_SHUTDOWN_GRACE_SECONDS)
+        await producer.stop()
+        await replicas.stop()
+        await engine.dispose()
+        if tracer_provider is not None:
+            tracer_provider.shutdown()
 
 
 if __name__ == "__main__":
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x13users_service.proto\x12\x08users.v1\"&\n\x15GetUserByEmailRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\"L\n\x16GetUserByEmailResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12\x11\n\tis_active\x18\x02 \x01(\x08\x12\x13\n\x0bis_verified\x18\x03 \x01(\x08\x32\xba\x01\n\x0bUserService\x12S\n\x0eGetUserByEmail\x12\x1f.users.v1.GetUserByEmailRequest\x1a .users.v1.GetUserByEmailResponse\x12V\n\x11\x43reateUserByEmail\x12\x1f.users.v1.GetUserByEmailRequest\x1a .users.v1.GetUserByEmailResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x13users_service.proto\x12\x08users.v1\"&\n\x15GetUserByEmailRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\"L\n\x16GetUserByEmailResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12\x11\n\tis_active\x18\x02 \x01(\x08\x12\x13\n\x0bis_verified\x18\x03 \x01(\x08\")\n\x17GetUsersByEmailsRequest\x12\x0e\n\x06\x65mails\x18\x01 \x03(\t\"#\n\x14GetUsersByIdsRequest\x12\x0b\n\x03ids\x18\x01 \x03(\t\"M\n\x08UserInfo\x12\n\n\x02id\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\x12\x11\n\tis_active\x18\x03 \x01(\x08\x12\x13\n\x0bis_verified\x18\x04 \x01(\x08\"5\n\x10GetUsersResponse\x12!\n\x05users\x18\x01 \x03(\x0b\x32\x12.users.v1.UserInfo\"h\n\x07NewUser\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x16\n\tis_active\x18\x02 \x01(\x08H\x00\x88\x01\x01\x12\x18\n\x0bis_verified\x18\x03 \x01(\x08H\x01\x88\x01\x01\x42\x0c\n\n_is_activeB\x0e\n\x0c_is_verified\"6\n\x12\x43reateUsersRequest\x12 \n\x05users\x18\x01 \x03(\x0b\x32\x11.users.v1.NewUser\"\xd5\x01\n\x10\x43reateUserResult\x12\r\n\x05index\x18\x01 \x01(\r\x12\r\n\x05\x65mail\x18\x02 \x01(\t\x12\x31\n\x06status\x18\x03 \x01(\x0e\x32!.users.v1.CreateUserResult.Status\x12\n\n\x02id\x18\x04 \x01(\t\x12\r\n\x05\x65rror\x18\x05 \x01(\t\"U\n\x06Status\x12\x16\n\x12STATUS_UNSPECIFIED\x10\x00\x12\x0b\n\x07\x43REATED\x10\x01\x12\n\n\x06\x45XISTS\x10\x02\x12\r\n\tDUPLICATE\x10\x03\x12\x0b\n\x07INVALID\x10\x04\"B\n\x13\x43reateUsersResponse\x12+\n\x07results\x18\x01 \x03(\x0b\x32\x1a.users.v1.CreateUserResult2\x84\x04\n\x0bUserService\x12S\n\x0eGetUserByEmail\x12\x1f.users.v1.GetUserByEmailRequest\x1a .users.v1.GetUserByEmailResponse\x12V\n\x11\x43reateUserByEmail\x12\x1f.users.v1.GetUserByEmailRequest\x1a .users.v1.GetUserByEmailResponse\x12Q\n\x10GetUsersByEmails\x12!.users.v1.GetUsersByEmailsRequest\x1a\x1a.users.v1.GetUsersResponse\x12K\n\rGetUsersByIds\x12\x1e.users.v1.GetUsersByIdsRequest\x1a\x1a.users.v1.GetUsersResponse\x12X\n\x13StreamUsersByEmails\x12!.users.v1.GetUsersByEmailsRequest\x1a\x1a.users.v1.GetUsersResponse(\x01\x30\x01\x12N\n\x0b\x43reateUsers\x12\x1c.users.v1.CreateUsersRequest\x1a\x1d.users.v1.CreateUsersResponse(\x01\x30\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -35,6 +35,24 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_GETUSERBYEMAILREQUEST']._serialized_end=71
   _globals['_GETUSERBYEMAILRESPONSE']._serialized_start=73
   _globals['_GETUSERBYEMAILRESPONSE']._serialized_end=149
-  _globals['_USERSERVICE']._serialized_start=152
-  _globals['_USERSERVICE']._serialized_end=338
+  _globals['_GETUSERSBYEMAILSREQUEST']._serialized_start=151
+  _globals['_GETUSERSBYEMAILSREQUEST']._serialized_end=192
+  _globals['_GETUSERSBYIDSREQUEST']._serialized_start=194
+  _globals['_GETUSERSBYIDSREQUEST']._serialized_end=229
+  _globals['_USERINFO']._serialized_start=231
+  _globals['_USERINFO']._serialized_end=308
+  _globals['_GETUSERSRESPONSE']._serialized_start=310
+  _globals['_GETUSERSRESPONSE']._serialized_end=363
+  _globals['_NEWUSER']._serialized_start=365
+  _globals['_NEWUSER']._serialized_end=469
+  _globals['_CREATEUSERSREQUEST']._serialized_start=471
+  _globals['_CREATEUSERSREQUEST']._serialized_end=525
+  _globals['_CREATEUSERRESULT']._serialized_start=528
+  _globals['_CREATEUSERRESULT']._serialized_end=741
+  _globals['_CREATEUSERRESULT_STATUS']._serialized_start=656
+  _globals['_CREATEUSERRESULT_STATUS']._serialized_end=741
+  _globals['_CREATEUSERSRESPONSE']._serialized_start=743
+  _globals['_CREATEUSERSRESPONSE']._serialized_end=809
+  _globals['_USERSERVICE']._serialized_start=812
+  _globals['_USERSERVICE']._serialized_end=1328
 # @@protoc_insertion_point(module_scope)
@@ -45,6 +45,26 @@ class UserServiceStub(object):
                 request_serializer=users__service__pb2.GetUserByEmailRequest.SerializeToString,
                 response_deserializer=users__service__pb2.GetUserByEmailResponse.FromString,
                 _registered_method=True)
+        self.GetUsersByEmails = channel.unary_unary(
+                '/users.v1.UserService/GetUsersByEmails',
+                request_serializer=users__service__pb2.GetUsersByEmailsRequest.SerializeToString,
+                response_deserializer=users__service__pb2.GetUsersResponse.FromString,
+                _registered_method=True)
+        self.GetUsersByIds = channel.unary_unary(
+                '/users.v1.UserService/GetUsersByIds',
+                request_serializer=users__service__pb2.GetUsersByIdsRequest.SerializeToString,
+                response_deserializer=users__service__pb2.GetUsersResponse.FromString,
+                _registered_method=True)
+        self.StreamUsersByEmails = channel.stream_stream(
+                '/users.v1.UserService/StreamUsersByEmails',
+                request_serializer=users__service__pb2.GetUsersByEmailsRequest.SerializeToString,
+                response_deserializer=users__service__pb2.GetUsersResponse.FromString,
+                _registered_method=True)
+        self.CreateUsers = channel.stream_stream(
+                '/users.v1.UserService/CreateUsers',
+                request_serializer=users__service__pb2.CreateUsersRequest.SerializeToString,
+                response_deserializer=users__service__pb2.CreateUsersResponse.FromString,
+                _registered_method=True)
 
 
 class UserServiceServicer(object):
@@ -66,6 +86,34 @@ class UserServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetUsersByEmails(self, request, context):
+        """Пакетный поиск одним запросом к БД; ненайденных пользователей в ответе нет
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetUsersByIds(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamUsersByEmails(self, request_iterator, context):
+        """Долгоживущий поток пакетов: ответы идут в порядке запросов
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CreateUsers(self, request_iterator, context):
+        """Импорт пользователей пачками: каждая пачка - отдельная транзакция,
+        ответ на пачку содержит исход по каждой строке
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_UserServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -79,6 +127,26 @@ def add_UserServiceServicer_to_server(servicer, server):
                     request_deserializer=users__service__pb2.GetUserByEmailRequest.FromString,
                     response_serializer=users__service__pb2.GetUserByEmailResponse.SerializeToString,
             ),
+            'GetUsersByEmails': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetUsersByEmails,
+                    request_deserializer=users__service__pb2.GetUsersByEmailsRequest.FromString,
+                    response_serializer=users__service__pb2.GetUsersResponse.SerializeToString,
+            ),
+            'GetUsersByIds': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetUsersByIds,
+                    request_deserializer=users__service__pb2.GetUsersByIdsRequest.FromString,
+                    response_serializer=users__service__pb2.GetUsersResponse.SerializeToString,
+            ),
+            'StreamUsersByEmails': grpc.stream_stream_rpc_method_handler(
+                    servicer.StreamUsersByEmails,
+                    request_deserializer=users__service__pb2.GetUsersByEmailsRequest.FromString,
+                    response_serializer=users__service__pb2.GetUsersResponse.SerializeToString,
+            ),
+            'CreateUsers': grpc.stream_stream_rpc_method_handler(
+                    servicer.CreateUsers,
+                    request_deserializer=users__service__pb2.CreateUsersRequest.FromString,
+                    response_serializer=users__service__pb2.CreateUsersResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'users.v1.UserService', rpc_method_handlers)
@@ -144,3 +212,111 @@ class UserService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def GetUsersByEmails(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/users.v1.UserService/GetUsersByEmails',
+            users__service__pb2.GetUsersByEmailsRequest.SerializeToString,
+            users__service__pb2.GetUsersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetUsersByIds(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/users.v1.UserService/GetUsersByIds',
+            users__service__pb2.GetUsersByIdsRequest.SerializeToString,
+            users__service__pb2.GetUsersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StreamUsersByEmails(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/users.v1.UserService/StreamUsersByEmails',
+            users__service__pb2.GetUsersByEmailsRequest.SerializeToString,
+            users__service__pb2.GetUsersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def CreateUsers(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/users.v1.UserService/CreateUsers',
+            users__service__pb2.CreateUsersRequest.SerializeToString,
+            users__service__pb2.CreateUsersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,59 @@
+import asyncio
+import json
+from time import perf_counter
+
+from aiokafka import AIOKafkaProducer
+from opentelemetry.trace import SpanKind
+
+from app.core.config import settings
+from common.instrumentation import observe_produce
+from common.tracing import kafka_headers, tracer
+
+
+class KafkaProducer:
+    def __init__(self):
+        self._producer = None
+
+    async def start(self):
+        self._producer = AIOKafkaProducer(
+            bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
+            value_serializer=lambda v: json.dumps(v).encode("UTF-8"),
+        )
+        await self._producer.start()
+
+    async def stop(self):
+        if self._producer:
+            await self._producer.stop()
+
+    async def send_one(self, topic: str, message: dict, key: str | None = None):
+        if self._producer:
+            with tracer.start_as_current_span(f"{topic} publish", kind=SpanKind.PRODUCER):
+                start = perf_counter()
+                await self._producer.send_and_wait(
+                    topic=topic,
+                    value=message,
+                    key=key.encode() if key else None,
+                    headers=kafka_headers(),
+                )
+                observe_produce(topic, start)
+
+    # Сообщения ставятся в очередь продюсера без ожидания каждого, aiokafka
+    # собирает их в пакеты; ждем подтверждения всех разом
+    async def send_many(self, topic: str, messages: list[tuple[str | None, dict]]):
+        if not self._producer:
+            return
+        with tracer.start_as_current_span(f"{topic} publish", kind=SpanKind.PRODUCER) as span:
+            span.set_attribute("messaging.batch.message_count", len(messages))
+            headers = kafka_headers()
+            start = perf_counter()
+            futures = [
+                await self._producer.send(
+                    topic=topic, value=message, key=key.encode() if key else None, headers=headers
+                )
+                for key, message in messages
+            ]
+            await asyncio.gather(*futures)
+            observe_produce(topic, start)
+
+
+producer = KafkaProducer()
@@ -0,0 +1,52 @@
+"""add users pagination indexes
+
+Revision ID: c41f7a2d9e10
+Revises: 55bd9f8690f3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f7a2d9e10'
+down_revision: Union[str, Sequence[str], None] = '55bd9f8690f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (имя, колонки, условие частичного индекса)
+INDEXES = (
+    ('ix_users_created_at_id', ['created_at', 'id'], None),
+    ('ix_users_updated_at_id', ['updated_at', 'id'], None),
+    ('ix_users_active_verified_created_at_id', ['is_active', 'is_verified', 'created_at', 'id'], None),
+    ('ix_users_active_verified_updated_at_id', ['is_active', 'is_verified', 'updated_at', 'id'], None),
+    # Фильтр только по is_verified не попадает в префикс индексов выше
+    ('ix_users_verified_created_at_id', ['created_at', 'id'], 'is_verified'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в users, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, columns, where in INDEXES:
+            op.create_index(
+                name,
+                'users',
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='users', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,65 @@
+"""index users filter combinations
+
+Revision ID: d7b2e5f3a8c1
+Revises: c41f7a2d9e10
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7b2e5f3a8c1'
+down_revision: Union[str, Sequence[str], None] = 'c41f7a2d9e10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Частичный (created_at, id) WHERE is_verified не помогал ни фильтру is_verified=false,
+# ни сортировке по updated_at, а фильтр только по is_active не попадал в префикс
+# (is_active, is_verified, ...). Теперь на каждое сочетание фильтров и колонку
+# сортировки - свой индекс: равенства фильтра, затем (колонка, id)
+INDEXES = (
+    ('ix_users_active_created_at_id', ['is_active', 'created_at', 'id']),
+    ('ix_users_active_updated_at_id', ['is_active', 'updated_at', 'id']),
+    ('ix_users_verified_created_at_id', ['is_verified', 'created_at', 'id']),
+    ('ix_users_verified_updated_at_id', ['is_verified', 'updated_at', 'id']),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        # Имя занято частичным индексом прошлой ревизии
+        op.drop_index(
+            'ix_users_verified_created_at_id', table_name='users',
+            postgresql_concurrently=True, if_exists=True,
+        )
+        for name, columns in INDEXES:
+            op.create_index(
+                name,
+                'users',
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='users', postgresql_concurrently=True, if_exists=True)
+        op.create_index(
+            'ix_users_verified_created_at_id',
+            'users',
+            ['created_at', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+            postgresql_where=sa.text('is_verified'),
+            if_not_exists=True,
+        )
@@ -1,4 +1,5 @@
 import asyncio
+
 import pytest
 from httpx import AsyncClient, ASGITransport
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
@@ -9,10 +10,19 @@ from alembic.config import Config
 
 from app.main import app
 from app.core.config import TestSettings
-from app.db.session import create_async_session
+from app.db.session import (
+    create_async_session,
+    create_read_session,
+    get_read_session_maker,
+    get_session_maker,
+)
 from app.crud.users import create_user
 from app.schemas.user import UserCreateSchema
 from app.db.base import Base
+from app.db.replicas import ReplicaRouter
+from common.testing import counted_queries, recorded_spans
+from common.tracing import trace_engine
+from gRPC.src.server import UserServiceServicer
 
 
 test_settings = TestSettings()  # type: ignore
@@ -49,12 +59,27 @@ async def db_session(async_session_maker):
             await trans.rollback()
 
 
+@pytest.fixture
+def query_counter(test_engine):
+    with counted_queries(test_engine) as counter:
+        yield counter
+
+
 @pytest.fixture
 async def async_client(db_session):
     async def override_get_session():
         yield db_session
 
+    # Чтение тоже идет в тестовую транзакцию, иначе не видно данных фикстур
     app.dependency_overrides[create_async_session] = override_get_session
+    app.dependency_overrides[create_read_session] = override_get_session
+    # Свои сессии обработчиков работают в той же транзакции, что и фикстуры
+    connection = await db_session.connection()
+    session_maker = async_sessionmaker(
+        bind=connection, join_transaction_mode="create_savepoint", expire_on_commit=False
+    )
+    app.dependency_overrides[get_session_maker] = lambda: session_maker
+    app.dependency_overrides[get_read_session_maker] = lambda: session_maker
 
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test"
@@ -92,4 +117,27 @@ async def test_user(db_session):
         user_data=UserCreateSchema(**user_data).model_dump(), session=db_session
     )
 
-    yield user
\ No newline at end of file
+    yield user
+
+
+# gRPC сервис поверх тестовой БД, без реплик
+@pytest.fixture
+def grpc_servicer(test_engine, async_session_maker):
+    return UserServiceServicer(ReplicaRouter(test_engine, []), async_session_maker)
+
+
+@pytest.fixture
+def spans():
+    with recorded_spans("users_service") as recorded:
+        yield recorded
+
+
+# Свой движок к тестовой БД: обработчики событий трассировки не остаются на общем
+@pytest.fixture
+async def traced_servicer(test_engine, spans):
+    engine = create_async_engine(test_engine.url, poolclass=NullPool)
+    trace_engine(engine)
+    yield UserServiceServicer(
+        ReplicaRouter(engine, []), async_sessionmaker(engine, expire_on_commit=False)
+    )
+    await engine.dispose()
@@ -1,6 +1,34 @@
+import csv
+import io
+import json
+
+import grpc
 import pytest
+from opentelemetry import trace
+from prometheus_client import REGISTRY
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
 
+from app.crud.users import (
+    USER_OUT_COLUMNS,
+    create_user,
+    create_users_bulk,
+    deactivate_user,
+    get_user_status_by_email,
+    get_user_statuses_by_emails,
+    get_user_statuses_by_ids,
+    update_user,
+    users_page,
+)
+from app.core.config import settings
 from app.db.models import User
+from app.db.replicas import REPLICA_LAG_QUERY, ReplicaRouter
+from app.db.session import engine, pick_read_engine, read_engine, wants_primary
+from app.schemas.user import UserUpdateSchema, UsersListQuerySchema
+from gRPC.src import users_service_pb2 as pb
+from gRPC.src import users_service_pb2_grpc as grpc_pb
+from gRPC.src.server import UserServiceServicer, create_server
 
 
 @pytest.mark.parametrize(
@@ -34,6 +62,142 @@ async def test_get_users_handler(
             assert "is_active" in user
 
 
+class TestCursorPagination:
+    @pytest.mark.parametrize("sort_order", ["desc", "asc"])
+    async def test_pages_cover_all_users(self, sort_order: str, async_client, test_users):
+        params = {"limit": 3, "sort_order": sort_order}
+        first = await async_client.get("/users/", params=params)
+        cursor = first.headers["X-Next-Cursor"]
+
+        second = await async_client.get("/users/", params={**params, "cursor": cursor})
+        assert second.status_code == 200
+        assert "X-Next-Cursor" not in second.headers
+
+        ids = [user["id"] for user in first.json() + second.json()]
+        assert len(ids) == len(set(ids)) == len(test_users)
+
+        offset_ids = [user["id"] for user in (await async_client.get("/users/", params={"limit": 10, "sort_order": sort_order})).json()]
+        assert ids == offset_ids
+
+    async def test_filters_with_cursor(self, async_client, test_users):
+        first = await async_client.get("/users/", params={"limit": 1, "is_active": False})
+        assert [user["email"] for user in first.json()] == ["ahmed@example.com"]
+
+        second = await async_client.get(
+            "/users/", params={"limit": 1, "is_active": False, "cursor": first.headers["X-Next-Cursor"]}
+        )
+        assert second.json() == []
+
+    # Без seq scan и сортировки планировщик обязан взять порядок из индекса.
+    # Sort или Filter в плане - у сочетания фильтров и сортировки нет своего индекса:
+    # страница читается сортировкой или обходом всего индекса с отбрасыванием строк
+    @pytest.mark.parametrize("sort_by", ["created_at", "updated_at"])
+    @pytest.mark.parametrize("sort_order", ["desc", "asc"])
+    @pytest.mark.parametrize(
+        "filters", [{}, {"is_active": True}, {"is_verified": False}, {"is_active": True, "is_verified": True}]
+    )
+    async def test_page_order_comes_from_index(self, filters: dict, sort_by: str, sort_order: str, db_session):
+        params = UsersListQuerySchema(sort_by=sort_by, sort_order=sort_order, **filters)
+        query = users_page(select(*USER_OUT_COLUMNS), params).compile(
+            dialect=db_session.bind.dialect, compile_kwargs={"literal_binds": True}
+        )
+        for setting in ("enable_seqscan", "enable_sort", "enable_incremental_sort"):
+            await db_session.execute(text(f"SET LOCAL {setting} = off"))
+
+        plan = "\n".join((await db_session.execute(text(f"EXPLAIN {query}"))).scalars())
+
+        assert "Sort" not in plan and "Filter" not in plan, plan
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"cursor": "not-a-cursor"},
+            {"cursor": "CURSOR", "offset": 1},
+            {"cursor": "CURSOR", "sort_by": "updated_at"},
+        ],
+    )
+    async def test_invalid_cursor(self, params: dict, async_client, test_users):
+        first = await async_client.get("/users/", params={"limit": 1})
+        if params["cursor"] == "CURSOR":
+            params["cursor"] = first.headers["X-Next-Cursor"]
+
+        response = await async_client.get("/users/", params=params)
+        assert response.status_code == 422
+
+
+class TestExportUsers:
+    async def test_export_ndjson(self, async_client, test_users):
+        response = await async_client.get("/users/export")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert sorted(row["email"] for row in rows) == sorted(user.email for user in test_users)
+        assert set(rows[0]) == {"id", "email", "is_active", "is_verified", "created_at", "updated_at"}
+
+    async def test_export_csv_with_filters(self, async_client, test_users):
+        response = await async_client.get("/users/export", params={"format": "csv", "is_verified": True})
+
+        assert response.status_code == 200
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert {row["email"] for row in rows} == {"alice@example.com", "john@example.com"}
+        assert all(row["is_verified"] == "True" for row in rows)
+
+
+class TestBulkCreateUsers:
+    async def test_bulk_create_outcomes(self, async_client, test_users):
+        payload = {"users": [
+            {"email": "new1@example.com"},
+            {"email": "alice@example.com"},
+            {"email": "not-an-email"},
+            {"email": "new1@example.com"},
+            {"email": "new2@example.com", "is_verified": True},
+        ]}
+
+        response = await async_client.post("/users/bulk", json=payload)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [row["status"] for row in data["results"]] == [
+            "created", "exists", "invalid", "duplicate", "created"
+        ]
+        assert (data["created"], data["skipped"], data["invalid"]) == (2, 2, 1)
+        assert data["results"][2]["error"].startswith("email")
+
+        created = await async_client.get("/users/by-email", params={"user_email": "new2@example.com"})
+        assert created.json()["id"] == data["results"][4]["id"]
+        assert created.json()["is_verified"] is True
+
+    async def test_bulk_insert_is_chunked(self, db_session, query_counter):
+        users_data = [{"email": f"user{i}@example.com"} for i in range(25)]
+
+        with query_counter.assert_count(3):
+            created = await create_users_bulk(users_data, db_session, chunk_size=10)
+
+        assert len(created) == 25
+
+    async def test_bulk_create_empty_batch(self, async_client):
+        response = await async_client.post("/users/bulk", json={"users": []})
+        assert response.status_code == 422
+
+
+class TestFastJSON:
+    async def test_same_output(self, async_client, test_users, monkeypatch):
+        params = {"limit": 3, "sort_order": "asc"}
+        default_page = await async_client.get("/users/", params=params)
+        default_user = await async_client.get(f"/users/{test_users[0].id}")
+
+        monkeypatch.setattr(settings, "FAST_JSON", True)
+        fast_page = await async_client.get("/users/", params=params)
+        fast_user = await async_client.get(f"/users/{test_users[0].id}")
+        missing = await async_client.get("/users/00000000-0000-4000-8000-000000000000")
+
+        assert fast_page.json() == default_page.json()
+        assert fast_page.headers["X-Next-Cursor"] == default_page.headers["X-Next-Cursor"]
+        assert fast_user.json() == default_user.json()
+        assert missing.status_code == 404
+
+
 class TestGetUserByEmail:
     async def test_get_user_by_email_handler(self, async_client, test_users):
         for user in test_users:
@@ -148,3 +312,223 @@ class TestUpdateUserHandler:
         
         r2 = await async_client.patch(f"/users/{test_user.id}", json=user_data)
         assert r2.status_code == 422
+
+
+class TestWriteQueryCount:
+    async def test_create_user_single_query(self, db_session, query_counter):
+        with query_counter.assert_count(1):
+            user = await create_user({"email": "one_query@email.com", "is_verified": None}, db_session)
+
+        assert user.is_verified is False
+        assert user.created_at is not None
+
+    async def test_update_user_single_query(self, db_session, test_user: User, query_counter):
+        with query_counter.assert_count(1):
+            user = await update_user(
+                test_user.id, UserUpdateSchema(email="updated@email.com"), db_session
+            )
+
+        assert user.email == "updated@email.com"
+
+    async def test_deactivate_user_single_query(self, db_session, test_user: User, query_counter):
+        with query_counter.assert_count(1):
+            user = await deactivate_user(test_user.id, db_session)
+
+        assert user.is_active is False
+
+    async def test_noop_update_keeps_updated_at(self, db_session, test_user: User):
+        updated_at = test_user.updated_at
+
+        user = await update_user(test_user.id, UserUpdateSchema(email=test_user.email), db_session)
+
+        assert user.updated_at == updated_at
+
+
+class TestBatchLookup:
+    async def test_get_user_statuses_by_emails(self, db_session, test_users: list[User], query_counter):
+        emails = [test_users[0].email, test_users[2].email, "missing@example.com"]
+
+        with query_counter.assert_count(1):
+            users = await get_user_statuses_by_emails(emails, db_session)
+
+        assert {user.email for user in users} == {test_users[0].email, test_users[2].email}
+
+    async def test_get_user_statuses_by_ids(self, db_session, test_users: list[User], query_counter):
+        user_ids = [user.id for user in test_users]
+
+        with query_counter.assert_count(1):
+            users = await get_user_statuses_by_ids(user_ids, db_session)
+
+        assert {user.id for user in users} == set(user_ids)
+        assert await get_user_statuses_by_ids([], db_session) == []
+
+    async def test_get_user_status_by_email(self, db_session, test_users: list[User]):
+        user = await get_user_status_by_email(test_users[3].email, db_session)
+
+        assert (user.id, user.is_active) == (test_users[3].id, False)
+        assert await get_user_status_by_email("missing@example.com", db_session) is None
+
+
+class TestReplicaRouter:
+    @pytest.fixture
+    async def replica(self, test_engine):
+        engine = create_async_engine(test_engine.url, poolclass=NullPool)
+        yield engine
+        await engine.dispose()
+
+    @pytest.fixture
+    async def dead_replica(self, test_engine):
+        engine = create_async_engine(test_engine.url.set(port=1), poolclass=NullPool)
+        yield engine
+        await engine.dispose()
+
+    async def test_round_robin_skips_unhealthy(self, test_engine, replica, dead_replica):
+        router = ReplicaRouter(test_engine, [replica, dead_replica])
+
+        await router.check()
+
+        assert [router.read_engine() for _ in range(3)] == [replica] * 3
+        assert router.stats()["healthy"] == 1
+        assert router.stats()["failed_checks"] == 1
+
+    async def test_lagging_replica_falls_back_to_primary(self, test_engine, replica):
+        router = ReplicaRouter(test_engine, [replica], max_lag_seconds=-1)
+
+        await router.check()
+
+        assert router.read_engine() is test_engine
+        assert router.stats()["primary_fallbacks"] == 1
+
+    async def test_lag_query_is_zero_outside_recovery(self, replica):
+        async with replica.connect() as conn:
+            assert await conn.scalar(REPLICA_LAG_QUERY) == 0
+
+    async def test_autocommit_variant(self, test_engine, replica):
+        router = ReplicaRouter(test_engine, [replica, replica])
+
+        engine = router.read_engine(autocommit=True)
+
+        assert engine.pool is replica.pool
+        assert engine.get_execution_options()["isolation_level"] == "AUTOCOMMIT"
+
+    def test_read_primary_escape_hatch(self):
+        assert pick_read_engine(wants_primary("1"), autocommit=True) is read_engine
+        assert pick_read_engine(wants_primary("true")) is engine
+        assert not wants_primary(None)
+
+
+class TestReplicaLagFallback:
+    # Отстающая реплика: пустая копия таблицы users в своей схеме той же БД
+    @pytest.fixture
+    async def lagging_replica(self, test_engine):
+        async with test_engine.begin() as conn:
+            await conn.execute(text("CREATE SCHEMA lagging"))
+            await conn.execute(text("CREATE TABLE lagging.users (LIKE public.users INCLUDING ALL)"))
+        engine = create_async_engine(
+            test_engine.url,
+            poolclass=NullPool,
+            connect_args={"server_settings": {"search_path": "lagging"}},
+        )
+        yield engine
+        await engine.dispose()
+        async with test_engine.begin() as conn:
+            await conn.execute(text("DROP SCHEMA lagging CASCADE"))
+
+    # Пользователи только что зарегистрированы - уже в primary, еще не на реплике
+    @pytest.fixture
+    async def registered(self, async_session_maker):
+        async with async_session_maker() as session:
+            users = [
+                await create_user({"email": email}, session)
+                for email in ("fresh1@example.com", "fresh2@example.com")
+            ]
+            await session.commit()
+        yield users
+        async with async_session_maker() as session:
+            await session.execute(delete(User).where(User.id.in_([user.id for user in users])))
+            await session.commit()
+
+    @pytest.fixture
+    async def stub(self, test_engine, async_session_maker, lagging_replica):
+        servicer = UserServiceServicer(
+            ReplicaRouter(test_engine, [lagging_replica]), async_session_maker
+        )
+        server, port = create_server("127.0.0.1:0", servicer)
+        await server.start()
+        async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+            yield grpc_pb.UserServiceStub(channel)
+        await server.stop(0)
+
+    async def test_emails_missing_on_replica_read_from_primary(self, stub, registered):
+        response = await stub.GetUsersByEmails(
+            pb.GetUsersByEmailsRequest(
+                emails=["fresh1@example.com", "fresh2@example.com", "nobody@example.com"]
+            )
+        )
+
+        assert {user.id for user in response.users} == {str(user.id) for user in registered}
+
+    async def test_ids_missing_on_replica_read_from_primary(self, stub, registered):
+        response = await stub.GetUsersByIds(
+            pb.GetUsersByIdsRequest(ids=[str(user.id) for user in registered])
+        )
+
+        assert {user.email for user in response.users} == {user.email for user in registered}
+
+
+async def test_db_pool_metrics(async_client):
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'db_pool_size{engine="primary"}' in response.text
+    assert "db_replicas_replicas 0.0" in response.text
+
+
+async def test_grpc_server_metrics(grpc_servicer):
+    labels = {"method": "GetUsersByIds", "code": "INVALID_ARGUMENT"}
+    before = REGISTRY.get_sample_value("grpc_server_handling_seconds_count", labels) or 0
+    server, port = create_server("127.0.0.1:0", grpc_servicer)
+    await server.start()
+    try:
+        async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+            with pytest.raises(grpc.aio.AioRpcError) as exc_info:
+                await grpc_pb.UserServiceStub(channel).GetUsersByIds(
+                    pb.GetUsersByIdsRequest(ids=["not-a-uuid"])
+                )
+    finally:
+        await server.stop(0)
+
+    assert exc_info.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+    assert REGISTRY.get_sample_value("grpc_server_handling_seconds_count", labels) == before + 1
+
+
+async def test_prometheus_metrics(async_client, test_users):
+    await async_client.get(f"/users/{test_users[0].id}")
+
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'route="/users/{user_id}",status="200"' in response.text
+    assert 'db_pool_checked_out{engine="primary"}' in response.text
+
+
+async def test_grpc_trace_propagation(traced_servicer, spans, monkeypatch):
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    monkeypatch.setattr(settings.TRACING, "enabled", True)
+    server, port = create_server("127.0.0.1:0", traced_servicer)
+    await server.start()
+    try:
+        async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+            await grpc_pb.UserServiceStub(channel).GetUsersByEmails(
+                pb.GetUsersByEmailsRequest(emails=["nobody@example.com"]),
+                metadata=(("traceparent", f"00-{trace_id}-00f067aa0ba902b7-01"),),
+            )
+    finally:
+        await server.stop(0)
+
+    finished = spans.by_name()
+    rpc = finished["users.v1.UserService/GetUsersByEmails"]
+    assert format(rpc.context.trace_id, "032x") == trace_id
+    assert rpc.kind == trace.SpanKind.SERVER
+    # SQL запрос обработчика - дочерний span того же вызова
+    assert finished["SELECT"].parent.span_id == rpc.context.span_id